@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Make the shared mediaserver_automation package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediaserver_automation import listener
+
+# Listen for Emby LibraryChanged / UserDataChanged notifications and keep the Disney,
+# Romantic Comedies, Unwatched Movies collections and the Recently Added playlist in sync.
+# Set EMBY_WEBSOCKET_URL to point at a different WebSocket server (e.g. a local stand-in).
+listener.main()
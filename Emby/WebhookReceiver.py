@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Make the shared mediaserver_automation package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mediaserver_automation import webhook
+
+# Accept Emby webhook deliveries (library.new, library.deleted, playback.stop, item.markplayed,
+# item.markunplayed) and apply the affected collection and playlist changes in debounced batches.
+# Use this instead of LibraryEventListener.py where a WebSocket connection is not practical.
+webhook.main()
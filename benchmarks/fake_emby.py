@@ -0,0 +1,623 @@
+import argparse
+import base64
+import datetime
+import hashlib
+import json
+import random
+import re
+import socket
+import threading
+import time
+from datetime import timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# A local stand-in for the parts of the Emby REST API the jobs use. It serves a synthetic,
+# deterministic library of movies and music tracks, can add latency to every request and
+# counts requests and response bytes per endpoint template for the benchmark harness. It
+# also serves Emby's notification WebSocket (/embywebsocket) for the event listener.
+
+ADMIN_USER = "admin"
+WATCH_STATUS_USER = "Dusty & Lara"
+MOVIE_LIBRARY_ID = hashlib.md5(b"library/movies").hexdigest()
+MUSIC_LIBRARY_ID = hashlib.md5(b"library/music").hexdigest()
+
+
+# IDs of the first n movie or music libraries; the first one is always MOVIE_LIBRARY_ID / MUSIC_LIBRARY_ID
+def library_ids(kind, n):
+    first = MOVIE_LIBRARY_ID if kind == "movies" else MUSIC_LIBRARY_ID
+    return [first] + [hashlib.md5(f"library/{kind}/{i}".encode()).hexdigest() for i in range(2, n + 1)]
+
+GENRES = ["Action", "Adventure", "Animation", "Comedy", "Drama", "Family", "Fantasy", "Horror", "Romance", "Science Fiction", "Thriller"]
+STUDIOS = ["Walt Disney Pictures", "Pixar", "Marvel Studios", "Lucasfilm", "Warner Bros.", "Universal Pictures", "Paramount", "Columbia Pictures",
+           "DreamWorks", "Lionsgate", "Magnolia Pictures", "A24", "20th Century Fox", "Disney Television Animation"]
+RATINGS = ["G", "PG", "PG-13", "R", "NR"]
+ACTORS = [f"Actor {i:04d}" for i in range(2000)] + ["Shirley Temple"]
+ARTISTS = [f"Artist {i:04d}" for i in range(500)] + ["Santa Claus Band", "David Mendoza"]
+
+# Fields Emby only returns from list endpoints when requested through Fields=
+OPTIONAL_FIELDS = ["Path", "Overview", "People", "Genres", "Studios", "DateCreated", "ProductionYear", "PremiereDate"]
+
+# Path patterns used to group requests, e.g. /Users/{id}/Items/{id}/UserData
+ID_PATTERN = re.compile(r"/[0-9a-f]{32}(?=/|$)", re.IGNORECASE)
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"  # RFC 6455 handshake constant
+
+
+def endpoint_template(path):
+    return ID_PATTERN.sub("/{id}", path)
+
+
+def make_id(*parts):
+    return hashlib.md5("/".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def emby_date(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%f') + "0Z"
+
+
+# Deterministic synthetic library
+class Library:
+    def __init__(self, movies=1000, tracks=1000, seed=42, played_ratio=0.3, libraries=1):
+        rng = random.Random(seed)
+        # Items are dealt round-robin over this many movie and music libraries
+        self.movie_libraries = library_ids("movies", libraries)
+        self.music_libraries = library_ids("music", libraries)
+        now = datetime.datetime.now(timezone.utc)
+        self.users = {
+            make_id("user", ADMIN_USER): ADMIN_USER,
+            make_id("user", WATCH_STATUS_USER): WATCH_STATUS_USER,
+        }
+        self.items = {}
+        self.user_data = {user_id: {} for user_id in self.users}
+        self.studio_ids = {name: make_id("studio", name) for name in STUDIOS}
+        self.person_ids = {name: make_id("person", name) for name in ACTORS}
+        self.collections = {}  # collection ID -> {"Name": ..., "Items": [item IDs]}
+        self.playlists = {}  # playlist ID -> {"Name": ..., "Entries": [(entry ID, item ID)]}
+        self.images = {}  # item ID -> uploaded image bytes
+        self.lock = threading.RLock()
+        self.next_entry = 0
+
+        for i in range(movies):
+            item_id = make_id("movie", seed, i)
+            year = rng.randint(1930, 2024)
+            people = [{"Name": name, "Id": self.person_ids[name], "Type": "Actor"} for name in rng.sample(ACTORS[:-1], 6)]
+            name = f"Movie {i:06d}"
+            if rng.random() < 0.01:
+                people[0] = {"Name": "Shirley Temple", "Id": self.person_ids["Shirley Temple"], "Type": "Actor"}
+            studios = rng.sample(STUDIOS, rng.randint(1, 2))
+            self.items[item_id] = {
+                "Id": item_id,
+                "Name": name,
+                "Type": "Movie",
+                "MediaType": "Video",
+                "ParentId": self.movie_libraries[i % libraries],
+                "OfficialRating": rng.choice(RATINGS),
+                "ProductionYear": year,
+                "PremiereDate": emby_date(datetime.datetime(year, 1, 1, tzinfo=timezone.utc)),
+                "Path": f"/media/movies/{name} ({year})/{name} ({year}).mkv",
+                "Overview": f"Synthetic overview for {name}. " * 8,
+                "Genres": rng.sample(GENRES, rng.randint(1, 3)),
+                "Studios": [{"Name": studio, "Id": self.studio_ids[studio]} for studio in studios],
+                "People": people,
+                "DateCreated": emby_date(now - datetime.timedelta(days=rng.randint(0, 3650), seconds=rng.randint(0, 86399))),
+            }
+            for user_id in self.users:
+                played = rng.random() < played_ratio
+                self.user_data[user_id][item_id] = {
+                    "Played": played,
+                    "PlayCount": 1 if played else 0,
+                    "PlayedPercentage": 0,
+                    "IsFavorite": False,
+                    "LastPlayedDate": emby_date(now - datetime.timedelta(days=rng.randint(0, 365))) if played else None,
+                }
+
+        for i in range(tracks):
+            item_id = make_id("track", seed, i)
+            self.items[item_id] = {
+                "Id": item_id,
+                "Name": f"Track {i:06d}",
+                "Type": "Audio",
+                "MediaType": "Audio",
+                "ParentId": self.music_libraries[i % libraries],
+                "Artists": [rng.choice(ARTISTS)],
+                "Album": f"Album {i // 12:05d}",
+                "DateCreated": emby_date(now - datetime.timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86399))),
+            }
+
+    def user_id(self, name):
+        for user_id, user_name in self.users.items():
+            if user_name == name:
+                return user_id
+        return None
+
+    def view(self, item, fields, user_id=None):
+        result = {key: value for key, value in item.items() if key not in OPTIONAL_FIELDS or key in fields}
+        if user_id:
+            user_data = self.user_data.get(user_id, {}).get(item["Id"])
+            if user_data is not None:
+                result["UserData"] = user_data
+        return result
+
+    def children(self, parent_id):
+        if parent_id in self.collections:
+            return [self.items[item_id] for item_id in self.collections[parent_id]["Items"] if item_id in self.items]
+        if parent_id in self.playlists:
+            return [self.items[item_id] for _, item_id in self.playlists[parent_id]["Entries"] if item_id in self.items]
+        if parent_id in self.movie_libraries or parent_id in self.music_libraries:
+            return [item for item in self.items.values() if item.get("ParentId") == parent_id]
+        return []
+
+    def containers(self, item_type):
+        if item_type == "boxset":
+            return [{"Id": cid, "Name": c["Name"], "Type": "BoxSet", "ChildCount": len(c["Items"])} for cid, c in self.collections.items()]
+        return [{"Id": pid, "Name": p["Name"], "Type": "Playlist", "ChildCount": len(p["Entries"])} for pid, p in self.playlists.items()]
+
+    # Emby's /Items and /Users/{id}/Items query, restricted to the parameters the jobs send
+    def query(self, params, user_id=None):
+        get = lambda name: params.get(name, params.get(name.lower(), params.get(name[0].lower() + name[1:])))
+        include_types = [t.lower() for t in (get("IncludeItemTypes") or "").split(",") if t]
+        if "boxset" in include_types or "playlist" in include_types:
+            items = self.containers("boxset" if "boxset" in include_types else "playlist")
+            return {"Items": items, "TotalRecordCount": len(items)}
+
+        parent_id = get("ParentId")
+        items = self.children(parent_id) if parent_id else list(self.items.values())
+        if get("Ids"):
+            wanted = set(get("Ids").split(","))
+            items = [item for item in items if item["Id"] in wanted]
+        if include_types:
+            items = [item for item in items if item["Type"].lower() in include_types]
+        if get("MediaTypes"):
+            media_types = get("MediaTypes").split(",")
+            items = [item for item in items if item.get("MediaType") in media_types]
+        if get("SearchTerm"):
+            term = get("SearchTerm").lower()
+            items = [item for item in items if term in item["Name"].lower()]
+        if get("Studios"):
+            studios = set(get("Studios").split("|"))
+            items = [item for item in items if any(studio["Name"] in studios for studio in item.get("Studios", []))]
+        if get("StudioIds"):
+            studio_ids = set(get("StudioIds").replace("|", ",").split(","))
+            items = [item for item in items if any(studio["Id"] in studio_ids for studio in item.get("Studios", []))]
+        if get("PersonIds"):
+            person_ids = set(get("PersonIds").replace("|", ",").split(","))
+            items = [item for item in items if any(person["Id"] in person_ids for person in item.get("People", []))]
+        if get("IsPlayed") and user_id:
+            is_played = get("IsPlayed").lower() == "true"
+            items = [item for item in items if self.user_data[user_id].get(item["Id"], {}).get("Played", False) == is_played]
+
+        sort_by = get("SortBy")
+        if sort_by:
+            descending = (get("SortOrder") or "").lower() == "descending"
+            if sort_by == "DatePlayed" and user_id:
+                key = lambda item: self.user_data[user_id].get(item["Id"], {}).get("LastPlayedDate") or ""
+            elif sort_by == "DateCreated":
+                key = lambda item: item.get("DateCreated", "")
+            else:
+                key = lambda item: item.get("Name", "")
+            items = sorted(items, key=key, reverse=descending)
+
+        total = len(items)
+        start = int(get("StartIndex") or 0)
+        limit = get("Limit")
+        items = items[start:start + int(limit)] if limit else items[start:]
+        fields = (get("Fields") or "").split(",")
+        return {"Items": [self.view(item, fields, user_id) for item in items], "TotalRecordCount": total}
+
+
+# Request counters shared by all handler threads
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+    def record(self, method, path, sent, received):
+        with self.lock:
+            key = f"{method} {endpoint_template(path)}"
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+            }
+
+
+# Server side of one notification WebSocket (RFC 6455): unmasked frames out, masked frames in.
+# Messages are small JSON texts, so fragmented frames are not supported.
+class WebSocketConnection:
+    def __init__(self, connection, rfile, wfile):
+        self.connection = connection
+        self.rfile = rfile
+        self.wfile = wfile
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send(self, opcode, payload=b""):
+        length = len(payload)
+        if length < 126:
+            header = bytes([0x80 | opcode, length])
+        elif length < 65536:
+            header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, "big")
+        else:
+            header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, "big")
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.wfile.write(header + payload)
+            except OSError:
+                self.closed = True
+
+    def send_json(self, message):
+        self.send(0x1, json.dumps(message).encode())
+
+    # Next frame from the client as (opcode, payload), or None once the connection is gone
+    def receive(self):
+        try:
+            head = self.rfile.read(2)
+            if len(head) < 2:
+                return None
+            length = head[1] & 0x7F
+            if length == 126:
+                length = int.from_bytes(self.rfile.read(2), "big")
+            elif length == 127:
+                length = int.from_bytes(self.rfile.read(8), "big")
+            mask = self.rfile.read(4) if head[1] & 0x80 else bytes(4)
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(self.rfile.read(length)))
+        except OSError:
+            return None
+        return head[0] & 0x0F, payload
+
+    # Close from the server side, as Emby does when it restarts
+    def close(self):
+        self.send(0x8, (1001).to_bytes(2, "big"))
+        with self.lock:
+            self.closed = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class FakeEmbyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body are separate writes; avoid delayed-ACK stalls on keep-alive connections
+
+    def log_message(self, format, *args):
+        pass
+
+    # on_body(byte count) runs before the response goes out, so a client that has its response
+    # always finds the request counted
+    def _send(self, status, payload=None, on_body=None):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        if on_body:
+            on_body(len(body))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        if url.path.startswith("/__"):
+            self._control(method, url.path, params)
+            return
+        if url.path.lower() == "/embywebsocket" and method == "GET":
+            self._websocket(params)
+            return
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        record = lambda sent: self.server.stats.record(method, url.path, sent, length)
+        failure_status = self.server.take_failure()
+        if failure_status:
+            self._send(failure_status, {"Error": "Injected failure"}, record)
+        elif self.headers.get("X-MediaBrowser-Token", self.headers.get("X-Emby-Token")) != self.server.api_key:
+            self._send(401, on_body=record)
+        else:
+            try:
+                status, payload = self.server.route(method, url.path, params, body)
+            except Exception as e:
+                status, payload = 500, {"Error": str(e)}
+            self._send(status, payload, record)
+
+    # GET /embywebsocket?api_key=...: upgrade to a WebSocket, send ForceKeepAlive and then
+    # whatever server.send_event() pushes until either side closes. Client messages are kept
+    # in server.websocket_messages.
+    def _websocket(self, params):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+            self._send(400)
+            return
+        if params.get("api_key") != self.server.api_key:
+            self._send(401)
+            return
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode())
+        self.end_headers()
+        self.close_connection = True
+
+        websocket = WebSocketConnection(self.connection, self.rfile, self.wfile)
+        websocket.send_json({"MessageType": "ForceKeepAlive", "Data": self.server.keep_alive_timeout})
+        self.server.websocket_opened(websocket)
+        try:
+            while True:
+                frame = websocket.receive()
+                if frame is None or frame[0] == 0x8:
+                    break
+                opcode, payload = frame
+                if opcode == 0x9:
+                    websocket.send(0xA, payload)
+                elif opcode == 0x1:
+                    self.server.websocket_received(json.loads(payload))
+        finally:
+            websocket.close()
+            self.server.websocket_closed(websocket)
+
+    # /__fail?status=503&count=3 makes the next 3 API requests return 503
+    def _control(self, method, path, params):
+        if path == "/__fail" and method == "POST":
+            self.server.inject_failures(int(params.get("status", 503)), int(params.get("count", 1)))
+            self._send(204)
+        elif path == "/__stats":
+            self._send(200, self.server.stats.snapshot())
+        elif path == "/__reset" and method == "POST":
+            self.server.stats.reset()
+            self.server.inject_failures(None, 0)
+            self._send(204)
+        else:
+            self._send(404)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class FakeEmbyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, library, api_key="benchmark-key", latency=0.0):
+        super().__init__(address, FakeEmbyHandler)
+        self.library = library
+        self.api_key = api_key
+        self.latency = latency
+        self.stats = Stats()
+        self.failure_lock = threading.Lock()
+        self.failures = []  # Statuses to return for the next API requests, in order
+        self.keep_alive_timeout = 60  # Seconds, sent as ForceKeepAlive when a WebSocket opens
+        self.websocket_condition = threading.Condition()
+        self.websockets = []  # Open notification WebSockets
+        self.websocket_connections = 0  # WebSockets opened so far
+        self.websocket_messages = []  # Messages the clients sent, e.g. KeepAlive
+
+    # A status of None clears the queue
+    def inject_failures(self, status, count):
+        with self.failure_lock:
+            if status is None:
+                self.failures = []
+            self.failures.extend([status] * count)
+
+    def take_failure(self):
+        with self.failure_lock:
+            return self.failures.pop(0) if self.failures else None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def websocket_url(self):
+        host, port = self.server_address[:2]
+        return f"ws://{host}:{port}/embywebsocket?api_key={self.api_key}&deviceId=fake-emby-client"
+
+    def websocket_opened(self, websocket):
+        with self.websocket_condition:
+            self.websockets.append(websocket)
+            self.websocket_connections += 1
+            self.websocket_condition.notify_all()
+
+    def websocket_closed(self, websocket):
+        with self.websocket_condition:
+            if websocket in self.websockets:
+                self.websockets.remove(websocket)
+            self.websocket_condition.notify_all()
+
+    def websocket_received(self, message):
+        with self.websocket_condition:
+            self.websocket_messages.append(message)
+            self.websocket_condition.notify_all()
+
+    # Push a notification to every open WebSocket, e.g. send_event("LibraryChanged", {"ItemsAdded": [...]})
+    def send_event(self, message_type, data):
+        with self.websocket_condition:
+            websockets = list(self.websockets)
+        for websocket in websockets:
+            websocket.send_json({"MessageType": message_type, "Data": data})
+
+    # Drop every open WebSocket, as a server restart does
+    def close_websockets(self):
+        with self.websocket_condition:
+            websockets = list(self.websockets)
+        for websocket in websockets:
+            websocket.close()
+
+    # Wait until condition(server) holds, e.g. lambda server: server.websocket_connections == 2
+    def wait_for_websockets(self, condition, timeout=5):
+        with self.websocket_condition:
+            return self.websocket_condition.wait_for(lambda: condition(self), timeout)
+
+    # Dispatch an API request; returns (status, JSON payload or None)
+    def route(self, method, path, params, body):
+        library = self.library
+        parts = [part for part in path.split("/") if part]
+        lowered = [part.lower() for part in parts]
+
+        with library.lock:
+            if method == "GET" and lowered == ["users"]:
+                return 200, [{"Name": name, "Id": user_id} for user_id, name in library.users.items()]
+
+            if method == "GET" and lowered == ["items"]:
+                return 200, library.query(params)
+
+            if lowered[:1] == ["users"] and len(parts) >= 3 and lowered[2] == "items":
+                user_id = parts[1]
+                if user_id not in library.users:
+                    return 404, None
+                if method == "GET" and len(parts) == 3:
+                    return 200, library.query(params, user_id)
+                if method == "GET" and len(parts) == 4:
+                    item = library.items.get(parts[3])
+                    if item is None:
+                        return 404, None
+                    return 200, library.view(item, OPTIONAL_FIELDS, user_id)
+                if method == "GET" and len(parts) == 5 and lowered[4] == "userdata":
+                    return 200, library.user_data[user_id].get(parts[3], {})
+                if method == "GET" and len(parts) == 5 and lowered[4] == "items":
+                    return 200, library.query(dict(params, ParentId=parts[3]), user_id)
+                return 404, None
+
+            if lowered[:1] == ["collections"]:
+                return self._collections(method, parts, params, body)
+            if lowered[:1] == ["playlists"]:
+                return self._playlists(method, parts, params, body)
+
+            if lowered[:1] == ["items"] and len(parts) == 2 and method == "DELETE":
+                if library.playlists.pop(parts[1], None) or library.collections.pop(parts[1], None):
+                    return 204, None
+                return 404, None
+            if lowered[:1] == ["items"] and len(parts) == 4 and lowered[2] == "images" and method == "POST":
+                library.images[parts[1]] = body
+                return 204, None
+            if lowered[:1] == ["studios"] and method == "GET":
+                studios = [{"Name": name, "Id": studio_id} for name, studio_id in library.studio_ids.items()]
+                return 200, {"Items": studios, "TotalRecordCount": len(studios)}
+            if lowered[:1] == ["persons"] and method == "GET":
+                term = (params.get("SearchTerm") or params.get("searchTerm") or "").lower()
+                people = [{"Name": name, "Id": person_id} for name, person_id in library.person_ids.items() if term in name.lower()]
+                return 200, {"Items": people, "TotalRecordCount": len(people)}
+        return 404, None
+
+    def _collections(self, method, parts, params, body):
+        library = self.library
+        ids = [item_id for item_id in (params.get("Ids") or "").split(",") if item_id]
+        if method == "POST" and len(parts) == 1:
+            collection_id = make_id("collection", params.get("Name"), len(library.collections), time.time())
+            library.collections[collection_id] = {"Name": params.get("Name"), "Items": list(dict.fromkeys(ids))}
+            return 200, {"Id": collection_id}
+        collection = library.collections.get(parts[1]) if len(parts) > 1 else None
+        if collection is None:
+            return 404, None
+        if len(parts) == 3 and method == "GET":
+            items = [library.view(library.items[item_id], []) for item_id in collection["Items"] if item_id in library.items]
+            return 200, {"Items": items, "TotalRecordCount": len(items)}
+        if len(parts) == 3 and method == "POST":
+            for item_id in ids:
+                if item_id not in collection["Items"]:
+                    collection["Items"].append(item_id)
+            return 204, None
+        if len(parts) == 3 and method == "DELETE":
+            remove = set(ids)
+            collection["Items"] = [item_id for item_id in collection["Items"] if item_id not in remove]
+            return 204, None
+        if len(parts) == 4 and parts[3].lower() == "delete" and method == "POST":
+            remove = set(json.loads(body or b"{}").get("Ids", []))
+            collection["Items"] = [item_id for item_id in collection["Items"] if item_id not in remove]
+            return 204, None
+        return 404, None
+
+    def _playlists(self, method, parts, params, body):
+        library = self.library
+        if method == "POST" and len(parts) == 1:
+            data = json.loads(body or b"{}")
+            playlist_id = make_id("playlist", data.get("Name"), len(library.playlists), time.time())
+            library.playlists[playlist_id] = {"Name": data.get("Name"), "Entries": []}
+            return 200, {"Id": playlist_id}
+        playlist = library.playlists.get(parts[1]) if len(parts) > 1 else None
+        if playlist is None:
+            return 404, None
+        if len(parts) == 3 and method == "GET":
+            items = []
+            for entry_id, item_id in playlist["Entries"]:
+                if item_id in library.items:
+                    items.append(dict(library.view(library.items[item_id], ["DateCreated"]), PlaylistItemId=entry_id))
+            return 200, {"Items": items, "TotalRecordCount": len(items)}
+        if len(parts) == 3 and method == "POST":
+            added = 0
+            for item_id in (params.get("Ids") or "").split(","):
+                if item_id:
+                    library.next_entry += 1
+                    playlist["Entries"].append((str(library.next_entry), item_id))
+                    added += 1
+            return 200, {"ItemAddedCount": added}
+        if len(parts) == 3 and method == "DELETE":
+            remove = set((params.get("EntryIds") or "").split(","))
+            playlist["Entries"] = [entry for entry in playlist["Entries"] if entry[0] not in remove]
+            return 204, None
+        # POST /Playlists/{id}/Items/{entry id}/Move/{new index}
+        if len(parts) == 6 and parts[4].lower() == "move" and method == "POST":
+            entries = playlist["Entries"]
+            index = next((i for i, entry in enumerate(entries) if entry[0] == parts[3]), None)
+            if index is None:
+                return 404, None
+            entry = entries.pop(index)
+            entries.insert(min(int(parts[5]), len(entries)), entry)
+            return 204, None
+        return 404, None
+
+
+def start_server(movies=1000, tracks=1000, latency=0.0, host="127.0.0.1", port=0, seed=42, libraries=1):
+    server = FakeEmbyServer((host, port), Library(movies, tracks, seed, libraries=libraries), latency=latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Emby server with a synthetic library")
+    parser.add_argument("--movies", type=int, default=1000)
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--libraries", type=int, default=1, help="split movies and music over this many libraries each")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8096)
+    args = parser.parse_args()
+
+    library = Library(args.movies, args.tracks, libraries=args.libraries)
+    server = FakeEmbyServer((args.host, args.port), library, latency=args.latency)
+    print(f"Fake Emby server listening on {server.url} (API key: {server.api_key})")
+    print(f"EMBY_USER_ID={ADMIN_USER} EMBY_LIBRARY_PARENT_ID={','.join(library.movie_libraries)} "
+          f"EMBY_MUSIC_LIBRARY_ID={','.join(library.music_libraries)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
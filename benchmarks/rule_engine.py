@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fake_emby
+
+# Time of the collection rules over a library snapshot: item by item through rules.py, and
+# over the whole snapshot at once with vectorized.RuleEngine, with and without NumPy. All
+# three must pick the same movies.
+#
+#   python benchmarks/rule_engine.py --movies 100000
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(benchmark_dir))
+
+from mediaserver_automation import rules, snapshot, vectorized  # noqa: E402
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+# Item by item, as the jobs evaluate a scan
+def per_item(library):
+    items = library.items()
+    return {
+        rules.DISNEY_COLLECTION_NAME: {item["Id"] for item in items if rules.matches_disney(item)},
+        rules.ROMCOMS_COLLECTION_NAME: {item["Id"] for item in items if item["Type"] == "Movie" and rules.matches_romcom(item)},
+    }
+
+
+# The engine's candidate rows, confirmed by rules.py the way the jobs do it
+def with_engine(library, numpy):
+    candidates = vectorized.RuleEngine(library, numpy=numpy).evaluate()
+    checks = {rules.DISNEY_COLLECTION_NAME: rules.matches_disney, rules.ROMCOMS_COLLECTION_NAME: rules.matches_romcom}
+    return {name: {library.item_id(row) for row in rows if checks[name](library.item(row))} for name, rows in candidates.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure collection rule evaluation over a library snapshot")
+    parser.add_argument("--movies", type=int, default=100000, help="movies in the synthetic library")
+    args = parser.parse_args()
+
+    print(f"Building a snapshot of {args.movies} movies...")
+    source = fake_emby.Library(movies=args.movies, tracks=0)
+    path = os.path.join(tempfile.mkdtemp(prefix="rule-engine-"), snapshot.SNAPSHOT_FILE)
+    snapshot.write(path, [source.view(item, fake_emby.OPTIONAL_FIELDS) for item in source.items.values()])
+
+    numpy = vectorized.import_numpy()
+    with snapshot.Snapshot(path) as library:
+        expected, seconds = timed(lambda: per_item(library))
+        print(f"{'per item (rules.py)':<28} {seconds * 1000:>9.1f} ms")
+        failed = False
+        engines = [("engine, pure Python", False)] + ([("engine, NumPy", numpy)] if numpy else [])
+        for label, engine_numpy in engines:
+            _, seconds = timed(lambda: vectorized.RuleEngine(library, numpy=engine_numpy).evaluate())
+            result = with_engine(library, engine_numpy)
+            same = result == expected
+            failed = failed or not same
+            print(f"{label:<28} {seconds * 1000:>9.1f} ms  {'same result' if same else 'DIFFERENT RESULT'}")
+        if not numpy:
+            print("NumPy is not installed; only the pure Python engine was measured")
+    os.unlink(path)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import fake_emby
+
+# End-to-end benchmark of the collection and playlist jobs against the fake Emby server.
+# Every job runs as its own process so wall time and peak RSS are measured per job, and the
+# server counts every request and byte. Results are compared with a stored baseline.
+#
+#   python benchmarks/run_benchmarks.py --sizes 1000,10000 --latency 0.002
+#   python benchmarks/run_benchmarks.py --update-baseline
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(benchmark_dir)
+
+JOBS = [
+    ("DisneyCollection", os.path.join("Emby", "Collections", "DisneyCollection.py")),
+    ("RomComsCollection", os.path.join("Emby", "Collections", "RomComsCollection.py")),
+    ("UnwatchedMoviesCollection", os.path.join("Emby", "Collections", "UnwatchedMoviesCollection.py")),
+    ("RecentlyAddedPlaylist", os.path.join("Emby", "Playlists", "RecentlyAddedPlaylist.py")),
+]
+RUN_LABELS = ["initial", "repeat"]  # First run creates the collection/playlist, later runs are the nightly steady state
+
+DEFAULT_BASELINE = os.path.join(benchmark_dir, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(benchmark_dir, "latest.json")
+
+
+def server_call(server, path, method="GET"):
+    request = urllib.request.Request(f"{server.url}{path}", method=method)
+    with urllib.request.urlopen(request) as response:
+        body = response.read()
+    return json.loads(body) if body else None
+
+
+# Run one job as a child process and return its measurements. state_dir is the job's STATE_DIR,
+# never the project's own .state: fingerprints, locks and checkpoints left there by real runs
+# would change what the job does, and the job's would be picked up by the next real run.
+def run_job(server, script, log_path, state_dir, extra_env=None):
+    env = dict(os.environ)
+    env.update({
+        "EMBY_SERVER_URL": server.url,
+        "EMBY_API_KEY": server.api_key,
+        "EMBY_USER_ID": fake_emby.ADMIN_USER,
+        "EMBY_LIBRARY_PARENT_ID": fake_emby.MOVIE_LIBRARY_ID,
+        "EMBY_MUSIC_LIBRARY_ID": fake_emby.MUSIC_LIBRARY_ID,
+        "STATE_DIR": state_dir,
+        "PYTHONUNBUFFERED": "1",
+    })
+    env.update(extra_env or {})
+
+    server_call(server, "/__reset", "POST")
+    with open(log_path, "w") as log_file:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(project_root, script)], env=env,
+                                   stdout=log_file, stderr=subprocess.STDOUT, cwd=project_root)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall_time = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    stats = server_call(server, "/__stats")
+
+    return {
+        "exit_code": process.returncode,
+        "wall_seconds": round(wall_time, 3),
+        "requests": stats["total_requests"],
+        "requests_by_endpoint": stats["requests"],
+        "bytes_sent": stats["bytes_sent"],
+        "bytes_received": stats["bytes_received"],
+        "peak_rss_kb": usage.ru_maxrss,  # Kilobytes on Linux
+        "log": log_path,
+    }
+
+
+def run_benchmarks(sizes, latency, runs, jobs, log_dir):
+    results = []
+    for size in sizes:
+        print(f"Building synthetic library with {size} movies and {size} tracks...")
+        server = fake_emby.start_server(movies=size, tracks=size, latency=latency)
+        try:
+            for job_name, script in jobs:
+                # A fresh STATE_DIR per job, kept across its runs so the repeat runs see what the
+                # initial run recorded, as on a host that runs the job every night
+                state_dir = tempfile.mkdtemp(prefix=f"emby-benchmark-state-{job_name}-")
+                try:
+                    for run_index in range(runs):
+                        label = RUN_LABELS[min(run_index, len(RUN_LABELS) - 1)]
+                        if run_index >= len(RUN_LABELS):
+                            label = f"{label}-{run_index}"
+                        log_path = os.path.join(log_dir, f"{size}-{job_name}-{label}.log")
+                        measurement = run_job(server, script, log_path, state_dir)
+                        measurement.update({"size": size, "latency": latency, "job": job_name, "run": label})
+                        results.append(measurement)
+                        print(format_row(measurement))
+                finally:
+                    shutil.rmtree(state_dir, ignore_errors=True)
+        finally:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def result_key(result):
+    return f"{result['size']}|{result['latency']}|{result['job']}|{result['run']}"
+
+
+def format_header():
+    return f"{'size':>7}  {'job':<26} {'run':<8} {'wall_s':>8} {'requests':>9} {'sent_KB':>10} {'recv_KB':>9} {'rss_MB':>7}"
+
+
+def format_row(result):
+    return (f"{result['size']:>7}  {result['job']:<26} {result['run']:<8} {result['wall_seconds']:>8.2f} {result['requests']:>9} "
+            f"{result['bytes_sent'] / 1024:>10.1f} {result['bytes_received'] / 1024:>9.1f} {result['peak_rss_kb'] / 1024:>7.1f}"
+            + ("" if result["exit_code"] == 0 else f"  exit={result['exit_code']}"))
+
+
+# Compare against the baseline; returns a list of human readable regressions
+def find_regressions(results, baseline, time_tolerance, memory_tolerance, request_tolerance):
+    baseline_by_key = {result_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get(result_key(result))
+        if not previous:
+            continue
+        name = f"{result['size']} {result['job']} ({result['run']})"
+        if result["exit_code"] != 0:
+            regressions.append(f"{name}: exited with {result['exit_code']}, see {result['log']}")
+        if result["requests"] > previous["requests"] * (1 + request_tolerance):
+            regressions.append(f"{name}: requests {previous['requests']} -> {result['requests']}")
+        if result["bytes_sent"] > previous["bytes_sent"] * (1 + request_tolerance) + 1024:
+            regressions.append(f"{name}: bytes transferred {previous['bytes_sent']} -> {result['bytes_sent']}")
+        # Ignore sub-second noise on wall time
+        if result["wall_seconds"] > previous["wall_seconds"] * (1 + time_tolerance) + 0.5:
+            regressions.append(f"{name}: wall time {previous['wall_seconds']:.2f}s -> {result['wall_seconds']:.2f}s")
+        if result["peak_rss_kb"] > previous["peak_rss_kb"] * (1 + memory_tolerance):
+            regressions.append(f"{name}: peak RSS {previous['peak_rss_kb'] / 1024:.1f}MB -> {result['peak_rss_kb'] / 1024:.1f}MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Emby jobs against a local fake Emby server")
+    parser.add_argument("--sizes", default="1000", help="comma-separated library sizes (movies and tracks each), e.g. 1000,10000,100000")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency added to every request")
+    parser.add_argument("--runs", type=int, default=2, help="runs per job; the first creates the collection, later ones are steady state")
+    parser.add_argument("--jobs", help="comma-separated subset of jobs to run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed relative wall time increase")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="allowed relative peak RSS increase")
+    parser.add_argument("--request-tolerance", type=float, default=0.0, help="allowed relative request/byte count increase")
+    args = parser.parse_args()
+
+    jobs = JOBS
+    if args.jobs:
+        wanted = args.jobs.split(",")
+        jobs = [job for job in JOBS if job[0] in wanted]
+    sizes = [int(size) for size in args.sizes.split(",")]
+    log_dir = tempfile.mkdtemp(prefix="emby-benchmark-")
+
+    print(format_header())
+    results = run_benchmarks(sizes, args.latency, args.runs, jobs, log_dir)
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0], "results": results}
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nResults written to {args.output} (job logs in {log_dir})")
+
+    if args.update_baseline:
+        baseline = dict(report, results=[{key: value for key, value in result.items() if key != "log"} for result in results])
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --update-baseline to create one")
+        return
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = find_regressions(results, baseline, args.time_tolerance, args.memory_tolerance, args.request_tolerance)
+    if regressions:
+        print("\nREGRESSIONS against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        exit(1)
+    print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold-start time of the CLI. Every command is started as a fresh interpreter, like cron does,
+# and the median wall time is reported next to a bare interpreter. -X importtime confirms
+# that --help does not import requests or python-dotenv.
+#
+#   python benchmarks/startup.py --runs 20
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(benchmark_dir)
+
+COMMANDS = [
+    ("python (bare)", ["-c", "pass"]),
+    ("--help", ["-m", "mediaserver_automation", "--help"]),
+    ("collections --help", ["-m", "mediaserver_automation", "collections", "--help"]),
+    ("playlist --help", ["-m", "mediaserver_automation", "playlist", "--help"]),
+]
+HEAVY_MODULES = ["requests", "dotenv", "websocket"]
+
+
+def time_command(arguments, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], cwd=project_root, stdout=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+# Top-level modules imported by a command, from -X importtime (written to stderr)
+def imported_modules(arguments):
+    result = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=project_root,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI cold-start time")
+    parser.add_argument("--runs", type=int, default=10, help="runs per command; the median is reported")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'command':<24} {'median ms':>10}  heavy imports")
+    for label, arguments in COMMANDS:
+        median = time_command(arguments, args.runs)
+        heavy = sorted(module for module in HEAVY_MODULES if module in imported_modules(arguments))
+        failed = failed or (label != "python (bare)" and bool(heavy))
+        print(f"{label:<24} {median * 1000:>10.1f}  {', '.join(heavy) or '-'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
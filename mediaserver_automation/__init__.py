@@ -0,0 +1 @@
+# Shared building blocks for the Emby collection and playlist jobs
@@ -0,0 +1,5 @@
+import sys
+
+from mediaserver_automation.cli import main
+
+sys.exit(main())
@@ -0,0 +1,51 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from mediaserver_automation import retry
+
+logger = logging.getLogger(__name__)
+
+MAX_PARALLEL = 8  # Requests in flight at once (BULK_PARALLEL)
+PROGRESS_INTERVAL = 2.0  # Seconds between progress lines
+
+# Independent requests of the same kind (deleting hundreds of stale playlists) sent a few at a
+# time instead of one after another, so retry back-off and latency overlap. Progress and an
+# estimate of the time left are logged every few seconds.
+
+
+# Run task(item) for every item; task returns True on success. An exception counts as a failure
+# and does not stop the others, except an open circuit or a passed deadline, which is raised.
+# Returns (succeeded items, failed items), each in input order.
+def run_all(task, items, label, max_workers=MAX_PARALLEL):
+    items = list(items)
+    if not items:
+        return [], []
+
+    def guarded(item):
+        try:
+            return bool(task(item))
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"{label}: failed for {item!r}: {str(e)}")
+            return False
+
+    start = time.perf_counter()
+    last_report = start
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        futures = {executor.submit(guarded, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL and len(results) < len(items):
+                last_report = now
+                rate = len(results) / (now - start)
+                logger.info(f"{label}: {len(results)}/{len(items)} done, {rate:.1f}/s, "
+                            f"about {(len(items) - len(results)) / rate:.0f}s left")
+
+    succeeded = [item for index, item in enumerate(items) if results[index]]
+    failed = [item for index, item in enumerate(items) if not results[index]]
+    logger.info(f"{label}: {len(succeeded)}/{len(items)} succeeded in {time.perf_counter() - start:.1f}s")
+    return succeeded, failed
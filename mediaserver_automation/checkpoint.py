@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import os
+import time
+
+from mediaserver_automation import state
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE = 2 * 3600  # Progress or a write phase older than this is not resumed (CHECKPOINT_MAX_AGE)
+SAVE_INTERVAL = 10  # Seconds between progress saves while a loop runs
+
+# What a job has done so far, in STATE_DIR/checkpoint.<job>.json, so a run that crashes or is
+# killed part of the way through does not lose it:
+#
+#   progress        results of a long per-movie loop, saved every few seconds. A restarted run
+#                   over the same movies picks up the results and only works out the rest.
+#   pending_write   the adds and removes of a collection write phase, saved before the first
+#                   request and trimmed as batches succeed. Batches that failed stay in it. A
+#                   restarted run finishes them before anything else (see
+#                   planner.finish_interrupted_write).
+#
+# Both are dropped once their part of the run completes, and neither is used once it is older
+# than MAX_AGE: play states and library contents move on, and decisions that old are worked
+# out again instead. One file per job. Saves go through state.update and replace only the key
+# that changed, so they never put back a stale copy of the other one. --plan runs skip the
+# job lock and may overlap a real run, so their journal stays in memory (persist=False).
+
+
+def max_age_setting(max_age=None):
+    return float(os.getenv("CHECKPOINT_MAX_AGE", MAX_AGE)) if max_age is None else max_age
+
+
+def items_key(item_ids):
+    digest = hashlib.sha256()
+    for item_id in item_ids:
+        digest.update(item_id.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, job_name, persist=True):
+        self.name = f"checkpoint.{job_name}"
+        self.persist = persist
+        self.document = state.load(self.name)
+        self.progress = None
+        self.progress_saved = False  # Whether the file holds progress that finish() has to drop
+        self.saved_at = 0
+
+    # Write these keys of the document to the file, leaving the others as they are there
+    def save(self, *keys):
+        def change(document):
+            for key in keys:
+                if key in self.document:
+                    document[key] = self.document[key]
+                else:
+                    document.pop(key, None)
+
+        if self.persist:
+            try:
+                state.update(self.name, change)
+            except OSError as e:
+                logger.warning(f"Failed to save checkpoint: {str(e)}")
+        self.saved_at = time.time()
+
+    # Results an interrupted run of this phase already worked out for these same items, by item ID
+    def resume(self, phase, item_ids, max_age=None):
+        max_age = max_age_setting(max_age)
+        key = items_key(item_ids)
+        previous = self.document.get("progress") or {}
+        self.progress_saved = bool(previous)
+        self.progress = {"phase": phase, "key": key, "done": {}}
+        if (previous.get("phase") == phase and previous.get("key") == key
+                and time.time() - previous.get("saved_at", 0) <= max_age):
+            self.progress["done"] = previous.get("done", {})
+            logger.info(f"Resuming {phase}: {len(self.progress['done'])} of {len(item_ids)} items were done by an interrupted run")
+        self.document["progress"] = self.progress
+        self.saved_at = time.time()
+        return self.progress["done"]
+
+    def record(self, item_id, result):
+        self.progress["done"][item_id] = result
+        if time.time() - self.saved_at >= SAVE_INTERVAL:
+            self.progress["saved_at"] = time.time()
+            self.progress_saved = True
+            self.save("progress")
+
+    def finish(self):
+        self.progress = None
+        self.document.pop("progress", None)
+        if self.progress_saved:
+            self.progress_saved = False
+            self.save("progress")
+
+    # The unfinished write phase of an earlier run, unless it is older than max_age
+    def pending_write(self, max_age=None):
+        pending = self.document.get("pending_write")
+        if pending and time.time() - pending.get("started_at", 0) > max_age_setting(max_age):
+            logger.info(f"Not finishing the write phase of '{pending.get('collection')}' interrupted "
+                        f"{(time.time() - pending.get('started_at', 0)) / 3600:.1f} hours ago; this run's plan covers it")
+            self.end_write()
+            return None
+        return pending
+
+    # Write-ahead record of a collection plan, saved before any of it is sent
+    def begin_write(self, plan, parent_id):
+        self.document["pending_write"] = {
+            "collection": plan.name,
+            "collection_id": plan.target_id,
+            "parent_id": parent_id,
+            "to_add": list(plan.to_add),
+            "to_remove": list(plan.to_remove),
+            "started_at": time.time(),
+        }
+        self.save("pending_write")
+
+    def write_progress(self, collection_id=None, added=(), removed=()):
+        pending = self.document.get("pending_write")
+        if not pending:
+            return
+        if collection_id:
+            pending["collection_id"] = collection_id
+        added, removed = set(added), set(removed)
+        pending["to_add"] = [item_id for item_id in pending["to_add"] if item_id not in added]
+        pending["to_remove"] = [item_id for item_id in pending["to_remove"] if item_id not in removed]
+        self.save("pending_write")
+
+    def end_write(self):
+        if self.document.pop("pending_write", None) is not None:
+            self.save("pending_write")
@@ -0,0 +1,182 @@
+import argparse
+import importlib
+import os
+import signal
+import sys
+
+from mediaserver_automation import config, jobs, options, rules
+
+# Single entry point for every job:
+#
+#   mediaserver-automation collections [--only disney,romcoms,unwatched] [--full-watch-sync] [--plan]
+#   mediaserver-automation playlist [--users users.json] [--plan]
+#   mediaserver-automation check-watched [--movie Casper] [--year 1995]
+#   mediaserver-automation search TITLE [--year 1995]
+#   mediaserver-automation check-collection [--collection "Unwatched Movies"]
+#   mediaserver-automation posters [--workers 4]
+#   mediaserver-automation snapshot
+#   mediaserver-automation fan-out --servers servers.json collections|playlist [...]
+#   mediaserver-automation listen | webhook
+#
+# Cron starts this several times a night, so startup stays cheap: this module only imports
+# argparse and the lightweight config/options/rules modules. requests, python-dotenv and the
+# job modules are imported once the command is known (benchmarks/startup.py measures it).
+
+HELP_FLAGS = {"-h", "--help"}
+
+
+def comma_separated(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in jobs.COLLECTION_JOBS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown collection(s): {', '.join(unknown)} (choose from {', '.join(jobs.COLLECTION_JOBS)})")
+    return names
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="mediaserver-automation", description="Keep Emby collections and playlists up to date")
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    collections = commands.add_parser("collections", help="update the Disney, Romantic Comedies and Unwatched Movies collections")
+    collections.add_argument("--only", type=comma_separated, default=list(jobs.COLLECTION_JOBS),
+                             help=f"comma-separated subset of collections to update: {','.join(jobs.COLLECTION_JOBS)}")
+    options.add_snapshot_argument(collections)
+    collections.add_argument("--full-watch-sync", action="store_true",
+                             help="re-read the watch status user's play state for every movie instead of only what changed since the last run")
+    options.add_job_arguments(collections)
+
+    playlist = commands.add_parser("playlist", help="update the Recently Added music playlist")
+    playlist.add_argument("--users", default=os.getenv("PLAYLIST_USERS_FILE"),
+                          help="JSON list of users to keep a playlist for from one library scan (or set PLAYLIST_USERS_FILE)")
+    options.add_job_arguments(playlist)
+
+    check_watched = commands.add_parser("check-watched", help="show the play state of one movie for the admin and the watch status user")
+    check_watched.add_argument("--movie", default="Casper", help="movie title to look up, optionally with the year: \"Casper (1995)\" (default: Casper)")
+    check_watched.add_argument("--year", type=int, help="production year, to pick between movies with the same title")
+    check_watched.add_argument("--refresh-index", action="store_true", help="rebuild the local title index from the server first")
+    options.add_snapshot_argument(check_watched)
+    check_watched.add_argument("--user", default=rules.UNWATCHED_WATCH_STATUS_USER,
+                               help=f"user whose watch status to show next to the admin's (default: {rules.UNWATCHED_WATCH_STATUS_USER})")
+    options.add_common_arguments(check_watched)
+
+    search = commands.add_parser("search", help="find movies by title in the local title index, ranked by similarity")
+    search.add_argument("title", help="title to look for; typos, punctuation and a trailing year are fine")
+    search.add_argument("--year", type=int, help="prefer movies from this year")
+    search.add_argument("--limit", type=int, default=5, help="number of matches to show (default: 5)")
+    search.add_argument("--refresh-index", action="store_true", help="rebuild the local title index from the server first")
+    options.add_snapshot_argument(search)
+    options.add_common_arguments(search)
+
+    check_collection = commands.add_parser("check-collection", help="list movies in a collection that should have been excluded")
+    check_collection.add_argument("--collection", default=rules.UNWATCHED_COLLECTION_NAME,
+                                  help=f"collection to check (default: {rules.UNWATCHED_COLLECTION_NAME})")
+    options.add_snapshot_argument(check_collection)
+    options.add_common_arguments(check_collection)
+
+    posters = commands.add_parser("posters", help="resize and recompress every poster in POSTER_DIR ahead of the next upload")
+    posters.add_argument("--workers", type=int, default=4, help="posters to process in parallel (default: 4)")
+    options.add_common_arguments(posters)
+
+    snapshot = commands.add_parser("snapshot", help="save the movie libraries as a memory-mapped snapshot for --snapshot runs")
+    options.add_common_arguments(snapshot)
+
+    fan_out = commands.add_parser("fan-out", help="run a command against every server in a servers file, concurrently")
+    fan_out.add_argument("--servers", default=os.getenv("SERVERS_FILE"), required=not os.getenv("SERVERS_FILE"),
+                         help="JSON list of servers, each a name plus the environment variables that differ (or set SERVERS_FILE)")
+    fan_out.add_argument("--max-parallel", type=int, default=int(os.getenv("FAN_OUT_PARALLEL", "4")),
+                         help="servers to run at the same time (default: 4, or set FAN_OUT_PARALLEL)")
+    fan_out.add_argument("--server-timeout", type=float, default=float(os.getenv("FAN_OUT_SERVER_TIMEOUT", "3600")),
+                         help="stop a server's run after this many seconds and report it as failed (or set FAN_OUT_SERVER_TIMEOUT)")
+    fan_out.add_argument("--log-level", type=str.upper, choices=options.LOG_LEVELS, help="log level for the fan-out summary")
+    fan_out.add_argument("--log-format", type=str.lower, choices=options.LOG_FORMATS, help="log format for the fan-out summary")
+    fan_out.add_argument("job", nargs=argparse.REMAINDER, metavar="command ...",
+                         help="the command and options to run on every server, e.g. collections --only disney")
+
+    commands.add_parser("listen", help="keep collections and the playlist in sync from Emby WebSocket notifications")
+    commands.add_parser("webhook", help="keep collections and the playlist in sync from Emby webhooks")
+    return parser
+
+
+# Run job modules one after another in this process. A job that fails (or raises) does not
+# stop the ones after it; the exit code is non-zero if any of them failed. Jobs that write to
+# the server run under their locks.JobLock (exclusive=True), except in --plan mode, so a copy
+# started by an overlapping schedule becomes a single follow-up run.
+def run_jobs(args, job_label, module_names, exclusive=False):
+    from mediaserver_automation import locks, logs, metrics, profiling, retry
+
+    # Exit through the atexit handlers on SIGTERM (fan-out's --server-timeout, systemd), so the
+    # metrics textfile, buffered logs and the profile report are still written
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    metrics.setup_job(job_label, args.metrics_file, args.metrics_summary)
+    profiling.setup_job(job_label, args.profile, args.profile_dir)
+    logger = logs.setup_job(job_label, args.log_level, args.log_format)
+
+    job_modules = [importlib.import_module(module_name) for module_name in module_names]
+    # Posters of all selected collections are resized in parallel before the first job needs one
+    poster_names = [job.POSTER for job in job_modules if getattr(job, "POSTER", None)]
+    if len(poster_names) > 1:
+        from mediaserver_automation import posters
+        posters.prepare_all([config.poster_path(name) for name in poster_names])
+
+    # --deadline is per job: every job, and every follow-up run of one, starts with a fresh deadline
+    def run_once(job):
+        retry.setup_job(args.deadline)
+        return job.run(args)
+
+    def run_locked(job):
+        return locks.run_exclusively(job.JOB_NAME, lambda: run_once(job))
+
+    exit_code = 0
+    for job in job_modules:
+        try:
+            if run_locked(job) if exclusive and not args.plan else run_once(job):
+                exit_code = 1
+        except retry.ABORTING_ERRORS as e:
+            logger.error(f"{job.JOB_NAME} stopped: {str(e)}")
+            exit_code = 1
+        except Exception:
+            logger.exception(f"{job.JOB_NAME} failed")
+            exit_code = 1
+    return exit_code
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Option defaults come from the environment, so .env is loaded before the parser is built;
+    # --help skips it so it stays instant
+    if not HELP_FLAGS.intersection(argv):
+        config.load_environment()
+    args = build_parser().parse_args(argv)
+
+    if args.command == "collections":
+        module_names = [jobs.COLLECTION_JOBS[name] for name in dict.fromkeys(args.only)]
+        # A single collection keeps its own name in metrics, profiles and logs
+        job_label = importlib.import_module(module_names[0]).JOB_NAME if len(module_names) == 1 else "Collections"
+        return run_jobs(args, job_label, module_names, exclusive=True)
+    if args.command == "playlist":
+        return run_jobs(args, "RecentlyAddedPlaylist", [jobs.PLAYLIST_JOB], exclusive=True)
+    if args.command == "check-watched":
+        return run_jobs(args, "CheckWatchedStatus", [jobs.CHECK_WATCHED_JOB])
+    if args.command == "search":
+        return run_jobs(args, "SearchMovies", [jobs.SEARCH_JOB])
+    if args.command == "check-collection":
+        return run_jobs(args, "CheckCollection", [jobs.CHECK_COLLECTION_JOB])
+    if args.command == "posters":
+        return run_jobs(args, "PreparePosters", [jobs.POSTERS_JOB])
+    if args.command == "snapshot":
+        return run_jobs(args, "LibrarySnapshot", [jobs.SNAPSHOT_JOB])
+    if args.command == "fan-out":
+        from mediaserver_automation import fanout, logs
+        logs.setup_job("FanOut", args.log_level, args.log_format)
+        return fanout.run(args)
+    if args.command == "listen":
+        from mediaserver_automation import listener
+        return listener.main()
+    if args.command == "webhook":
+        from mediaserver_automation import webhook
+        return webhook.main()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import mimetypes
+import time
+
+from mediaserver_automation.retry import RetryingSession
+
+
+# Thin wrapper around the Emby REST API shared by the jobs and the event-driven updaters
+class EmbyClient:
+    def __init__(self, base_url, api_key):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.session = RetryingSession()
+        self.session.headers.update({
+            'X-MediaBrowser-Token': api_key,
+            'Accept': 'application/json',
+        })
+
+    def request(self, method, endpoint, **kwargs):
+        return self.session.request(method, f"{self.base_url}{endpoint}", **kwargs)
+
+    def get_json(self, endpoint, **kwargs):
+        response = self.request("GET", endpoint, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    # Resolve usernames to user ID GUIDs (case-insensitive); unknown names map to None
+    def find_user_ids(self, *usernames):
+        user_ids = {username: None for username in usernames}
+        for user in self.get_json("/Users"):
+            for username in usernames:
+                if user.get("Name", "").lower() == username.lower():
+                    user_ids[username] = user.get("Id")
+        return user_ids
+
+    # Fetch several items in one request, restricted to a library when parent_id is given
+    def get_items_by_id(self, user_id, item_ids, fields, parent_id=None, **params):
+        if not item_ids:
+            return []
+        params.update({
+            "Ids": ','.join(item_ids),
+            "Fields": fields,
+            "Recursive": True,
+        })
+        if parent_id:
+            params["ParentId"] = parent_id
+        return self.get_json(f"/Users/{user_id}/Items", params=params).get("Items", [])
+
+    # The collection's listing entry, including its ChildCount, or None
+    def find_collection(self, user_id, collection_name):
+        params = {"Recursive": "true", "IncludeItemTypes": "boxset", "Fields": "ChildCount"}
+        collections = self.get_json(f"/users/{user_id}/items", params=params).get("Items", [])
+        for collection in collections:
+            if collection.get("Name") == collection_name:
+                return collection
+        return None
+
+    def find_collection_id(self, user_id, collection_name):
+        collection = self.find_collection(user_id, collection_name)
+        return collection.get("Id") if collection else None
+
+    # Get current items in a collection, trying the same endpoints as the collection scripts
+    def get_collection_item_ids(self, user_id, collection_id):
+        attempts = [
+            (f"/Collections/{collection_id}/Items", None),
+            (f"/Users/{user_id}/Items/{collection_id}/Items", None),
+            ("/Items", {"ParentId": collection_id, "Recursive": True}),
+        ]
+        for endpoint, params in attempts:
+            response = self.request("GET", endpoint, params=params)
+            if response.status_code == 200:
+                return [item.get('Id') for item in response.json().get("Items", [])]
+        return None
+
+    # Emby needs at least one item to create a collection
+    def create_collection(self, collection_name, parent_id, item_ids):
+        collection_params = {
+            'Name': collection_name,
+            'IsLocked': False,
+            'ParentId': parent_id,
+            'Ids': ','.join(item_ids),
+        }
+        response = self.request("POST", "/Collections", params=collection_params)
+        if response.status_code == 200:
+            return response.json().get("Id")
+        return None
+
+    # Add items in batches to avoid request size limitations, optionally pausing between batches
+    def add_to_collection(self, collection_id, item_ids, batch_size=20, batch_delay=0):
+        ok = True
+        for i in range(0, len(item_ids), batch_size):
+            batch = item_ids[i:i + batch_size]
+            response = self.request("POST", f"/Collections/{collection_id}/Items", params={'Ids': ','.join(batch)})
+            ok = ok and response.status_code in [200, 204]
+            if batch_delay and i + batch_size < len(item_ids):
+                time.sleep(batch_delay)
+        return ok
+
+    def remove_from_collection(self, collection_id, item_ids):
+        response = self.request("DELETE", f"/Collections/{collection_id}/Items", params={'Ids': ','.join(item_ids)})
+        if response.status_code in [200, 204]:
+            return True
+        # Fall back to the POST variant some server versions expect
+        response = self.request("POST", f"/Collections/{collection_id}/Items/Delete", json={'Ids': list(item_ids)})
+        return response.status_code in [200, 204]
+
+    def find_playlist_id(self, playlist_name):
+        playlist_params = {
+            "Format": "json",
+            "IncludeItemTypes": "Playlist",
+            "Recursive": True,
+        }
+        for playlist in self.get_json("/Items", params=playlist_params).get("Items", []):
+            if playlist["Name"] == playlist_name:
+                return playlist["Id"]
+        return None
+
+    def create_playlist(self, playlist_name, user_id):
+        response = self.request("POST", "/Playlists", json={"Name": playlist_name, "UserId": user_id})
+        if response.status_code == 200:
+            return response.json()["Id"]
+        return None
+
+    # Playlist entries carry both the item Id and the PlaylistItemId needed for removal
+    def get_playlist_entries(self, playlist_id):
+        return self.get_json(f"/Playlists/{playlist_id}/Items").get("Items", [])
+
+    def add_to_playlist(self, playlist_id, user_id, item_ids):
+        response = self.request("POST", f"/Playlists/{playlist_id}/Items", params={"UserId": user_id, "Ids": ','.join(item_ids)})
+        if response.status_code in [200, 204]:
+            return True
+        # Fall back to the JSON body variant some server versions expect
+        response = self.request("POST", f"/Items/{playlist_id}/PlaylistItems", json={"Ids": list(item_ids), "UserId": user_id})
+        return response.status_code in [200, 204]
+
+    def remove_from_playlist(self, playlist_id, entry_ids):
+        response = self.request("DELETE", f"/Playlists/{playlist_id}/Items", params={"EntryIds": ','.join(entry_ids)})
+        return response.status_code in [200, 204]
+
+    # Passing the open file streams it from disk instead of reading the whole image into memory
+    def upload_image(self, item_id, image_path, image_type="Primary"):
+        content_type = mimetypes.guess_type(image_path)[0] or "application/octet-stream"
+        with open(image_path, 'rb') as image_file:
+            return self.request("POST", f"/Items/{item_id}/Images/{image_type}", data=image_file,
+                                headers={"Content-Type": content_type})
@@ -0,0 +1,68 @@
+import os
+
+from mediaserver_automation import rules
+
+# Get the project root directory for finding the .env file and the custom posters
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+env_path = os.path.join(project_root, '.env')
+default_poster_dir = os.path.join(project_root, "Emby", "Collections", "Custom Posters")
+default_state_dir = os.path.join(project_root, ".state")
+
+
+# Load environment variables from the .env file in the project root, or from the working
+# directory when the package is installed rather than run from a checkout
+def load_environment():
+    try:
+        from dotenv import find_dotenv, load_dotenv
+    except ImportError:
+        print("Error: The 'python-dotenv' module is not installed.")
+        print("Please install it with: pip install python-dotenv")
+        print("Alternatively, you can set environment variables manually.")
+        return
+    load_dotenv(dotenv_path=env_path if os.path.exists(env_path) else find_dotenv(usecwd=True))
+
+
+# Collection poster images live next to the collection scripts unless POSTER_DIR says otherwise
+def poster_dir():
+    return os.getenv("POSTER_DIR", default_poster_dir)
+
+
+def poster_path(filename):
+    return os.path.join(poster_dir(), filename)
+
+
+# What the jobs remember between runs lives in .state in the project root unless STATE_DIR says otherwise
+def state_path(filename):
+    return os.path.join(os.getenv("STATE_DIR", default_state_dir), filename)
+
+
+# Comma-separated list of IDs, e.g. several libraries in EMBY_LIBRARY_PARENT_ID
+def parse_ids(value):
+    return [item_id.strip() for item_id in (value or "").split(",") if item_id.strip()]
+
+
+# Configuration shared by every job, read from environment variables
+class Settings:
+    def __init__(self):
+        self.base_url = os.getenv("EMBY_SERVER_URL")  # Emby server URL
+        self.api_key = os.getenv("EMBY_API_KEY")  # Emby API Key Generated in Server Settings
+        self.username = os.getenv("EMBY_USER_ID")  # Emby username
+        self.library_parent_ids = parse_ids(os.getenv("EMBY_LIBRARY_PARENT_ID"))  # Emby movie library Parent ID(s), comma-separated
+        self.music_library_ids = parse_ids(os.getenv("EMBY_MUSIC_LIBRARY_ID"))  # Emby music library Parent ID(s), comma-separated
+        self.library_parent_id = self.library_parent_ids[0] if self.library_parent_ids else None  # New collections go here
+        self.music_library_id = self.music_library_ids[0] if self.music_library_ids else None
+        self.playlist_name = os.getenv("PLAYLIST_NAME", "Recently Added")
+        self.number_of_days = int(os.getenv("NUMBER_OF_DAYS", "90"))
+        self.websocket_url = os.getenv("EMBY_WEBSOCKET_URL")  # Optional override, e.g. a local stand-in server
+        self.event_debounce_seconds = float(os.getenv("EVENT_DEBOUNCE_SECONDS", "2"))  # Quiet period before applying queued changes
+        self.webhook_host = os.getenv("WEBHOOK_HOST", "127.0.0.1")  # Set to 0.0.0.0 to accept other hosts; needs WEBHOOK_TOKEN
+        self.webhook_port = int(os.getenv("WEBHOOK_PORT", "8099"))
+        self.webhook_token = os.getenv("WEBHOOK_TOKEN")  # Shared secret, passed as ?token=... on the webhook URL
+        self.metrics_port = int(os.getenv("METRICS_PORT", "0"))  # Serve /metrics on this port in listener mode (0 = off)
+
+        exclude_items_str = os.getenv("EXCLUDE_ITEMS", rules.DEFAULT_EXCLUDE_ITEMS)
+        self.exclude_items = [item.strip() for item in exclude_items_str.split(",")]
+
+    # Return the names of required variables that are not set
+    def missing(self, *names):
+        return [name for name in names if not os.getenv(name)]
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mediaserver_automation import config
+
+logger = logging.getLogger(__name__)
+
+# Run one command (collections, playlist, ...) against several Emby servers at once. The
+# servers file is a JSON list; each entry has a "name" and the environment variables that
+# differ for that server, on top of the usual environment and .env:
+#
+#   [
+#     {"name": "home", "EMBY_SERVER_URL": "http://home:8096", "EMBY_API_KEY": "...",
+#      "EMBY_LIBRARY_PARENT_ID": "...", "EMBY_MUSIC_LIBRARY_ID": "..."},
+#     {"name": "cabin", "EMBY_SERVER_URL": "http://cabin:8096", "EMBY_API_KEY": "...",
+#      "EMBY_LIBRARY_PARENT_ID": "...", "RATE_LIMIT": "10"}
+#   ]
+#
+# Every server runs in its own process, so connection pools, retries, the circuit breaker,
+# RATE_LIMIT and metrics are all per server. State (poster hashes, circuit state) goes to
+# STATE_DIR/servers/<name> unless the entry sets STATE_DIR. A server that fails or runs past
+# --server-timeout is reported in the summary; the others carry on.
+
+SERVER_TIMEOUT = 3600
+TERMINATE_GRACE = 10  # Seconds a timed-out server gets to exit (and write its metrics) before it is killed
+STATUS_LABEL = re.compile(r'status="([^"]*)"')
+
+
+class ServerResult:
+    def __init__(self, name):
+        self.name = name
+        self.status = "not started"
+        self.exit_code = None
+        self.seconds = 0.0
+        self.requests = None
+        self.retries = None
+        self.errors = None
+
+    def ok(self):
+        return self.status == "ok"
+
+
+def load_servers(path):
+    with open(path) as servers_file:
+        servers = json.load(servers_file)
+    if not isinstance(servers, list) or not servers:
+        raise ValueError(f"{path} must contain a non-empty JSON list of servers")
+    names = set()
+    for index, server in enumerate(servers):
+        name = server.get("name") if isinstance(server, dict) else None
+        if not name:
+            raise ValueError(f"Server #{index + 1} in {path} has no name")
+        if name in names:
+            raise ValueError(f"Server name '{name}' appears more than once in {path}")
+        names.add(name)
+    return servers
+
+
+# Sum the counters of a metrics textfile written by the child: (requests, retries, failed requests).
+# Every attempt that did not get a 2xx response is a failed request, 429s and the other statuses
+# retry.RetryPolicy retries included, as are connection errors (status="error").
+def read_metrics(path):
+    requests = retries = errors = 0
+    with open(path) as metrics_file:
+        for line in metrics_file:
+            if line.startswith("emby_requests_total{"):
+                count = int(float(line.rsplit(" ", 1)[1]))
+                requests += count
+                status = STATUS_LABEL.search(line)
+                if not status or not status.group(1).startswith("2"):
+                    errors += count
+            elif line.startswith("emby_request_retries_total{"):
+                retries += int(float(line.rsplit(" ", 1)[1]))
+    return requests, retries, errors
+
+
+class FanOut:
+    def __init__(self, servers, command, server_timeout=SERVER_TIMEOUT, stream=None):
+        self.servers = servers
+        self.command = command
+        self.server_timeout = server_timeout
+        self.stream = stream or sys.stdout
+        self.output_lock = threading.Lock()
+        self.metrics_dir = tempfile.mkdtemp(prefix="fanout-metrics-")
+
+    def environment(self, server):
+        env = dict(os.environ)
+        env.update({key: str(value) for key, value in server.items() if key != "name"})
+        if "STATE_DIR" not in server:
+            env["STATE_DIR"] = os.path.join(config.state_path("servers"), server["name"])
+        env["METRICS_TEXTFILE"] = os.path.join(self.metrics_dir, f"{server['name']}.prom")
+        return env
+
+    # Copy the child's output line by line, prefixed with the server name
+    def relay(self, name, pipe):
+        for line in pipe:
+            with self.output_lock:
+                self.stream.write(f"[{name}] {line}")
+                self.stream.flush()
+
+    def run_server(self, server):
+        result = ServerResult(server["name"])
+        env = self.environment(server)
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen([sys.executable, "-m", "mediaserver_automation", *self.command], env=env,
+                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        except OSError as e:
+            result.status = f"failed to start: {str(e)}"
+            return result
+
+        relay = threading.Thread(target=self.relay, args=(result.name, process.stdout), daemon=True)
+        relay.start()
+        try:
+            result.exit_code = process.wait(timeout=self.server_timeout)
+            result.status = "ok" if result.exit_code == 0 else "failed"
+        except subprocess.TimeoutExpired:
+            # SIGTERM first, so the job exits through its atexit handlers and the summary still
+            # gets the request counts of exactly the server it is meant to explain
+            process.terminate()
+            try:
+                process.wait(timeout=TERMINATE_GRACE)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            result.status = f"timed out after {self.server_timeout:g}s"
+        relay.join(timeout=5)
+        result.seconds = time.perf_counter() - start
+
+        if os.path.exists(env["METRICS_TEXTFILE"]):
+            result.requests, result.retries, result.errors = read_metrics(env["METRICS_TEXTFILE"])
+        return result
+
+    def run(self, max_parallel):
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(self.servers)))) as executor:
+            return list(executor.map(self.run_server, self.servers))
+
+
+def print_summary(command, results):
+    lines = [f"\nFan-out summary for '{' '.join(command)}':"]
+    for result in results:
+        counts = "" if result.requests is None else \
+            f"  {result.requests} requests, {result.retries} retries, {result.errors} failed"
+        lines.append(f"  {result.name:<20} {result.status:<24} {result.seconds:7.1f}s{counts}")
+    failed = [result.name for result in results if not result.ok()]
+    if len(failed) == len(results):
+        lines.append(f"All {len(results)} servers failed")
+    elif failed:
+        lines.append(f"Partial failure: {len(failed)} of {len(results)} servers did not complete ({', '.join(failed)})")
+    else:
+        lines.append(f"All {len(results)} servers completed")
+    logger.info("\n".join(lines), extra={"servers_failed": len(failed), "servers_total": len(results)})
+
+
+def run(args):
+    if not args.job:
+        logger.error("No command given, e.g. fan-out --servers servers.json collections")
+        return 2
+    try:
+        servers = load_servers(args.servers)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to load servers: {str(e)}")
+        return 1
+
+    logger.info(f"Running '{' '.join(args.job)}' on {len(servers)} servers")
+    fan_out = FanOut(servers, args.job, server_timeout=args.server_timeout)
+    try:
+        results = fan_out.run(args.max_parallel)
+    finally:
+        shutil.rmtree(fan_out.metrics_dir, ignore_errors=True)
+    print_summary(args.job, results)
+    return 0 if all(result.ok() for result in results) else 1
@@ -0,0 +1,170 @@
+import datetime
+import logging
+from datetime import timezone
+
+from mediaserver_automation import planner, rules
+
+logger = logging.getLogger(__name__)
+
+
+# Keeps the collections and the Recently Added playlist up to date from individual item
+# changes. Membership is loaded once in start(); after that every batch of changed items
+# is re-evaluated against the rules and only the resulting adds and removes are sent.
+class IncrementalUpdater:
+    def __init__(self, client, settings):
+        self.client = client
+        self.settings = settings
+        self.admin_user_id = None
+        self.watch_status_user_id = None
+        self.collections = {}  # collection name -> {"id": ..., "members": set of item IDs}
+        self.playlist_id = None
+        self.playlist_entries = {}  # item ID -> PlaylistItemId
+
+    def start(self):
+        user_ids = self.client.find_user_ids(self.settings.username, rules.UNWATCHED_WATCH_STATUS_USER)
+        self.admin_user_id = user_ids[self.settings.username]
+        self.watch_status_user_id = user_ids[rules.UNWATCHED_WATCH_STATUS_USER]
+        if not self.admin_user_id:
+            raise RuntimeError(f"Could not find admin user ID for username: {self.settings.username}")
+        if not self.watch_status_user_id:
+            raise RuntimeError(f"Could not find user ID for watch status username: {rules.UNWATCHED_WATCH_STATUS_USER}")
+
+        for collection_name, _, _, _ in rules.COLLECTION_RULES:
+            collection_id = self.client.find_collection_id(self.admin_user_id, collection_name)
+            members = set()
+            if collection_id:
+                members = set(self.client.get_collection_item_ids(self.admin_user_id, collection_id) or [])
+            self.collections[collection_name] = {"id": collection_id, "members": members}
+            logger.info(f"Tracking collection '{collection_name}' with {len(members)} items")
+
+        if self.settings.music_library_id:
+            self.playlist_id = self.client.find_playlist_id(self.settings.playlist_name)
+            self._reload_playlist_entries()
+            logger.info(f"Tracking playlist '{self.settings.playlist_name}' with {len(self.playlist_entries)} items")
+
+    # Users whose play state decides Unwatched Movies membership (see rules.unwatched_exclusion_reason)
+    def play_state_user_ids(self):
+        return [self.admin_user_id, self.watch_status_user_id]
+
+    def _reload_playlist_entries(self):
+        self.playlist_entries = {}
+        if self.playlist_id:
+            for entry in self.client.get_playlist_entries(self.playlist_id):
+                self.playlist_entries[entry["Id"]] = entry["PlaylistItemId"]
+
+    # Items deleted from the library disappear from collections and playlists server-side,
+    # so only the local view of membership needs updating
+    def forget(self, item_ids):
+        for state in self.collections.values():
+            state["members"].difference_update(item_ids)
+        for item_id in item_ids:
+            self.playlist_entries.pop(item_id, None)
+
+    # Work queue handler: drop deleted items, then re-evaluate everything else that changed
+    def apply_changes(self, changed_ids, removed_ids):
+        if removed_ids:
+            self.forget(removed_ids)
+        self.process(changed_ids)
+
+    # Re-evaluate the given items against every rule and apply the minimal membership changes
+    def process(self, item_ids):
+        item_ids = list(dict.fromkeys(item_ids))
+        if not item_ids:
+            return
+        self._process_movies(item_ids)
+        if self.settings.music_library_id:
+            self._process_tracks(item_ids)
+
+    # The changed items that belong to one of the configured libraries (any library if none is set)
+    def _get_library_items(self, item_ids, fields, library_ids, **params):
+        items = []
+        for library_id in library_ids or [None]:
+            items.extend(self.client.get_items_by_id(self.admin_user_id, item_ids, fields, parent_id=library_id, **params))
+        return list({item["Id"]: item for item in items}.values())
+
+    def _process_movies(self, item_ids):
+        movies = self._get_library_items(item_ids, rules.MOVIE_FIELDS, self.settings.library_parent_ids, MediaTypes="Video")
+        if not movies:
+            return
+
+        # Listed as the admin user, so each movie carries the admin user's UserData; the watch
+        # status user's is asked for separately, and a movie played by either one is not unwatched
+        watch_user_data = {}
+        for item in self.client.get_items_by_id(self.watch_status_user_id, [movie["Id"] for movie in movies], "UserData"):
+            watch_user_data[item["Id"]] = item.get("UserData", {})
+
+        for collection_name, predicate, item_type, removes in rules.COLLECTION_RULES:
+            members = self.collections[collection_name]["members"]
+            to_add = []
+            to_remove = []
+            for movie in movies:
+                if item_type is not None and movie.get("Type") != item_type:
+                    wanted = False
+                elif predicate is rules.matches_unwatched:
+                    wanted = predicate(movie, watch_user_data.get(movie["Id"], {}))
+                else:
+                    wanted = predicate(movie)
+                if wanted and movie["Id"] not in members:
+                    logger.info(f"{collection_name}: adding {movie.get('Name')}")
+                    to_add.append(movie["Id"])
+                elif not wanted and removes and movie["Id"] in members:
+                    logger.info(f"{collection_name}: removing {movie.get('Name')}")
+                    to_remove.append(movie["Id"])
+            self._apply_collection_changes(collection_name, to_add, to_remove)
+
+    def _apply_collection_changes(self, collection_name, to_add, to_remove):
+        state = self.collections[collection_name]
+        if not state["id"]:
+            if to_add:
+                state["id"] = self.client.create_collection(collection_name, self.settings.library_parent_id, to_add)
+                if state["id"]:
+                    state["members"].update(to_add)
+                    logger.info(f"Created collection '{collection_name}' with {len(to_add)} items")
+                else:
+                    logger.error(f"Failed to create collection '{collection_name}'")
+            return
+
+        if to_add or to_remove:
+            planner.forget_applied(state["id"])
+        if to_remove:
+            if self.client.remove_from_collection(state["id"], to_remove):
+                state["members"].difference_update(to_remove)
+            else:
+                logger.error(f"Failed to remove {len(to_remove)} items from '{collection_name}'")
+        if to_add:
+            if self.client.add_to_collection(state["id"], to_add):
+                state["members"].update(to_add)
+            else:
+                logger.error(f"Failed to add {len(to_add)} items to '{collection_name}'")
+
+    def _process_tracks(self, item_ids):
+        tracks = self._get_library_items(item_ids, rules.AUDIO_FIELDS, self.settings.music_library_ids, MediaTypes="Audio")
+        if not tracks:
+            return
+
+        now = datetime.datetime.now(timezone.utc)
+        to_add = []
+        entries_to_remove = []
+        for track in tracks:
+            wanted = (rules.is_recently_added(track, now, self.settings.number_of_days)
+                      and rules.recently_added_exclusion_reason(track, self.settings.exclude_items) is None)
+            if wanted and track["Id"] not in self.playlist_entries:
+                logger.info(f"{self.settings.playlist_name}: adding {track['Name']}")
+                to_add.append(track["Id"])
+            elif not wanted and track["Id"] in self.playlist_entries:
+                logger.info(f"{self.settings.playlist_name}: removing {track['Name']}")
+                entries_to_remove.append(self.playlist_entries[track["Id"]])
+
+        if not to_add and not entries_to_remove:
+            return
+        if not self.playlist_id:
+            self.playlist_id = self.client.create_playlist(self.settings.playlist_name, self.admin_user_id)
+            if not self.playlist_id:
+                logger.error(f"Failed to create playlist '{self.settings.playlist_name}'")
+                return
+        if entries_to_remove and not self.client.remove_from_playlist(self.playlist_id, entries_to_remove):
+            logger.error(f"Failed to remove {len(entries_to_remove)} items from '{self.settings.playlist_name}'")
+        if to_add and not self.client.add_to_playlist(self.playlist_id, self.admin_user_id, to_add):
+            logger.error(f"Failed to add {len(to_add)} items to '{self.settings.playlist_name}'")
+        # New entries only get their PlaylistItemId once added
+        self._reload_playlist_entries()
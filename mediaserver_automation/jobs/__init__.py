@@ -0,0 +1,14 @@
+# One module per job. Each exposes JOB_NAME, DESCRIPTION and run(args), which returns the exit
+# code. The CLI imports a job module only when that job runs.
+
+COLLECTION_JOBS = {
+    "disney": "mediaserver_automation.jobs.disney",
+    "romcoms": "mediaserver_automation.jobs.romcoms",
+    "unwatched": "mediaserver_automation.jobs.unwatched",
+}
+PLAYLIST_JOB = "mediaserver_automation.jobs.recently_added"
+CHECK_WATCHED_JOB = "mediaserver_automation.jobs.check_watched"
+CHECK_COLLECTION_JOB = "mediaserver_automation.jobs.check_collection"
+SEARCH_JOB = "mediaserver_automation.jobs.search"
+POSTERS_JOB = "mediaserver_automation.jobs.posters"
+SNAPSHOT_JOB = "mediaserver_automation.jobs.snapshot"
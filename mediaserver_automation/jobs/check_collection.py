@@ -0,0 +1,159 @@
+import os
+
+from mediaserver_automation import config, logs, people, rules, snapshot
+from mediaserver_automation.client import EmbyClient
+
+JOB_NAME = "CheckCollection"
+DESCRIPTION = "List movies in a collection that should have been excluded (Shirley Temple checks)"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+def run(args):
+    collection_name = args.collection
+
+    # Get configuration from environment variables
+    base_url = os.getenv("EMBY_SERVER_URL")
+    api_key = os.getenv("EMBY_API_KEY")
+    username = os.getenv("EMBY_USER_ID")
+
+    client = EmbyClient(base_url, api_key)
+
+    # Get admin user ID
+    admin_user_id = None
+    try:
+        users = client.get_json("/Users")
+
+        for user in users:
+            if user.get("Name", "").lower() == username.lower():
+                admin_user_id = user.get("Id")
+
+                logger.info(f"Found admin user ID: {admin_user_id}")
+                break
+
+        if not admin_user_id:
+            logger.error("Could not find admin user ID")
+            return 1
+    except Exception as e:
+        logger.error(f"Failed to get user IDs: {str(e)}")
+        return 1
+
+    # Find collection ID
+    collection_id = None
+    try:
+        collection_response = client.request("GET", f"/users/{admin_user_id}/items?Recursive=true&IncludeItemTypes=boxset")
+        if collection_response.status_code == 200:
+            collections = collection_response.json().get("Items", [])
+            logger.info(f"Found {len(collections)} collections")
+            for collection in collections:
+                if collection.get("Name") == collection_name:
+                    collection_id = collection.get("Id")
+                    logger.info(f"Found collection: {collection_name} with ID: {collection_id}")
+                    break
+    except Exception as e:
+        logger.error(f"Failed to find collection: {str(e)}")
+        return 1
+
+    if not collection_id:
+        logger.error(f"Collection '{collection_name}' not found")
+        return 1
+
+    # Movies Shirley Temple appears in, so the collection listing does not need every cast list.
+    # With --snapshot the metadata and the cast come from the library snapshot instead.
+    library = None
+    try:
+        if args.snapshot:
+            library = snapshot.load(client, config.parse_ids(os.getenv("EMBY_LIBRARY_PARENT_ID")))
+            person_index = people.PersonIndex.from_snapshot(library, [rules.UNWATCHED_EXCLUDED_PERSON], exact=True)
+        else:
+            person_index = people.PersonIndex.build(client, [rules.UNWATCHED_EXCLUDED_PERSON], exact=True)
+    except Exception as e:
+        logger.error(f"Failed to look up Shirley Temple: {str(e)}")
+        return 1
+
+    # Get all movies in the collection using different API endpoint
+    try:
+        # Try using the Items endpoint first
+        movies_response = client.request(
+            "GET",
+            f"/Users/{admin_user_id}/Items",
+            params={
+                "ParentId": collection_id,
+                "Recursive": True,
+                "IncludeItemTypes": "Movie",
+                "Fields": None if library else "Path,Overview",  # None leaves it out
+                "Limit": 2000  # Large limit to get all items
+            }
+        )
+
+        if movies_response.status_code != 200:
+            logger.error(f"Failed to get movies: {movies_response.status_code} - {movies_response.text}")
+            return 1
+
+        movies = movies_response.json().get("Items", [])
+        logger.info(f"Found {len(movies)} movies in collection")
+        if library:
+            # A movie added since the snapshot was saved: save it again, once
+            if any(library.row_of(movie.get("Id")) is None for movie in movies):
+                logger.info("Collection has movies that are not in the library snapshot, rebuilding it")
+                library.close()
+                library = snapshot.load(client, library.library_ids, refresh=True)
+                person_index = people.PersonIndex.from_snapshot(library, [rules.UNWATCHED_EXCLUDED_PERSON], exact=True)
+            with library:
+                movies = [library.get(movie.get("Id")) or movie for movie in movies]
+
+        # Create a list of movies that contain "Shirley Temple" in their path or metadata
+        shirley_temple_movies = []
+
+        for movie in movies:
+            movie_name = movie.get('Name', '')
+            path = movie.get('Path', '')
+            overview = movie.get('Overview', '')
+
+            has_shirley = False
+            reason = []
+
+            # Check path
+            if path and "shirley temple" in path.lower():
+                has_shirley = True
+                reason.append("path contains 'Shirley Temple'")
+
+            # Check title and overview
+            if "shirley temple" in movie_name.lower():
+                has_shirley = True
+                reason.append("title contains 'Shirley Temple'")
+
+            if overview and "shirley temple" in overview.lower():
+                has_shirley = True
+                reason.append("overview contains 'Shirley Temple'")
+
+            # Check people
+            if movie.get("Id") in person_index:
+                has_shirley = True
+                reason.append("stars Shirley Temple")
+
+            if has_shirley:
+                shirley_temple_movies.append({
+                    "name": movie_name,
+                    "id": movie.get("Id"),
+                    "path": path,
+                    "reason": reason
+                })
+
+        # Print movies with Shirley Temple
+        if shirley_temple_movies:
+            lines = ["\n=== SHIRLEY TEMPLE MOVIES FOUND IN COLLECTION ==="]
+            for i, movie in enumerate(shirley_temple_movies, 1):
+                lines.append(f"{i}. {movie['name']}")
+                lines.append(f"   Path: {movie['path']}")
+                lines.append(f"   Reason: {', '.join(movie['reason'])}")
+                lines.append(f"   ID: {movie['id']}\n")
+            lines.append(f"Found {len(shirley_temple_movies)} Shirley Temple movies that should be excluded")
+            logger.info("\n".join(lines))
+        else:
+            logger.info("No Shirley Temple movies found in the collection!")
+    except Exception as e:
+        logger.error(f"Failed to get movies: {str(e)}")
+        return 1
+    return 0
+
@@ -0,0 +1,95 @@
+import json
+import os
+
+from mediaserver_automation import logs, retry, titles
+from mediaserver_automation.client import EmbyClient
+
+JOB_NAME = "CheckWatchedStatus"
+DESCRIPTION = "Show the admin's and the watch status user's play state for one movie"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+def run(args):
+    movie_name_to_check = args.movie
+    watch_status_user = args.user  # The user whose watch status we want to check
+
+    # Get configuration from environment variables
+    base_url = os.getenv("EMBY_SERVER_URL")
+    api_key = os.getenv("EMBY_API_KEY")
+    username = os.getenv("EMBY_USER_ID")
+
+    client = EmbyClient(base_url, api_key)
+
+    # Get user IDs
+    admin_user_id = None
+    watch_status_user_id = None
+
+    try:
+        users = client.get_json("/Users")
+
+        for user in users:
+            user_name = user.get("Name", "")
+            if user_name.lower() == username.lower():
+                admin_user_id = user.get("Id")
+                logger.info(f"Found admin user ID: {admin_user_id} for username: {username}")
+
+            if user_name.lower() == watch_status_user.lower():
+                watch_status_user_id = user.get("Id")
+                logger.info(f"Found watch status user ID: {watch_status_user_id} for username: {watch_status_user}")
+
+        if not admin_user_id or not watch_status_user_id:
+            logger.error("Could not find required user IDs")
+            return 1
+    except Exception as e:
+        logger.error(f"Failed to get user IDs: {str(e)}")
+        return 1
+
+    # Find the movie ID in the local title index (built from the server when missing or stale)
+    try:
+        movie, matches = titles.find_movie(client, movie_name_to_check, args.year, refresh=args.refresh_index,
+                                          use_snapshot=args.snapshot)
+    except Exception as e:
+        logger.error(f"Failed to search for movie: {str(e)}")
+        return 1
+    if not movie:
+        logger.error(f"No movies found with name: {movie_name_to_check}")
+        if matches:
+            logger.info("Closest titles: " + ", ".join(f"{entry[1]} ({entry[2]})" for _, entry in matches))
+        return 1
+
+    movie_id, name, year, path = movie
+    logger.info(f"Found movie: {name} ({year}) | ID: {movie_id} | Path: {path}")
+    # Same title, different movie: say which one was picked
+    others = [entry for _, entry in matches[1:] if titles.normalize(entry[1]) == titles.normalize(name)]
+    if others:
+        logger.warning(f"{len(others) + 1} movies are called '{name}'; using {year}. Pass --year to pick another: "
+                       + ", ".join(str(entry[2]) for entry in others))
+
+    # Check watch status for both users
+    for user_id, user_name in [(admin_user_id, username), (watch_status_user_id, watch_status_user)]:
+        try:
+            # Get user data for the specific item to check play state
+            user_data_response = client.request("GET", f"/Users/{user_id}/Items/{movie_id}/UserData")
+
+            if user_data_response.status_code == 200:
+                user_data = user_data_response.json()
+                logger.info(
+                    f"\nWatch status for user '{user_name}':\n"
+                    f"  Marked as watched (Played): {user_data.get('Played', False)}\n"
+                    f"  Play percentage: {user_data.get('PlayedPercentage', 0)}%\n"
+                    f"  Play count: {user_data.get('PlayCount', 0)}\n"
+                    f"  Last played: {user_data.get('LastPlayedDate', 'Never')}\n"
+                    # Debug - show full user data
+                    f"\nFull user data:\n{json.dumps(user_data, indent=2)}"
+                )
+            else:
+                logger.error(f"Failed to get watch status for user '{user_name}': {user_data_response.status_code} - {user_data_response.text}")
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to check watch status for user '{user_name}': {str(e)}")
+
+    logger.info("\nFinished checking watch status.")
+    return 0
+
@@ -0,0 +1,184 @@
+import os
+
+from mediaserver_automation import checkpoint, config, libraries, logs, planner, profiling, retry, rules, snapshot, studios, vectorized
+from mediaserver_automation.client import EmbyClient
+
+JOB_NAME = "DisneyCollection"
+DESCRIPTION = "Update the Disney collection"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+def run(args):
+    collection_name = rules.DISNEY_COLLECTION_NAME ## Name, studios and ratings are defined in mediaserver_automation/rules.py
+
+    # Get configuration from environment variables
+    base_url = os.getenv("EMBY_SERVER_URL") ## Emby server URL
+    api_key = os.getenv("EMBY_API_KEY") ## Emby API Key Generated in Server Settings
+    username = os.getenv("EMBY_USER_ID") ## Emby username
+    libraryParentIDs = config.parse_ids(os.getenv("EMBY_LIBRARY_PARENT_ID")) ## Emby Library Parent ID(s), comma-separated
+    embyLibraryParentID = libraryParentIDs[0] if libraryParentIDs else None ## New collections are created in the first library
+
+    headers = {
+        'X-MediaBrowser-Token': api_key,
+        'Accept': 'application/json',
+    }
+    client = EmbyClient(base_url, api_key)
+    http = client.session  # Shared, instrumented connection pool for every request below
+
+    # First, get the user ID GUID from the username
+    profiling.phase("user resolution")
+    user_id = None
+    try:
+        users_response = http.get(f"{base_url}/Users", headers=headers)
+        users = users_response.json()
+        for user in users:
+            if user.get("Name", "").lower() == username.lower():
+                user_id = user.get("Id")
+                logger.info(f"Found user ID: {user_id} for username: {username}")
+                break
+
+        if not user_id:
+            logger.error(f"Could not find user ID for username: {username}")
+            return 1
+    except Exception as e:
+        logger.error(f"Failed to get user ID: {str(e)}")
+        return 1
+
+    # Finish the write phase of an interrupted run before this run works out its own plan
+    journal = checkpoint.Checkpoint(JOB_NAME, persist=not args.plan)
+    if not args.plan:
+        try:
+            planner.finish_interrupted_write(client, journal, user_id)
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to finish the interrupted write phase: {str(e)}")
+
+    # Resolve the wanted studio names to studio IDs, so the server does the studio filtering
+    # With --snapshot the studios and the matching items both come from the library snapshot
+    # instead, read inside one with block so the snapshot is closed however the reads end.
+    profiling.phase("studio resolution")
+    items = None
+    try:
+        if args.snapshot:
+            with snapshot.load(client, libraryParentIDs) as library:
+                studio_codes = library.codes_where("Studios", lambda name: studios.name_matches(name, rules.DISNEY_STUDIOS))
+                studio_ids = {library.dictionary("Studios")[code][1]: library.dictionary("Studios")[code][0] for code in studio_codes}
+                if studio_ids:
+                    profiling.phase("library scan")
+                    items = [library.item(row) for row in vectorized.RuleEngine(library).disney_rows()]
+        else:
+            studio_ids = studios.matching_studios(client, rules.DISNEY_STUDIOS)
+    except Exception as e:
+        if args.snapshot:
+            logger.error(f"Failed to read the library snapshot: {str(e)}")
+        else:
+            logger.error(f"Failed to get studios: {str(e)}")
+        return 1
+    if not studio_ids:
+        logger.info("No studios on the server match the Disney studios. Collection will not be created/updated.")
+        return 0
+
+    params = {
+        "Recursive": True,
+        "MediaTypes": "Video",
+        "StudioIds": "|".join(studio_ids),  # Only items from a matching studio
+        "Fields": "Studios,OfficialRating",
+    }
+
+    # Debug information
+    logger.info(f"Base URL: {base_url}")
+    logger.info(f"User ID: {user_id}")
+    logger.info(f"Library Parent ID: {', '.join(libraryParentIDs) or None}")
+
+    # Fetch one library's items; with several libraries each one is fetched on its own thread
+    def fetch_library(library_id):
+        response = http.get(f"{base_url}/Items", headers=headers, params=dict(params, parentId=library_id))
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        return response.json().get("Items", [])
+
+    # Send the request to the Emby server to search for videos from those studios
+    if items is None:
+        profiling.phase("library scan")
+        try:
+            items = libraries.scan(fetch_library, libraryParentIDs)
+        except Exception as e:
+            logger.error(f"Failed to get items: {str(e)}")
+            return 1
+    logger.info(f"Found {len(items)} items in the library")
+
+
+    write_skipped = False  # Set when the membership is unchanged and nothing was written
+
+    # Creates a new collection if it doesn't exist, updates if it does. This collection only ever
+    # grows: items already in it are skipped and nothing is removed. With plan_only nothing is written.
+    def create_or_update_collection(collection_name, item_ids_to_add, plan_only=False):
+        nonlocal write_skipped
+        collection_id = None
+        existing_items = []
+
+        try:
+            collection = client.find_collection(user_id, collection_name)
+            collection_id = collection.get("Id") if collection else None
+            # Same items as the last run applied, and the server still agrees: nothing to write
+            fingerprint = planner.membership_fingerprint(item_ids_to_add)
+            if not plan_only and planner.is_unchanged(collection, fingerprint):
+                logger.info(f"{collection_name} is unchanged since the last run ({collection.get('ChildCount')} items), skipping the write phase")
+                write_skipped = True
+                return collection_id
+
+            if collection_id:
+                logger.info(f"Found existing collection: {collection_name}")
+                existing_items = client.get_collection_item_ids(user_id, collection_id) or []
+                logger.info(f"Collection currently has {len(existing_items)} items")
+
+            to_add, _ = planner.diff(existing_items, item_ids_to_add)
+            plan = planner.CollectionPlan(collection_name, collection_id, to_add, [], names=item_names)
+            plan.print_summary(show_items=plan_only)
+            if plan_only:
+                return collection_id
+
+            collection_id = planner.apply_collection_plan(client, plan, embyLibraryParentID, batch_delay=0, journal=journal)
+            if collection_id:
+                planner.record_applied_plan(plan, collection_id, existing_items, fingerprint)
+            return collection_id
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in create_or_update_collection: {str(e)}")
+            return None
+
+    profiling.phase("rule evaluation")
+    item_names = {}
+    item_ids_to_add = []
+    for item in items:
+        try:
+            item_details = item  # The scan already returned the studios and rating
+
+            if rules.matches_disney(item_details, studio_ids):
+                logger.debug("Adding item with Name: %s and rating: %s", item_details['Name'], item_details['OfficialRating'])
+                logs.count("matched")
+                item_ids_to_add.append(item['Id'])
+                item_names[item['Id']] = item_details['Name']
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process item {item.get('Id')}: {str(e)}")
+
+    # After the loop, deduplicate the list of IDs
+    item_ids_to_add = list(set(item_ids_to_add))
+    logger.info(f"Found {len(item_ids_to_add)} items to add to collection")
+    profiling.phase("write-back")
+    if item_ids_to_add:
+        collection_id = create_or_update_collection(collection_name, item_ids_to_add, plan_only=args.plan)
+        if args.plan:
+            logger.info("Plan mode: no changes were made")
+        elif write_skipped:
+            logger.info(f"Collection {collection_id} is unchanged, nothing written")
+        elif collection_id:
+            logger.info(f"Collection created/updated successfully with ID: {collection_id}")
+    else:
+        logger.info("No items found matching the criteria. Collection will not be created/updated.")
+    return 0
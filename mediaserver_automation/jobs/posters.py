@@ -0,0 +1,21 @@
+import os
+
+from mediaserver_automation import logs, posters
+
+JOB_NAME = "PreparePosters"
+DESCRIPTION = "Resize and recompress every poster in POSTER_DIR into the poster cache"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+def run(args):
+    paths = posters.poster_files()
+    if not paths:
+        logger.error("No poster images found")
+        return 1
+
+    prepared = posters.prepare_all(paths, max_workers=args.workers)
+    for path, (upload_path, _) in prepared.items():
+        logger.info(f"{os.path.basename(path)}: {os.path.getsize(path) / 1024:.0f} KB -> "
+                    f"{os.path.getsize(upload_path) / 1024:.0f} KB ({upload_path})")
+    return 0
@@ -0,0 +1,426 @@
+import datetime
+import json
+import logging
+import os
+from datetime import timezone
+
+from mediaserver_automation import bulk, config, libraries, logs, planner, profiling, retry, rules
+
+JOB_NAME = "RecentlyAddedPlaylist"
+DESCRIPTION = "Update the Recently Added music playlist"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+# Helper function for logging with verbosity control: messages marked always are logged at INFO,
+# the rest at DEBUG and only show with --log-level DEBUG (or VERBOSE_LOGGING=true)
+def log(message, always=False):
+    logger.log(logging.INFO if always else logging.DEBUG, message)
+
+
+# Prefixes each line with the user, so the interleaved logs of concurrent playlist updates stay readable
+class UserLogger(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        return f"[{self.extra['user']}] {msg.lstrip()}", kwargs
+
+
+# Playlists for several users from one library scan (--users, or PLAYLIST_USERS_FILE): a JSON list
+# with one entry per user, holding EMBY_USER_ID and optionally PLAYLIST_NAME, NUMBER_OF_DAYS and
+# EXCLUDE_ITEMS, which otherwise come from the environment:
+#
+#   [
+#     {"EMBY_USER_ID": "alice", "PLAYLIST_NAME": "Alice's New Music", "NUMBER_OF_DAYS": "30"},
+#     {"EMBY_USER_ID": "bob", "EXCLUDE_ITEMS": "Christmas,Holiday"}
+#   ]
+#
+# Playlists are found by name, so the names must differ; without one it is "<PLAYLIST_NAME> (<user>)".
+def load_users(path, playlist_name, number_of_days, exclude_items):
+    with open(path) as users_file:
+        entries = json.load(users_file)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path} must contain a non-empty JSON list of users")
+    targets = []
+    names = set()
+    for index, entry in enumerate(entries):
+        user_name = entry.get("EMBY_USER_ID") if isinstance(entry, dict) else None
+        if not user_name:
+            raise ValueError(f"User #{index + 1} in {path} has no EMBY_USER_ID")
+        name = entry.get("PLAYLIST_NAME", f"{playlist_name} ({user_name})")
+        if name in names:
+            raise ValueError(f"Playlist name '{name}' appears more than once in {path}")
+        names.add(name)
+        targets.append({
+            "user_name": user_name,
+            "playlist_name": name,
+            "number_of_days": int(entry.get("NUMBER_OF_DAYS", number_of_days)),
+            "exclude_items": [item.strip() for item in str(entry.get("EXCLUDE_ITEMS", exclude_items)).split(",")],
+        })
+    return targets
+
+
+def run(args):
+    # Get configuration from environment variables with fallbacks for non-sensitive values
+    url = os.getenv("EMBY_SERVER_URL")  # Emby server URL
+    api_key = os.getenv("EMBY_API_KEY")  # Emby API Key Generated in Server Settings
+    user_name = os.getenv("EMBY_USER_ID")  # Emby User ID or username
+    musicLibraryIDs = config.parse_ids(os.getenv("EMBY_MUSIC_LIBRARY_ID"))  # Emby Library Parent ID(s), comma-separated
+    playlistName = os.getenv("PLAYLIST_NAME", "Recently Added")  # Default name if not specified in .env
+    numberOfDays = int(os.getenv("NUMBER_OF_DAYS", "90"))  # Number of days from today, with default
+    # Keep the playlist newest first with the fewest entry moves, instead of appending new tracks at the end
+    sort_by_date = os.getenv("SORT_PLAYLIST_BY_DATE", "false").lower() == "true"
+
+    # Check if required environment variables are set; a users file names the users itself
+    required_vars = ["EMBY_API_KEY", "EMBY_MUSIC_LIBRARY_ID"] + ([] if args.users else ["EMBY_USER_ID"])
+    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    if missing_vars:
+        logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+        logger.error("Please add them to your .env file or set them as environment variables")
+        return 1
+
+    # Load exclude list from environment variable or use default
+    exclude_items_str = os.getenv("EXCLUDE_ITEMS", rules.DEFAULT_EXCLUDE_ITEMS)
+    excludeItemNames = [item.strip() for item in exclude_items_str.split(",")]
+
+    # One playlist for EMBY_USER_ID, or one per user in the users file
+    if args.users:
+        try:
+            targets = load_users(args.users, playlistName, numberOfDays, exclude_items_str)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load the playlist users: {str(e)}")
+            return 1
+    else:
+        targets = [{"user_name": user_name, "playlist_name": playlistName,
+                    "number_of_days": numberOfDays, "exclude_items": excludeItemNames}]
+
+    # Check if we should delete all playlists for cleanup
+    delete_all_playlists = os.getenv("DELETE_ALL_PLAYLISTS", "false").lower() == "true"
+    bulk_parallel = int(os.getenv("BULK_PARALLEL", bulk.MAX_PARALLEL))  # Playlists deleted or updated at once
+
+    # Set up the request headers with the API key
+    headers = {
+        'Accept': 'application/json',
+        "X-Emby-Token": api_key
+    }
+
+    # One pooled, instrumented session with the shared retry policy for every request the script makes
+    http = retry.RetryingSession()
+
+    # Get the current date and time in UTC
+    now = datetime.datetime.now(timezone.utc)
+
+    # Helper function to make requests; the session retries transient failures (see retry.py)
+    def make_request(method, endpoint, expected_codes=None, **kwargs):
+        if expected_codes is None:
+            expected_codes = [200, 204]
+
+        url_with_endpoint = f"{url}{endpoint}"
+        if logger.isEnabledFor(logging.DEBUG):
+            log(f"Making {method} request to: {url_with_endpoint}")
+            if kwargs.get('params'):
+                log(f"  Parameters: {kwargs.get('params')}")
+            if kwargs.get('json'):
+                log(f"  JSON body: {kwargs.get('json')}")
+
+        try:
+            response = http.request(method, url_with_endpoint, headers=headers, **kwargs)
+        except Exception as e:
+            logger.error(f"Exception occurred: {str(e)}")
+            raise
+
+        if response.status_code not in expected_codes:
+            logger.error(f"Request failed with status code {response.status_code}\n"
+                         f"  URL: {url_with_endpoint}\n"
+                         f"  Method: {method}\n"
+                         f"  Response: {response.text}")
+        return response
+
+    # Function to delete a playlist by ID
+    def delete_playlist(playlist_id):
+        response = make_request("DELETE", f"/Items/{playlist_id}")
+        return response.status_code in [200, 204]
+
+    # Get the actual user IDs (GUIDs) from the usernames, listing the users once
+    def get_user_ids(usernames):
+        known = {}
+        user_response = make_request("GET", "/Users")
+        if user_response.status_code == 200:
+            known = {user["Name"].lower(): user["Id"] for user in user_response.json()}
+
+        user_ids = {}
+        for username in usernames:
+            if username.lower() not in known:
+                logger.warning(f"Could not find user ID for username '{username}'. Will use the provided value.")
+            user_ids[username] = known.get(username.lower(), username)
+        return user_ids
+
+    # Print Server connection details first
+    log(f"Connecting to Emby server at: {url}", True)
+
+    # Get the user ID (GUID) from the username if needed
+    profiling.phase("user resolution")
+    user_ids = get_user_ids([target["user_name"] for target in targets])
+    for username, userId in user_ids.items():
+        log(f"Using user ID: {userId}" if len(user_ids) == 1 else f"Using user ID for {username}: {userId}", True)
+
+    # Set up the request parameters to search for music added in the last N days
+    params = {
+        "Recursive": True,
+        "MediaTypes": "Audio",
+        "SortBy": "DateCreated",
+        "SortOrder": "Descending",
+        "Fields": "DateCreated",
+    }
+
+    # Fetch one library's music; with several libraries each one is fetched on its own thread
+    def fetch_library(library_id):
+        response = make_request("GET", "/Items", params=dict(params, parentId=library_id))
+        if response.status_code != 200:
+            raise RuntimeError(f"Status code: {response.status_code}\nResponse: {response.text}")
+        return response.json()["Items"]
+
+    # Send the request to the Emby server to search for music
+    profiling.phase("library scan")
+    try:
+        music_items = libraries.scan(fetch_library, musicLibraryIDs)
+        # Libraries are sorted separately, so restore newest-first across all of them
+        if len(musicLibraryIDs) > 1:
+            music_items.sort(key=lambda item: item.get("DateCreated", ""), reverse=True)
+    except Exception as e:
+        logger.error(f"Failed to retrieve music items from Emby server. {str(e)}")
+        music_items = None
+
+    # Check if the request was successful
+    if music_items is not None:
+        log(f"Found {len(music_items)} music items in library", True)
+
+        # Check if we need to delete all playlists first (for cleanup)
+        profiling.phase("playlist lookup")
+        playlists = None  # Listing to search for the playlist; the cleanup leaves only what it failed to delete
+        playlist_params = {
+            "Format": "json",
+            "IncludeItemTypes": "Playlist",
+            "Recursive": True
+        }
+        if delete_all_playlists:
+            # Get all playlists
+            playlists_response = make_request("GET", "/Items", params=playlist_params)
+            if playlists_response.status_code == 200:
+                playlists = playlists_response.json()["Items"]
+                if args.plan:
+                    log(f"\nPlan: would delete all {len(playlists)} existing playlists for cleanup "
+                        f"({len(playlists)} x DELETE /Items/{{id}}, {bulk_parallel} at a time)", True)
+                else:
+                    log(f"Deleting all {len(playlists)} existing playlists for cleanup, {bulk_parallel} at a time...", True)
+
+                    def delete_listed_playlist(playlist):
+                        if delete_playlist(playlist["Id"]):
+                            log(f"Deleted playlist: {playlist['Name']} (ID: {playlist['Id']})")
+                            return True
+                        logger.error(f"Failed to delete playlist: {playlist['Name']} (ID: {playlist['Id']})")
+                        return False
+
+                    deleted, playlists = bulk.run_all(delete_listed_playlist, playlists, "Deleting playlists", bulk_parallel)
+                    log(f"Deleted {len(deleted)} playlists", True)
+
+        # List the playlists once for every user, unless the cleanup already did
+        if playlists is None:
+            playlists_response = make_request("GET", "/Items", params=playlist_params)
+            playlists = playlists_response.json()["Items"] if playlists_response.status_code == 200 else []
+
+        # Work out the ages once; each user's NUMBER_OF_DAYS is compared against them in memory
+        music_ages = [(music_item, (now - rules.parse_emby_date(music_item["DateCreated"])).days) for music_item in music_items]
+
+        # Newest first by DateCreated; tracks added on the same date keep their current order
+        dates = {music_item["Id"]: music_item.get("DateCreated", "") for music_item in music_items}
+
+        # Moves that put (entry ID, item ID) pairs, in their playlist order, into date order
+        def date_order_moves(entries):
+            wanted = sorted(entries, key=lambda entry: dates.get(entry[1], ""), reverse=True)
+            return planner.ordering_moves([entry_id for entry_id, _ in entries], [entry_id for entry_id, _ in wanted])
+
+        # Bring one user's playlist up to date, finding it in the playlists listing. Several users'
+        # playlists are updated at the same time, so their log lines carry the user name and the
+        # profiler phases are left to the caller.
+        def update_playlist(target, playlists, concurrent=False):
+            playlistName = target["playlist_name"]
+            numberOfDays = target["number_of_days"]
+            excludeItemNames = target["exclude_items"]
+            userId = user_ids[target["user_name"]]
+            job_logger = UserLogger(logger, {"user": target["user_name"]}) if concurrent else logger
+            phase = (lambda name: None) if concurrent else profiling.phase
+
+            def log(message, always=False):
+                job_logger.log(logging.INFO if always else logging.DEBUG, message)
+
+            # Check if the playlist already exists
+            playlist_exists = False
+            playlist_id = None
+            for playlist in playlists:
+                if playlist["Name"] == playlistName:
+                    log("Found existing playlist", True)
+                    playlist_exists = True
+                    playlist_id = playlist["Id"]
+                    break
+
+            # In plan mode a cleanup run would have deleted the playlist, so plan against an empty one
+            if args.plan and delete_all_playlists:
+                playlist_exists = False
+                playlist_id = None
+
+            # If the "Recently Added" playlist doesn't exist, create it (plan mode only reports it)
+            if not playlist_exists and not args.plan:
+                log(f"Creating new playlist: {playlistName}", True)
+                create_playlist_response = make_request("POST", "/Playlists", json={"Name": playlistName, "UserId": userId})
+                if create_playlist_response.status_code == 200:
+                    playlist_id = create_playlist_response.json()["Id"]
+                    log(f"Successfully created playlist with ID: {playlist_id}", True)
+                else:
+                    job_logger.error("Failed to create playlist")
+                    return 1
+
+            # Get the existing items in the playlist
+            playlist_items = []
+            if playlist_id:
+                playlist_items_response = make_request("GET", f"/Playlists/{playlist_id}/Items")
+                if playlist_items_response.status_code != 200:
+                    job_logger.error("Failed to retrieve playlist items")
+                    return 1
+
+                # Extract the playlist items from the response
+                playlist_items = playlist_items_response.json()["Items"]
+            log(f"Found {len(playlist_items)} existing items in playlist", True)
+            playlist_entries = {item["Id"]: item for item in playlist_items}
+
+            # Track stats for a summary
+            items_added = 0
+            items_skipped = 0
+            items_excluded = 0
+            items_removed = 0
+            items_moved = 0
+            items_failed = 0
+
+            # Work out which tracks to add and which entries to remove before touching the playlist
+            phase("rule evaluation")
+            ids_to_add = []
+            entries_to_remove = []
+            item_names = {}
+            for music_item, age_days in music_ages:
+                if age_days < numberOfDays:
+                    if music_item["Id"] in playlist_entries:
+                        job_logger.debug("Skipping %s - already in playlist", music_item['Name'])
+                        items_skipped += 1
+                    else:
+                        # Check if the track name or any artist matches exclusion criteria
+                        exclusion_reason = rules.recently_added_exclusion_reason(music_item, excludeItemNames)
+                        if exclusion_reason:
+                            job_logger.debug("Excluding %s - %s", music_item['Name'], exclusion_reason)
+                            items_excluded += 1
+                            continue
+                        job_logger.debug("Adding %s to playlist", music_item['Name'])
+                        ids_to_add.append(music_item["Id"])
+                        item_names[music_item["Id"]] = music_item["Name"]
+
+                # Check for Old Music
+                elif music_item["Id"] in playlist_entries:
+                    item = playlist_entries[music_item["Id"]]
+                    job_logger.debug("Removing %s - older than %s days", item['Name'], numberOfDays)
+                    entries_to_remove.append(item['PlaylistItemId'])
+                    item_names[item['PlaylistItemId']] = item['Name']
+
+            moves = []
+            if sort_by_date:
+                # New tracks are appended at the end; until they have entry IDs their item IDs stand in
+                removed = set(entries_to_remove)
+                expected_entries = [(item["PlaylistItemId"], item["Id"]) for item in playlist_items if item["PlaylistItemId"] not in removed]
+                moves = date_order_moves(expected_entries + [(item_id, item_id) for item_id in ids_to_add])
+
+            plan = planner.PlaylistPlan(playlistName, playlist_id, ids_to_add, entries_to_remove, names=item_names, moves=moves)
+            plan.print_summary(show_items=args.plan)
+
+            phase("write-back")
+            if not args.plan:
+                # Add the new tracks in batches using the API endpoint with properly formatted parameters
+                for i in range(0, len(plan.to_add), plan.batch_size):
+                    batch = plan.to_add[i:i + plan.batch_size]
+                    add_params = {
+                        "UserId": userId,
+                        "Ids": ','.join(batch)
+                    }
+                    add_to_playlist_response = make_request("POST", f"/Playlists/{playlist_id}/Items", params=add_params)
+
+                    if add_to_playlist_response.status_code != 200:
+                        # Try with a JSON body instead
+                        job_logger.warning("First attempt failed, trying alternative approach...")
+                        add_to_playlist_response = make_request(
+                            "POST",
+                            f"/Items/{playlist_id}/PlaylistItems",
+                            json={"Ids": batch, "UserId": userId}
+                        )
+
+                    if add_to_playlist_response.status_code not in [200, 204]:
+                        job_logger.error(f"Failed to add {len(batch)} items to playlist\n"
+                                     f"  Status code: {add_to_playlist_response.status_code}\n"
+                                     f"  Response: {add_to_playlist_response.text}")
+                        items_failed += len(batch)
+                    else:
+                        log(f"Successfully added {len(batch)} items to playlist")
+                        items_added += len(batch)
+
+                # Remove old entries in batches using the proper endpoint for playlist item removal
+                for i in range(0, len(plan.to_remove), plan.batch_size):
+                    batch = plan.to_remove[i:i + plan.batch_size]
+                    remove_from_playlist_response = make_request(
+                        "DELETE",
+                        f"/Playlists/{playlist_id}/Items",
+                        params={"EntryIds": ','.join(batch)}
+                    )
+
+                    if remove_from_playlist_response.status_code not in [200, 204]:
+                        job_logger.error(f"{remove_from_playlist_response.status_code} Failed to remove {len(batch)} items from playlist")
+                        items_failed += len(batch)
+                    else:
+                        log(f"Successfully removed {len(batch)} items from playlist")
+                        items_removed += len(batch)
+
+                # Put the playlist in date order; added tracks only get their entry IDs once they are in
+                if plan.moves:
+                    moves = plan.moves
+                    if plan.to_add:
+                        playlist_items_response = make_request("GET", f"/Playlists/{playlist_id}/Items")
+                        if playlist_items_response.status_code == 200:
+                            moves = date_order_moves([(item["PlaylistItemId"], item["Id"]) for item in playlist_items_response.json()["Items"]])
+                        else:
+                            job_logger.error("Failed to retrieve playlist items, leaving the playlist order as it is")
+                            moves = []
+                    log(f"Moving {len(moves)} entries into date order", True)
+                    for entry_id, new_index in moves:
+                        move_response = make_request("POST", f"/Playlists/{playlist_id}/Items/{entry_id}/Move/{new_index}")
+                        if move_response.status_code not in [200, 204]:
+                            # Later indices assume this move happened; the next run picks up from here
+                            job_logger.error(f"{move_response.status_code} Failed to move playlist entry {entry_id}, stopping the reorder")
+                            items_failed += 1
+                            break
+                        items_moved += 1
+
+            # Print summary
+            if args.plan:
+                log("\nPlan mode: no changes were made", True)
+            log("\nPlaylist Update Summary:", True)
+            log(f"Items added: {items_added}", True)
+            log(f"Items removed: {items_removed}", True)
+            if sort_by_date:
+                log(f"Items moved into date order: {items_moved}", True)
+            log(f"Items skipped (already in playlist): {items_skipped}", True)
+            log(f"Items excluded (matched exclusion criteria): {items_excluded}", True)
+            if items_failed > 0:
+                log(f"Items failed: {items_failed}", True)
+            return 0
+
+        if len(targets) == 1:
+            return update_playlist(targets[0], playlists)
+        profiling.phase("playlist updates")
+        _, failed = bulk.run_all(lambda target: update_playlist(target, playlists, concurrent=True) == 0,
+                                 targets, f"Updating {len(targets)} playlists", bulk_parallel)
+        return 1 if failed else 0
+    else:
+        return 1
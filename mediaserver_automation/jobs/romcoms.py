@@ -0,0 +1,336 @@
+import os
+
+from mediaserver_automation import checkpoint, config, libraries, logs, people, planner, profiling, retry, rules, snapshot, vectorized
+from mediaserver_automation.client import EmbyClient
+
+JOB_NAME = "RomComsCollection"
+POSTER = "RomComs.jpg"  # Custom poster in POSTER_DIR
+DESCRIPTION = "Update the Romantic Comedies collection"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+def run(args):
+    collection_name = rules.ROMCOMS_COLLECTION_NAME ## Name, genres and exclusions are defined in mediaserver_automation/rules.py
+    excluded_actors = rules.ROMCOMS_EXCLUDED_ACTORS
+
+    # Get configuration from environment variables
+    base_url = os.getenv("EMBY_SERVER_URL") ## Emby server URL
+    api_key = os.getenv("EMBY_API_KEY") ## Emby API Key Generated in Server Settings
+    username = os.getenv("EMBY_USER_ID") ## Emby username
+    libraryParentIDs = config.parse_ids(os.getenv("EMBY_LIBRARY_PARENT_ID")) ## Emby Library Parent ID(s), comma-separated
+    embyLibraryParentID = libraryParentIDs[0] if libraryParentIDs else None ## New collections are created in the first library
+
+    headers = {
+        'X-MediaBrowser-Token': api_key,
+        'Accept': 'application/json',
+    }
+    client = EmbyClient(base_url, api_key)
+    http = client.session  # Shared, instrumented connection pool for every request below
+
+    # First, get the user ID GUID from the username
+    profiling.phase("user resolution")
+    user_id = None
+    try:
+        users_response = http.get(f"{base_url}/Users", headers=headers)
+        users = users_response.json()
+        for user in users:
+            if user.get("Name", "").lower() == username.lower():
+                user_id = user.get("Id")
+                logger.info(f"Found user ID: {user_id} for username: {username}")
+                break
+
+        if not user_id:
+            logger.error(f"Could not find user ID for username: {username}")
+            return 1
+    except Exception as e:
+        logger.error(f"Failed to get user ID: {str(e)}")
+        return 1
+
+    # Finish the write phase of an interrupted run before this run works out its own plan
+    journal = checkpoint.Checkpoint(JOB_NAME, persist=not args.plan)
+    if not args.plan:
+        try:
+            planner.finish_interrupted_write(client, journal, user_id)
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to finish the interrupted write phase: {str(e)}")
+
+    params = {
+        "Recursive": True,
+        "MediaTypes": "Video",
+        "IncludeItemTypes": "Movie",  # Only include movies
+        "Fields": rules.MOVIE_LIST_FIELDS,  # Everything the rules read except People, which comes from the person index
+    }
+
+    # Debug information
+    logger.info(f"Base URL: {base_url}")
+    logger.info(f"User ID: {user_id}")
+    logger.info(f"Library Parent ID: {', '.join(libraryParentIDs) or None}")
+
+    # Fetch one library's items; with several libraries each one is fetched on its own thread
+    def fetch_library(library_id):
+        response = http.get(f"{base_url}/Items", headers=headers, params=dict(params, parentId=library_id))
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        return response.json().get("Items", [])
+
+    # Send the request to the Emby server to search for movies. With --snapshot the genre and cast
+    # rules run over the whole library snapshot at once and only the movies that pass are read.
+    profiling.phase("library scan")
+    person_index = None
+    try:
+        if args.snapshot:
+            with snapshot.load(client, libraryParentIDs) as library:
+                items = [library.item(row) for row in vectorized.RuleEngine(library).romcom_rows()]
+                person_index = people.PersonIndex.from_snapshot(library, excluded_actors)
+            logger.info(f"Found {len(items)} candidate movies in the library snapshot")
+        else:
+            items = libraries.scan(fetch_library, libraryParentIDs)
+            logger.info(f"Found {len(items)} movies in the library")
+    except Exception as e:
+        logger.error(f"Failed to get items: {str(e)}")
+        return 1
+
+    # Movies with an excluded actor, asked of the server once instead of reading every cast list
+    profiling.phase("person index")
+    try:
+        if person_index is None:
+            person_index = people.PersonIndex.build(client, excluded_actors)
+    except Exception as e:
+        logger.error(f"Failed to look up excluded actors: {str(e)}")
+        return 1
+
+
+    # Function to get current items in a collection
+    def get_collection_items(collection_id):
+        try:
+            # Try multiple approaches to get collection items
+            # Approach 1: Using Collections endpoint
+            collection_items_response = http.get(f"{base_url}/Collections/{collection_id}/Items", headers=headers)
+            if collection_items_response.status_code == 200:
+                items = collection_items_response.json().get("Items", [])
+                logger.debug(f"Retrieved {len(items)} items from collection using Collections endpoint")
+                return [item.get('Id') for item in items]
+            else:
+                logger.debug(f"Failed to get collection items from Collections endpoint, status code: {collection_items_response.status_code}")
+
+            # Approach 2: Using Users endpoint
+            users_endpoint = f"{base_url}/Users/{user_id}/Items/{collection_id}/Items"
+            logger.debug(f"Trying Users endpoint: {users_endpoint}")
+            alt_response = http.get(users_endpoint, headers=headers)
+            if alt_response.status_code == 200:
+                items = alt_response.json().get("Items", [])
+                logger.debug(f"Retrieved {len(items)} items from collection using Users endpoint")
+                return [item.get('Id') for item in items]
+            else:
+                logger.debug(f"Users endpoint also failed, status code: {alt_response.status_code}")
+
+            # Approach 3: Using direct Items endpoint with parent filter
+            items_endpoint = f"{base_url}/Items"
+            params = {
+                "ParentId": collection_id,
+                "Recursive": True
+            }
+            logger.debug("Trying Items endpoint with ParentId filter")
+            items_response = http.get(items_endpoint, headers=headers, params=params)
+            if items_response.status_code == 200:
+                items = items_response.json().get("Items", [])
+                logger.debug(f"Retrieved {len(items)} items from collection using Items endpoint")
+                return [item.get('Id') for item in items]
+            else:
+                logger.debug(f"Items endpoint also failed, status code: {items_response.status_code}")
+
+            # If we get here, we couldn't retrieve the items
+            logger.warning("Could not retrieve collection items using any method")
+            return []
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to get collection items: {str(e)}")
+            return []
+
+
+    write_skipped = False  # Set when the membership is unchanged and nothing was written
+
+    # Creates a new collection if it doesn't exist, otherwise brings it in line with item_ids_to_add
+    # by removing stale items and adding only the missing ones. With plan_only nothing is written.
+    def create_or_update_collection(collection_name, item_ids_to_add, excluded_ids, plan_only=False):
+        nonlocal write_skipped
+        collection_id = None
+        existing_items = []
+
+        try:
+            collection = client.find_collection(user_id, collection_name)
+            collection_id = collection.get("Id") if collection else None
+            poster_path = config.poster_path(POSTER)
+            # Same membership and poster as the last run applied, and the server still agrees: nothing to write
+            fingerprint = planner.membership_fingerprint(item_ids_to_add, poster_path)
+            if not plan_only and planner.is_unchanged(collection, fingerprint):
+                logger.info(f"{collection_name} is unchanged since the last run ({collection.get('ChildCount')} items), skipping the write phase")
+                write_skipped = True
+                return collection_id
+
+            if collection_id:
+                logger.info(f"Found existing collection: {collection_name}")
+                existing_items = get_collection_items(collection_id)
+                logger.info(f"Collection currently has {len(existing_items)} items")
+
+            to_add, to_remove = planner.diff(existing_items, item_ids_to_add)
+            plan = planner.CollectionPlan(collection_name, collection_id, to_add, to_remove,
+                                          names=movie_names, poster_path=poster_path)
+            plan.print_summary(show_items=plan_only)
+            if plan_only:
+                return collection_id
+
+            collection_id = planner.apply_collection_plan(client, plan, embyLibraryParentID, journal=journal)
+            if collection_id:
+                planner.record_applied_plan(plan, collection_id, existing_items, fingerprint)
+            return collection_id
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in create_or_update_collection: {str(e)}")
+            return None
+
+    # Function to check if a movie should be excluded based on path or metadata. Without
+    # person_index the cast is read from the item's People.
+    def should_exclude(item_details, movie_id, person_index=None):
+        reason = rules.romcom_exclusion_reason(item_details, person_index)
+        if reason:
+            logger.debug("Excluding movie: %s | Reason: %s", item_details.get('Name', ''), reason)
+            logs.count("excluded")
+            return True
+        return False  # Not excluded
+
+    # Main execution flow
+    profiling.phase("rule evaluation")
+    logger.info("Starting Romantic Comedies Collection update process...")
+
+    # Process all movies to determine what should be in the collection
+    romcom_item_ids = []
+    excluded_count = 0
+    excluded_actor_count = 0
+    processed_count = 0
+    total_movies = len(items)
+
+    # Lists to track exclusions for validation
+    excluded_ids = []
+    excluded_movies = []
+
+    # Movie names by ID, for the plan printout
+    movie_names = {}
+
+    logger.info(f"Processing {total_movies} movies to check genre and exclusion criteria...")
+    for item in items:
+        processed_count += 1
+        if processed_count % 50 == 0:
+            logger.info(f"Processed {processed_count}/{total_movies} movies...")
+
+        try:
+            movie_id = item['Id']
+            item_details = item  # The scan already returned every field the rules read
+            movie_name = item_details.get('Name', 'Unknown Title')
+            movie_names[movie_id] = movie_name
+            genres = item_details.get('Genres', [])
+
+            # Comprehensive exclusion check
+            if should_exclude(item_details, movie_id, person_index):
+                # Keep track of exclusions
+                excluded_ids.append(movie_id)
+                excluded_movies.append(movie_name)
+                excluded_count += 1
+
+                # Track actor-based exclusions separately
+                if movie_id in person_index:
+                    excluded_actor_count += 1
+
+                continue
+
+            # If we get here, movie should be included
+            logger.debug("Adding movie: %s | Genres: %s", movie_name, ', '.join(genres))
+            logs.count("matched")
+            romcom_item_ids.append(movie_id)
+
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process item {item.get('Id')}: {str(e)}")
+
+    logger.info(f"Found {len(romcom_item_ids)} romantic comedy movies")
+    logger.info(f"Excluded {excluded_count} movies due to exclusion criteria")
+    logger.info(f"Excluded {excluded_actor_count} movies specifically due to excluded actors")
+
+    # Final validation to ensure all exclusions are properly applied
+    profiling.phase("validation")
+    logger.info("Performing final validation to ensure all exclusions are properly applied...")
+    final_romcom_list = []
+    exclusion_found_in_list = 0
+
+    # Every candidate is checked again against the full rules from what is already in memory:
+    # the scanned fields and the person index. A movie is only fetched, with its cast list,
+    # when neither the index nor the scan has its cast. Movies an interrupted run already
+    # fetched and validated are not fetched again.
+    items_by_id = {item['Id']: item for item in items}
+    validated = journal.resume("validation", romcom_item_ids)
+
+    for movie_id in romcom_item_ids:
+        if movie_id in excluded_ids:
+            exclusion_found_in_list += 1
+            logger.warning(f"Excluded movie with ID {movie_id} was still in the list - removing it")
+            continue
+
+        item_details = items_by_id.get(movie_id, {})
+        cast_missing = person_index is None and 'People' not in item_details
+        if cast_missing and movie_id in validated:
+            if validated[movie_id]:
+                final_romcom_list.append(movie_id)
+            else:
+                exclusion_found_in_list += 1
+            continue
+
+        try:
+            if cast_missing:
+                item_details = http.get(f"{base_url}/users/{user_id}/items/{movie_id}", headers=headers).json()
+            movie_name = item_details.get('Name', 'Unknown Title')
+
+            if should_exclude(item_details, movie_id, person_index):
+                exclusion_found_in_list += 1
+                logger.warning(f"Movie {movie_name} should be excluded but was in the list - removing it")
+                if cast_missing:
+                    journal.record(movie_id, False)
+                continue
+
+            final_romcom_list.append(movie_id)
+            if cast_missing:
+                journal.record(movie_id, True)
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in final validation for movie {movie_id}: {str(e)}")
+            # Include the movie if there's an error checking it, to be safe
+            final_romcom_list.append(movie_id)
+
+    journal.finish()
+
+    if exclusion_found_in_list > 0:
+        logger.info(f"Found and removed {exclusion_found_in_list} excluded movies during final validation")
+        logger.info(f"Final romantic comedy movie count: {len(final_romcom_list)}")
+    else:
+        logger.info("Final validation complete - no excluded movies found in the list")
+        final_romcom_list = romcom_item_ids
+
+    profiling.phase("write-back")
+    if final_romcom_list:
+        collection_id = create_or_update_collection(collection_name, final_romcom_list, excluded_ids, plan_only=args.plan)
+        if args.plan:
+            logger.info("Plan mode: no changes were made")
+        elif write_skipped:
+            logger.info("Romantic Comedies collection is unchanged, nothing written")
+        elif collection_id:
+            logger.info("Romantic Comedies collection updated successfully!")
+            logger.info(f"Collection now contains {len(final_romcom_list)} romantic comedy movies")
+    else:
+        logger.info("No romantic comedy movies found. Collection will not be created/updated.")
+    return 0
@@ -0,0 +1,28 @@
+import os
+
+from mediaserver_automation import logs, titles
+from mediaserver_automation.client import EmbyClient
+
+JOB_NAME = "SearchMovies"
+DESCRIPTION = "Look up movies by title in the local title index"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+def run(args):
+    client = EmbyClient(os.getenv("EMBY_SERVER_URL"), os.getenv("EMBY_API_KEY"))
+    try:
+        index = titles.load_index(client, refresh=args.refresh_index, use_snapshot=args.snapshot)
+    except Exception as e:
+        logger.error(f"Failed to load the title index: {str(e)}")
+        return 1
+
+    matches = index.search(args.title, args.year, limit=args.limit)
+    if not matches:
+        logger.info(f"No movies found matching: {args.title}")
+        return 1
+    lines = [f"Matches for '{args.title}' ({len(index.entries)} movies indexed):"]
+    for score, (movie_id, name, year, path) in matches:
+        lines.append(f"  {score:4.2f}  {name} ({year}) | ID: {movie_id} | Path: {path}")
+    logger.info("\n".join(lines))
+    return 0
@@ -0,0 +1,29 @@
+import os
+import time
+
+from mediaserver_automation import config, logs, snapshot
+from mediaserver_automation.client import EmbyClient
+
+JOB_NAME = "LibrarySnapshot"
+DESCRIPTION = "Save the movie libraries as a memory-mapped snapshot for --snapshot runs"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+def run(args):
+    client = EmbyClient(os.getenv("EMBY_SERVER_URL"), os.getenv("EMBY_API_KEY"))
+    library_ids = config.parse_ids(os.getenv("EMBY_LIBRARY_PARENT_ID"))
+    try:
+        library = snapshot.build(client, library_ids)
+    except Exception as e:
+        logger.error(f"Failed to build the library snapshot: {str(e)}")
+        return 1
+    library.close()
+
+    # How long the next --snapshot run takes to open it
+    start = time.perf_counter()
+    with snapshot.Snapshot(library.path) as library:
+        logger.info(f"{library.path}: {len(library)} items, {len(library.dictionary('Genres'))} genres, "
+                    f"{len(library.dictionary('Studios'))} studios, {len(library.dictionary('People'))} people; "
+                    f"opens in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return 0
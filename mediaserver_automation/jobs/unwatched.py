@@ -0,0 +1,426 @@
+import os
+
+from mediaserver_automation import checkpoint, config, libraries, logs, people, planner, profiling, retry, rules, watchstate
+from mediaserver_automation.client import EmbyClient
+
+JOB_NAME = "UnwatchedMoviesCollection"
+POSTER = "UnwatchedMovies.png"  # Custom poster in POSTER_DIR
+DESCRIPTION = "Update the Unwatched Movies collection"
+
+logger = logs.get_logger(JOB_NAME)
+
+
+def run(args):
+    collection_name = rules.UNWATCHED_COLLECTION_NAME ## Desired name of the collection -- defined in mediaserver_automation/rules.py
+    watch_status_user = rules.UNWATCHED_WATCH_STATUS_USER ## User whose watch status to check
+
+    # Get configuration from environment variables
+    base_url = os.getenv("EMBY_SERVER_URL") ## Emby server URL
+    api_key = os.getenv("EMBY_API_KEY") ## Emby API Key Generated in Server Settings
+    username = os.getenv("EMBY_USER_ID") ## Emby username
+    libraryParentIDs = config.parse_ids(os.getenv("EMBY_LIBRARY_PARENT_ID")) ## Emby Library Parent ID(s), comma-separated
+    embyLibraryParentID = libraryParentIDs[0] if libraryParentIDs else None ## New collections are created in the first library
+
+    headers = {
+        'X-MediaBrowser-Token': api_key,
+        'Accept': 'application/json',
+    }
+    client = EmbyClient(base_url, api_key)
+    http = client.session  # Shared, instrumented connection pool for every request below
+
+    # First, get user IDs we need - admin user for API access and watch status user
+    profiling.phase("user resolution")
+    admin_user_id = None
+    watch_status_user_id = None
+
+    try:
+        users_response = http.get(f"{base_url}/Users", headers=headers)
+        users = users_response.json()
+
+        for user in users:
+            user_name = user.get("Name", "")
+            if user_name.lower() == username.lower():
+                admin_user_id = user.get("Id")
+                logger.info(f"Found admin user ID: {admin_user_id} for username: {username}")
+
+            if user_name.lower() == watch_status_user.lower():
+                watch_status_user_id = user.get("Id")
+                logger.info(f"Found watch status user ID: {watch_status_user_id} for username: {watch_status_user}")
+
+        if not admin_user_id:
+            logger.error(f"Could not find admin user ID for username: {username}")
+            return 1
+
+        if not watch_status_user_id:
+            logger.error(f"Could not find user ID for watch status username: {watch_status_user}")
+            return 1
+    except Exception as e:
+        logger.error(f"Failed to get user IDs: {str(e)}")
+        return 1
+
+    # Finish the write phase of an interrupted run before this run works out its own plan
+    journal = checkpoint.Checkpoint(JOB_NAME, persist=not args.plan)
+    if not args.plan:
+        try:
+            planner.finish_interrupted_write(client, journal, admin_user_id)
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to finish the interrupted write phase: {str(e)}")
+
+    params = {
+        "Recursive": True,
+        "MediaTypes": "Video",
+        "IncludeItemTypes": "Movie",  # Only include movies
+        "Fields": "Path,Overview",  # People comes from the person index instead
+    }
+
+    # Debug information
+    logger.info(f"Base URL: {base_url}")
+    logger.info(f"Admin User ID: {admin_user_id}")
+    logger.info(f"Watch Status User ID: {watch_status_user_id}")
+    logger.info(f"Library Parent ID: {', '.join(libraryParentIDs) or None}")
+
+    # Fetch one library's items; with several libraries each one is fetched on its own thread.
+    # Listed as the admin user, so items carry the same UserData the per-item lookups returned.
+    def fetch_library(library_id):
+        response = http.get(f"{base_url}/Users/{admin_user_id}/Items", headers=headers, params=dict(params, parentId=library_id))
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        return response.json().get("Items", [])
+
+    # Send the request to the Emby server to search for movies
+    profiling.phase("library scan")
+    try:
+        logger.info("Retrieving all movies from library...")
+        items = libraries.scan(fetch_library, libraryParentIDs)
+        logger.info(f"Found {len(items)} movies in the library")
+    except Exception as e:
+        logger.error(f"Failed to get items: {str(e)}")
+        return 1
+
+    # Movies Shirley Temple appears in, asked of the server once instead of reading every cast list
+    profiling.phase("person index")
+    try:
+        person_index = people.PersonIndex.build(client, [rules.UNWATCHED_EXCLUDED_PERSON], exact=True)
+    except Exception as e:
+        logger.error(f"Failed to look up excluded people: {str(e)}")
+        return 1
+
+    # The watch status user's play state, kept in STATE_DIR and refreshed with only what changed
+    # since the last run; without it every movie's UserData is asked for one by one
+    profiling.phase("watch state")
+    try:
+        watch_state = watchstate.WatchState(client, watch_status_user_id).sync(full=args.full_watch_sync)
+    except retry.ABORTING_ERRORS:
+        raise
+    except Exception as e:
+        logger.warning(f"Failed to sync the watch state, checking each movie on the server instead: {str(e)}")
+        watch_state = None
+
+    # Function to get current items in a collection
+    def get_collection_items(collection_id):
+        try:
+            # Try multiple approaches to get collection items
+            # Approach 1: Using Collections endpoint
+            collection_items_response = http.get(f"{base_url}/Collections/{collection_id}/Items", headers=headers)
+            if collection_items_response.status_code == 200:
+                items = collection_items_response.json().get("Items", [])
+                logger.debug(f"Retrieved {len(items)} items from collection using Collections endpoint")
+                return [item.get('Id') for item in items]
+            else:
+                logger.debug(f"Failed to get collection items from Collections endpoint, status code: {collection_items_response.status_code}")
+
+            # Approach 2: Using Users endpoint
+            users_endpoint = f"{base_url}/Users/{admin_user_id}/Items/{collection_id}/Items"
+            logger.debug(f"Trying Users endpoint: {users_endpoint}")
+            alt_response = http.get(users_endpoint, headers=headers)
+            if alt_response.status_code == 200:
+                items = alt_response.json().get("Items", [])
+                logger.debug(f"Retrieved {len(items)} items from collection using Users endpoint")
+                return [item.get('Id') for item in items]
+            else:
+                logger.debug(f"Users endpoint also failed, status code: {alt_response.status_code}")
+
+            # Approach 3: Using direct Items endpoint with parent filter
+            items_endpoint = f"{base_url}/Items"
+            params = {
+                "ParentId": collection_id,
+                "Recursive": True
+            }
+            logger.debug("Trying Items endpoint with ParentId filter")
+            items_response = http.get(items_endpoint, headers=headers, params=params)
+            if items_response.status_code == 200:
+                items = items_response.json().get("Items", [])
+                logger.debug(f"Retrieved {len(items)} items from collection using Items endpoint")
+                return [item.get('Id') for item in items]
+            else:
+                logger.debug(f"Items endpoint also failed, status code: {items_response.status_code}")
+
+            # If we get here, we couldn't retrieve the items
+            logger.warning("Could not retrieve collection items using any method")
+            return []
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to get collection items: {str(e)}")
+            return []
+
+
+    # Function to check if a movie is watched or not by the specified user
+    @profiling.timed("watch-status resolution")
+    def is_watched(item_id):
+        if watch_state is not None:
+            return rules.is_played(watch_state.get(item_id, {}))
+        try:
+            # First try the individual item UserData endpoint
+            user_data_url = f"{base_url}/Users/{watch_status_user_id}/Items/{item_id}/UserData"
+            user_data_response = http.get(user_data_url, headers=headers)
+
+            if user_data_response.status_code == 200:
+                # Played, mostly played or played before, the same rule as every other job
+                return rules.is_played(user_data_response.json())
+            else:
+                # If the first method fails, try the alternative approach using Items API with fields
+                logger.debug(f"First method failed with status code: {user_data_response.status_code}, trying alternative method")
+
+                # Alternative method: Get the item with UserData included in fields
+                item_url = f"{base_url}/Users/{watch_status_user_id}/Items/{item_id}"
+                item_params = {
+                    "Fields": "UserData"
+                }
+                item_response = http.get(item_url, headers=headers, params=item_params)
+
+                if item_response.status_code == 200:
+                    item_data = item_response.json()
+                    return rules.is_played(item_data.get('UserData', {}))
+                else:
+                    logger.error(f"Both watch status methods failed for item {item_id}")
+                    return False  # Default to "not watched" if both methods fail
+
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to check if movie {item_id} is watched: {str(e)}")
+            return False  # Assume not watched in case of error
+
+
+    # Function to check if a movie should be excluded based on path or metadata
+    def should_exclude(item_details, movie_id):
+        movie_name = item_details.get('Name', '')
+
+        # Case-insensitive check for "Shirley Temple" in the path, title and overview, and the person index
+        if rules.excluded_person_reason(item_details, person_index):
+            return True
+
+        # Directly check for UserData in the item details; the same rule as rules.unwatched_exclusion_reason
+        if rules.is_played(item_details.get('UserData', {})):
+            logger.debug("Excluding movie: %s | Reason: Marked as watched in item details", movie_name)
+            logs.count("excluded (watched)")
+            return True
+
+        # Extra check of the watch status user's own user data
+        try:
+            if watch_state is not None:
+                user_data = watch_state.get(movie_id, {})
+            else:
+                # Try getting the item with UserData fields explicitly
+                item_url = f"{base_url}/Users/{watch_status_user_id}/Items/{movie_id}"
+                item_params = {
+                    "Fields": "UserData"
+                }
+                with profiling.PROFILER.section("watch-status resolution"):
+                    item_response = http.get(item_url, headers=headers, params=item_params)
+                user_data = item_response.json().get('UserData', {}) if item_response.status_code == 200 else None
+
+            # Played flag, PlayedPercentage and PlayCount
+            if user_data is not None and rules.is_played(user_data):
+                logger.debug("Excluding movie: %s | Reason: Marked as played (direct check)", movie_name)
+                logs.count("excluded (watched)")
+                return True
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in detailed watch status check for {movie_name}: {str(e)}")
+
+        return False  # Not excluded
+
+
+    write_skipped = False  # Set when the membership is unchanged and nothing was written
+
+    # Creates a new collection if it doesn't exist, otherwise brings it in line with item_ids_to_add
+    # by removing stale items and adding only the missing ones. With plan_only nothing is written.
+    def create_or_update_collection(collection_name, item_ids_to_add, plan_only=False):
+        nonlocal write_skipped
+        collection_id = None
+        existing_items = []
+
+        try:
+            collection = client.find_collection(admin_user_id, collection_name)
+            collection_id = collection.get("Id") if collection else None
+            poster_path = config.poster_path(POSTER)
+            # Same membership and poster as the last run applied, and the server still agrees: nothing to write
+            fingerprint = planner.membership_fingerprint(item_ids_to_add, poster_path)
+            if not plan_only and planner.is_unchanged(collection, fingerprint):
+                logger.info(f"{collection_name} is unchanged since the last run ({collection.get('ChildCount')} items), skipping the write phase")
+                write_skipped = True
+                return collection_id
+
+            if collection_id:
+                logger.info(f"Found existing collection: {collection_name}")
+                existing_items = get_collection_items(collection_id)
+                logger.info(f"Collection currently has {len(existing_items)} items")
+
+            to_add, to_remove = planner.diff(existing_items, item_ids_to_add)
+            plan = planner.CollectionPlan(collection_name, collection_id, to_add, to_remove,
+                                          names=movie_names, poster_path=poster_path)
+            plan.print_summary(show_items=plan_only)
+            if plan_only:
+                return collection_id
+
+            collection_id = planner.apply_collection_plan(client, plan, embyLibraryParentID, journal=journal)
+            if collection_id:
+                planner.record_applied_plan(plan, collection_id, existing_items, fingerprint)
+            return collection_id
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Exception in create_or_update_collection: {str(e)}")
+            return None
+
+
+    # Main execution flow
+    profiling.phase("rule evaluation")
+    logger.info("Starting Unwatched Movies Collection update process...")
+
+    # Process all movies to determine watched status
+    unwatched_item_ids = []
+    watched_count = 0
+    excluded_count = 0
+    shirley_temple_excluded = 0
+    processed_count = 0
+    total_movies = len(items)
+
+    # Collect the IDs of all Shirley Temple movies for extra validation
+    shirley_temple_ids = []
+
+    # Movie names by ID, for the plan printout
+    movie_names = {}
+
+    # Watch decisions an interrupted run already made are not asked for again
+    decided = journal.resume("rule evaluation", [item['Id'] for item in items])
+
+    logger.info(f"Processing {total_movies} movies to check watch status...")
+    for item in items:
+        processed_count += 1
+        if processed_count % 50 == 0:
+            logger.info(f"Processed {processed_count}/{total_movies} movies...")
+
+        try:
+            movie_id = item['Id']
+            item_details = item  # The scan already returned the path, overview and UserData
+            movie_name = item_details.get('Name', 'Unknown Title')
+            movie_names[movie_id] = movie_name
+            path = item_details.get('Path', '')
+
+            # Explicit check for Shirley Temple in path (case-insensitive)
+            if path and "shirley temple" in path.lower():
+                logger.debug("Excluding movie: %s | Reason: Shirley Temple in path", movie_name)
+                logs.count("excluded (person)")
+                shirley_temple_excluded += 1
+                shirley_temple_ids.append(movie_id)
+                excluded_count += 1
+                continue
+
+            # Check the person index for Shirley Temple
+            if movie_id in person_index:
+                logger.debug("Excluding movie: %s | Reason: Stars Shirley Temple", movie_name)
+                logs.count("excluded (person)")
+                shirley_temple_excluded += 1
+                shirley_temple_ids.append(movie_id)
+                excluded_count += 1
+                continue
+
+            # Additional checks for other exclusion criteria, then whether the user has watched it
+            decision = decided.get(movie_id)
+            if decision is None:
+                if should_exclude(item_details, movie_id):
+                    decision = "excluded"
+                else:
+                    decision = "watched" if is_watched(movie_id) else "unwatched"
+                journal.record(movie_id, decision)
+
+            if decision == "excluded":
+                excluded_count += 1
+                continue
+
+            if decision == "watched":
+                logger.debug("Excluding movie: %s | Status: Watched", movie_name)
+                logs.count("watched")
+                watched_count += 1
+            else:
+                logger.debug("Adding movie: %s | Status: Unwatched", movie_name)
+                logs.count("unwatched")
+                unwatched_item_ids.append(movie_id)
+
+        except retry.ABORTING_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process item {item.get('Id')}: {str(e)}")
+
+    journal.finish()
+
+    logger.info(f"Found {len(unwatched_item_ids)} unwatched movies")
+    logger.info(f"Found {watched_count} watched movies")
+    logger.info(f"Excluded {excluded_count} movies due to other criteria")
+    logger.info(f"Excluded {shirley_temple_excluded} Shirley Temple movies specifically")
+
+    # Double-check for any Shirley Temple movies that might have been missed
+    profiling.phase("validation")
+    items_by_id = {item['Id']: item for item in items}
+    logger.info("Performing final validation to ensure all Shirley Temple movies are excluded...")
+    final_unwatched_list = []
+    shirley_found_in_list = 0
+
+    for movie_id in unwatched_item_ids:
+        if movie_id in shirley_temple_ids:
+            shirley_found_in_list += 1
+            logger.warning(f"Shirley Temple movie with ID {movie_id} was still in the unwatched list - removing it")
+            continue
+
+        # Double-check the path one more time
+        try:
+            item_details = items_by_id[movie_id]
+            path = item_details.get('Path', '')
+
+            if path and "shirley temple" in path.lower():
+                shirley_found_in_list += 1
+                logger.warning(f"Shirley Temple movie {item_details.get('Name', 'Unknown')} was still in the unwatched list - removing it")
+                continue
+
+            final_unwatched_list.append(movie_id)
+        except Exception as e:
+            logger.error(f"Exception in final validation for movie {movie_id}: {str(e)}")
+            # Include the movie if there's an error checking it, to be safe
+            final_unwatched_list.append(movie_id)
+
+    if shirley_found_in_list > 0:
+        logger.info(f"Found and removed {shirley_found_in_list} Shirley Temple movies during final validation")
+        logger.info(f"Final unwatched movie count: {len(final_unwatched_list)}")
+    else:
+        logger.info("Final validation complete - no Shirley Temple movies found in the list")
+        final_unwatched_list = unwatched_item_ids
+
+    profiling.phase("write-back")
+    if final_unwatched_list:
+        collection_id = create_or_update_collection(collection_name, final_unwatched_list, plan_only=args.plan)
+        if args.plan:
+            logger.info("Plan mode: no changes were made")
+        elif write_skipped:
+            logger.info("Unwatched Movies collection is unchanged, nothing written")
+        elif collection_id:
+            logger.info("Unwatched Movies collection updated successfully!")
+            logger.info(f"Collection now contains {len(final_unwatched_list)} unwatched movies")
+    else:
+        logger.info("No unwatched movies found. Collection will not be created/updated.")
+    return 0
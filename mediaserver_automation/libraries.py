@@ -0,0 +1,41 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# EMBY_LIBRARY_PARENT_ID and EMBY_MUSIC_LIBRARY_ID may list several libraries, comma-separated
+# (e.g. separate 4K, kids and archive movie libraries). The first one is where new collections
+# are created.
+
+MAX_PARALLEL_SCANS = 4
+
+
+# Fetch every library on its own thread, so adding a library does not add its scan time to
+# the job, and merge the results in library order. Items that show up in more than one
+# library are kept once. fetch(library_id) returns that library's items and raises on failure;
+# the first failure is raised here once all scans have finished.
+def scan(fetch, library_ids, max_workers=MAX_PARALLEL_SCANS):
+    library_ids = library_ids or [None]  # No library configured: search the whole server, as before
+
+    def timed_fetch(library_id):
+        start = time.perf_counter()
+        items = fetch(library_id)
+        if len(library_ids) > 1:
+            logger.info(f"Library {library_id}: {len(items)} items in {time.perf_counter() - start:.1f}s")
+        return items
+
+    if len(library_ids) == 1:
+        results = [timed_fetch(library_ids[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(library_ids))) as executor:
+            results = list(executor.map(timed_fetch, library_ids))
+
+    merged = []
+    seen = set()
+    for items in results:
+        for item in items:
+            if item.get("Id") not in seen:
+                seen.add(item.get("Id"))
+                merged.append(item)
+    return merged
@@ -0,0 +1,145 @@
+import importlib.util
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+from mediaserver_automation import config, logs, metrics
+from mediaserver_automation.client import EmbyClient
+from mediaserver_automation.incremental import IncrementalUpdater
+from mediaserver_automation.work_queue import CoalescingWorkQueue
+
+DEVICE_ID = "mediaserver-automation-listener"
+RECONNECT_DELAY = 10  # Seconds to wait before reconnecting after the socket closes
+KEEP_ALIVE_INTERVAL = 30  # Seconds between keep-alives until the server's ForceKeepAlive sets it
+
+logger = logging.getLogger(__name__)
+
+
+# Build the Emby WebSocket URL from the server URL, unless EMBY_WEBSOCKET_URL overrides it
+def websocket_url(settings):
+    if settings.websocket_url:
+        return settings.websocket_url
+    parsed = urlparse(settings.base_url)
+    scheme = "wss" if parsed.scheme == "https" else "ws"
+    query = urlencode({"api_key": settings.api_key, "deviceId": DEVICE_ID})
+    return f"{scheme}://{parsed.netloc}/embywebsocket?{query}"
+
+
+# Subscribes to Emby's WebSocket notifications and feeds affected items into the work queue,
+# so a burst of notifications during a library scan is applied as one batch
+class LibraryEventListener:
+    def __init__(self, work_queue, user_ids, url):
+        self.work_queue = work_queue
+        self.user_ids = set(user_ids)  # Users whose play state affects membership
+        self.url = url
+        self.keep_alive_interval = None
+        self.socket = None
+        self.stopped = threading.Event()
+
+    # Route a single notification; returns (changed item IDs, removed item IDs)
+    def handle_message(self, message):
+        message_type = message.get("MessageType")
+        data = message.get("Data") or {}
+
+        if message_type == "ForceKeepAlive":
+            # Data is the server's timeout in seconds; reply at half that interval
+            self.keep_alive_interval = max(int(data) / 2, 1)
+            return [], []
+
+        if message_type == "LibraryChanged":
+            return data.get("ItemsAdded", []) + data.get("ItemsUpdated", []), data.get("ItemsRemoved", [])
+
+        if message_type == "UserDataChanged":
+            # Only the admin and watch status users' play state affects membership
+            if data.get("UserId") not in self.user_ids:
+                return [], []
+            return [user_data["ItemId"] for user_data in data.get("UserDataList", []) if user_data.get("ItemId")], []
+
+        return [], []
+
+    def _on_message(self, ws, raw_message):
+        try:
+            changed_ids, removed_ids = self.handle_message(json.loads(raw_message))
+            self.work_queue.submit(changed_ids, removed_ids)
+        except Exception as e:
+            logger.error(f"Failed to handle WebSocket message: {str(e)}")
+
+    def _on_open(self, ws):
+        logger.info(f"Connected to {self.url.split('?')[0]}")
+        ws.send(json.dumps({"MessageType": "KeepAlive"}))
+
+    # Checked every second, so an interval from ForceKeepAlive applies at once instead of after
+    # the default interval has run out
+    def _keep_alive_loop(self):
+        sent_at = time.monotonic()
+        while not self.stopped.wait(1):
+            if time.monotonic() - sent_at < (self.keep_alive_interval or KEEP_ALIVE_INTERVAL):
+                continue
+            sent_at = time.monotonic()
+            try:
+                if self.socket and self.socket.sock and self.socket.sock.connected:
+                    self.socket.send(json.dumps({"MessageType": "KeepAlive"}))
+            except Exception as e:
+                logger.error(f"Failed to send keep-alive: {str(e)}")
+
+    # Connect and keep reconnecting until stop() is called. Events missed while disconnected
+    # are picked up by the next scheduled full run of the collection and playlist scripts.
+    def run(self):
+        import websocket
+
+        threading.Thread(target=self._keep_alive_loop, daemon=True).start()
+        while not self.stopped.is_set():
+            self.socket = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=lambda ws, error: logger.error(f"WebSocket error: {error}"),
+            )
+            self.socket.run_forever()
+            if not self.stopped.is_set():
+                logger.warning(f"WebSocket closed, reconnecting in {RECONNECT_DELAY} seconds...")
+                self.stopped.wait(RECONNECT_DELAY)
+
+    def stop(self):
+        self.stopped.set()
+        if self.socket:
+            self.socket.close()
+
+
+def main():
+    config.load_environment()
+    settings = config.Settings()
+    logs.setup_job("LibraryEventListener")
+
+    missing_vars = settings.missing("EMBY_SERVER_URL", "EMBY_API_KEY", "EMBY_USER_ID", "EMBY_LIBRARY_PARENT_ID")
+    if missing_vars:
+        logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+        logger.error("Please add them to your .env file or set them as environment variables")
+        exit(1)
+
+    if importlib.util.find_spec("websocket") is None:
+        logger.error("The 'websocket-client' module is not installed.")
+        logger.error("Please install it with: pip install websocket-client")
+        exit(1)
+
+    metrics.REGISTRY.job = "LibraryEventListener"
+    if settings.metrics_port:
+        metrics.serve(settings.webhook_host, settings.metrics_port)
+
+    updater = IncrementalUpdater(EmbyClient(settings.base_url, settings.api_key), settings)
+    try:
+        updater.start()
+    except Exception as e:
+        logger.error(f"Failed to load current membership: {str(e)}")
+        exit(1)
+
+    work_queue = CoalescingWorkQueue(updater.apply_changes, settings.event_debounce_seconds).start()
+    listener = LibraryEventListener(work_queue, updater.play_state_user_ids(), websocket_url(settings))
+    try:
+        listener.run()
+    except KeyboardInterrupt:
+        listener.stop()
+        work_queue.stop()
+        logger.info("Listener stopped")
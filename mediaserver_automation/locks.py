@@ -0,0 +1,106 @@
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, jobs run as before
+    fcntl = None
+
+from mediaserver_automation import config
+
+logger = logging.getLogger(__name__)
+
+LOCK_DIR_NAME = "locks"
+
+# One run of a job at a time per STATE_DIR. A run that starts while another holds the job's
+# lock does not scan the library a second time: it leaves a follow-up request next to the lock
+# and exits. When the running copy finishes it runs the job once more, however many requests
+# arrived meanwhile, so overlapping cron ticks become one follow-up run instead of parallel
+# copies fighting over the same collection.
+#
+#   STATE_DIR/locks/<job>.lock      flock()ed by the running copy, holds its PID
+#   STATE_DIR/locks/<job>.pending   present while a follow-up run is requested
+
+
+class JobLock:
+    def __init__(self, job_name):
+        directory = config.state_path(LOCK_DIR_NAME)
+        self.path = os.path.join(directory, f"{job_name}.lock")
+        self.pending_path = os.path.join(directory, f"{job_name}.pending")
+        self.lock_file = None
+
+    # Take the lock without waiting; False if another process holds it
+    def acquire(self):
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self.lock_file = lock_file
+        return True
+
+    def release(self):
+        if self.lock_file:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    # PID of the process holding the lock, for the log message
+    def holder(self):
+        try:
+            with open(self.path) as lock_file:
+                return lock_file.read().strip() or "unknown"
+        except OSError:
+            return "unknown"
+
+    def request_follow_up(self):
+        with open(self.pending_path, "w") as pending_file:
+            pending_file.write(str(os.getpid()))
+
+    def follow_up_requested(self):
+        return os.path.exists(self.pending_path)
+
+    # Consume a follow-up request; True if there was one
+    def take_follow_up(self):
+        try:
+            os.remove(self.pending_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+# Run run_once() under the job's lock and return its exit code, or None when another process is
+# already running the job and will run it once more for this request. Requests are checked again
+# after the lock is released, so one that arrives just then is never lost.
+def run_exclusively(job_name, run_once):
+    lock = JobLock(job_name)
+    if not lock.acquire():
+        lock.request_follow_up()
+        if not lock.acquire():
+            logger.info(f"{job_name} is already running (pid {lock.holder()}); it will run once more when it finishes")
+            return None
+        lock.take_follow_up()  # The other run finished in the meantime; this run serves the request
+
+    exit_code = 0
+    try:
+        while True:
+            if run_once():
+                exit_code = 1
+            if lock.take_follow_up():
+                logger.info(f"{job_name} was started again during this run, running it once more")
+                continue
+            lock.release()
+            if not lock.follow_up_requested() or not lock.acquire():
+                return exit_code
+            lock.take_follow_up()
+            logger.info(f"{job_name} was started again during this run, running it once more")
+    finally:
+        lock.release()
@@ -0,0 +1,190 @@
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+# Leveled logging for the jobs and daemons. Records are handed to a background thread through a
+# queue, so the job never blocks on stdout or journald, and that thread only flushes the stream
+# once a second or on warnings and errors. Per-item messages are logged at DEBUG with lazy
+# %-style arguments, which costs a single level check per item at the default INFO level.
+#
+#   LOG_LEVEL=DEBUG      every per-item decision (VERBOSE_LOGGING=true does the same)
+#   LOG_FORMAT=json      one JSON object per line, with job, phase and any extra fields
+
+LOGGER_NAME = "mediaserver_automation"
+FLUSH_INTERVAL = 1.0  # Seconds between flushes of buffered output
+
+# Standard LogRecord attributes; anything else on a record came in through extra={...}
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "job", "phase"}
+
+
+def default_level():
+    if os.getenv("VERBOSE_LOGGING", "false").lower() == "true":
+        return "DEBUG"
+    return os.getenv("LOG_LEVEL", "INFO").upper()
+
+
+def default_format():
+    return os.getenv("LOG_FORMAT", "text").lower()
+
+
+def get_logger(name=None):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+# Counts per phase: records by level, plus whatever the job counts with count()
+class PhaseCounters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.job = None
+        self.phase = "startup"
+        self.counts = {}  # phase -> {counter: value}, in the order phases were entered
+
+    def add(self, name, amount=1):
+        with self.lock:
+            phase_counts = self.counts.setdefault(self.phase, {})
+            phase_counts[name] = phase_counts.get(name, 0) + amount
+
+    def set_phase(self, name):
+        self.phase = name
+
+    def summary_lines(self):
+        with self.lock:
+            return [f"  {phase}: " + ", ".join(f"{name} {value}" for name, value in phase_counts.items())
+                    for phase, phase_counts in self.counts.items() if phase_counts]
+
+
+COUNTERS = PhaseCounters()
+
+
+def count(name, amount=1):
+    COUNTERS.add(name, amount)
+
+
+def set_phase(name):
+    COUNTERS.set_phase(name)
+
+
+# Tags each record with the job and the phase it was logged in, and counts warnings and errors
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        record.job = COUNTERS.job
+        record.phase = COUNTERS.phase
+        if record.levelno >= logging.WARNING:
+            COUNTERS.add(record.levelname.lower() + "s")
+        return True
+
+
+# INFO lines are printed as-is, like the scripts always have; other levels get a prefix
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        message = record.getMessage()
+        if record.levelno != logging.INFO:
+            message = f"{record.levelname}: {message}"
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "job": getattr(record, "job", None),
+            "phase": getattr(record, "phase", None),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Phase of the record the writer thread is printing, so profiling.TimedOutput can charge the
+# write to the phase the record was logged in rather than the one the job has moved on to
+WRITER_CONTEXT = threading.local()
+
+
+# StreamHandler that leaves output in the stream's buffer instead of flushing every line
+class BufferedStreamHandler(logging.StreamHandler):
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.last_flush = time.monotonic()
+
+    def emit(self, record):
+        WRITER_CONTEXT.phase = getattr(record, "phase", None)
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        if record.levelno >= logging.WARNING or time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+            self.last_flush = time.monotonic()
+
+
+# Flushes the buffer even when nothing new is being logged, so daemon output is never stuck
+class FlushingQueueListener(logging.handlers.QueueListener):
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+
+class JobLogging:
+    def __init__(self):
+        self.listener = None
+        self.handler = None
+
+    def start(self, job_name, level=None, log_format=None, stream=None):
+        level = (level or default_level()).upper()
+        log_format = (log_format or default_format()).lower()
+        COUNTERS.job = job_name
+
+        self.handler = BufferedStreamHandler(stream or sys.stdout)
+        self.handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+        # The filter runs on the job's thread, so records carry the phase they were logged in
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+        package_logger = get_logger()
+        package_logger.handlers = [queue_handler]
+        package_logger.setLevel(level)
+        package_logger.propagate = False
+
+        self.listener = FlushingQueueListener(log_queue, self.handler)
+        self.listener.start()
+
+    # Print the per-phase counters, then drain the queue and flush everything to the stream
+    def stop(self, summary=True):
+        if not self.listener:
+            return
+        lines = COUNTERS.summary_lines() if summary else []
+        if lines:
+            get_logger().info("Log summary by phase:\n" + "\n".join(lines))
+        self.listener.stop()
+        self.listener = None
+        self.handler.flush()
+
+
+JOB_LOGGING = JobLogging()
+
+
+# Send this process's logs through the background writer, and flush them when it exits.
+# Returns the job's logger.
+def setup_job(job_name, level=None, log_format=None):
+    JOB_LOGGING.start(job_name, level, log_format)
+    atexit.register(JOB_LOGGING.stop)
+    return get_logger(job_name)
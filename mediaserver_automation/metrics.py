@@ -0,0 +1,211 @@
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import requests
+
+# Per-endpoint request metrics for every job. Requests are grouped by endpoint template, e.g.
+# /Users/{id}/Items/{id}/UserData, so a run's call pattern is visible at a glance and a job that
+# silently falls back to per-item requests shows up as a jump in that template's count.
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Emby item IDs are numeric, user and library IDs are GUIDs (with or without dashes)
+ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$", re.IGNORECASE)
+
+# Emby paths are case-insensitive; fold the spellings the scripts use onto one template
+CANONICAL_SEGMENTS = {segment.lower(): segment for segment in [
+    "Users", "Items", "UserData", "Collections", "Playlists", "PlaylistItems", "Images", "Primary",
+    "Delete", "Move", "Studios", "Persons", "Genres", "Sessions", "System", "Info",
+]}
+
+
+def endpoint_template(url):
+    segments = []
+    for segment in urlparse(url).path.split("/"):
+        if not segment:
+            continue
+        if ID_SEGMENT.match(segment):
+            segments.append("{id}")
+        else:
+            segments.append(CANONICAL_SEGMENTS.get(segment.lower(), segment))
+    # Drop the /emby prefix some servers are configured with so templates match either way
+    if segments and segments[0].lower() == "emby":
+        segments = segments[1:]
+    return "/" + "/".join(segments)
+
+
+def request_size(request):
+    if request.body is None:
+        return 0
+    if isinstance(request.body, (bytes, str)):
+        return len(request.body)
+    return int(request.headers.get("Content-Length") or 0)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.job = None
+        self.requests = {}  # (method, endpoint, status) -> count
+        self.latency = {}  # (method, endpoint) -> [bucket counts..., +Inf count, sum]
+        self.retries = {}  # (method, endpoint) -> count
+        self.bytes_received = {}  # (method, endpoint) -> bytes
+        self.bytes_sent = {}  # (method, endpoint) -> bytes
+
+    def observe(self, method, url, status, seconds, bytes_received=0, bytes_sent=0):
+        key = (method, endpoint_template(url))
+        with self.lock:
+            status_key = key + (str(status),)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            histogram = self.latency.setdefault(key, [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[len(LATENCY_BUCKETS)] += 1
+            histogram[-1] += seconds
+            self.bytes_received[key] = self.bytes_received.get(key, 0) + bytes_received
+            self.bytes_sent[key] = self.bytes_sent.get(key, 0) + bytes_sent
+
+    def record_retry(self, method, url):
+        key = (method, endpoint_template(url))
+        with self.lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def total_requests(self):
+        with self.lock:
+            return sum(self.requests.values())
+
+    # Total time spent waiting on the Emby API
+    def total_seconds(self):
+        with self.lock:
+            return sum(histogram[-1] for histogram in self.latency.values())
+
+    def _labels(self, method, endpoint, **extra):
+        labels = {"job": self.job} if self.job else {}
+        labels.update({"method": method, "endpoint": endpoint})
+        labels.update(extra)
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in labels.values())
+        return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+    # Prometheus text exposition format
+    def render(self):
+        lines = []
+        with self.lock:
+            lines.append("# HELP emby_requests_total Emby API requests by endpoint template and status.")
+            lines.append("# TYPE emby_requests_total counter")
+            for (method, endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f"emby_requests_total{self._labels(method, endpoint, status=status)} {count}")
+
+            lines.append("# HELP emby_request_duration_seconds Emby API request latency.")
+            lines.append("# TYPE emby_request_duration_seconds histogram")
+            for (method, endpoint), histogram in sorted(self.latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS, histogram):
+                    lines.append(f"emby_request_duration_seconds_bucket{self._labels(method, endpoint, le=bound)} {count}")
+                lines.append(f"emby_request_duration_seconds_bucket{self._labels(method, endpoint, le='+Inf')} {histogram[len(LATENCY_BUCKETS)]}")
+                lines.append(f"emby_request_duration_seconds_sum{self._labels(method, endpoint)} {histogram[-1]:.6f}")
+                lines.append(f"emby_request_duration_seconds_count{self._labels(method, endpoint)} {histogram[len(LATENCY_BUCKETS)]}")
+
+            lines.append("# HELP emby_request_retries_total Emby API requests that were retried.")
+            lines.append("# TYPE emby_request_retries_total counter")
+            for (method, endpoint), count in sorted(self.retries.items()):
+                lines.append(f"emby_request_retries_total{self._labels(method, endpoint)} {count}")
+
+            lines.append("# HELP emby_response_bytes_total Bytes received from the Emby API.")
+            lines.append("# TYPE emby_response_bytes_total counter")
+            for (method, endpoint), count in sorted(self.bytes_received.items()):
+                lines.append(f"emby_response_bytes_total{self._labels(method, endpoint)} {count}")
+
+            lines.append("# HELP emby_request_bytes_total Bytes sent to the Emby API.")
+            lines.append("# TYPE emby_request_bytes_total counter")
+            for (method, endpoint), count in sorted(self.bytes_sent.items()):
+                lines.append(f"emby_request_bytes_total{self._labels(method, endpoint)} {count}")
+        return "\n".join(lines) + "\n"
+
+    # Write atomically so the node_exporter textfile collector never reads a partial file
+    def write_textfile(self, path):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(temp_path, path)
+
+    # Requests per endpoint template, busiest first
+    def print_summary(self):
+        with self.lock:
+            totals = {}
+            for (method, endpoint, _), count in self.requests.items():
+                totals[(method, endpoint)] = totals.get((method, endpoint), 0) + count
+            print(f"\nRequest summary ({sum(totals.values())} requests):")
+            for (method, endpoint), count in sorted(totals.items(), key=lambda entry: -entry[1]):
+                histogram = self.latency[(method, endpoint)]
+                average_ms = histogram[-1] / max(histogram[len(LATENCY_BUCKETS)], 1) * 1000
+                retries = self.retries.get((method, endpoint), 0)
+                print(f"  {count:>7} {method:<6} {endpoint:<45} avg {average_ms:7.1f} ms  "
+                      f"{self.bytes_received.get((method, endpoint), 0) / 1024:9.1f} KB"
+                      + (f"  retries {retries}" if retries else ""))
+
+
+REGISTRY = RequestMetrics()
+
+
+# requests.Session that records every request, including ones that fail to connect
+class InstrumentedSession(requests.Session):
+    def __init__(self, metrics=None):
+        super().__init__()
+        self.metrics = metrics or REGISTRY
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException:
+            self.metrics.observe(request.method, request.url, "error", time.perf_counter() - start, 0, request_size(request))
+            raise
+        received = 0 if kwargs.get("stream") else len(response.content)
+        self.metrics.observe(request.method, request.url, response.status_code, time.perf_counter() - start,
+                             received, request_size(request))
+        return response
+
+
+# Label this process's metrics and export them when the job exits
+def setup_job(job_name, textfile=None, summary=False):
+    REGISTRY.job = job_name
+    if textfile:
+        atexit.register(REGISTRY.write_textfile, textfile)
+    if summary:
+        atexit.register(REGISTRY.print_summary)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        send_metrics(self)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def send_metrics(handler):
+    body = REGISTRY.render().encode()
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+# Serve /metrics from a background thread, for daemon modes without their own HTTP server
+def serve(host, port):
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,80 @@
+import argparse
+import os
+
+# Kept free of heavy imports: the CLI builds its parser from these before deciding what to load
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+LOG_FORMATS = ["text", "json"]
+
+
+# Command-line options shared by every command that talks to Emby: metrics, profiling and logging
+def add_common_arguments(parser):
+    parser.add_argument(
+        "--metrics-file",
+        default=os.getenv("METRICS_TEXTFILE"),
+        help="write per-endpoint request metrics to this Prometheus textfile when the job exits (or set METRICS_TEXTFILE)",
+    )
+    parser.add_argument(
+        "--metrics-summary",
+        action="store_true",
+        default=os.getenv("METRICS_SUMMARY", "false").lower() == "true",
+        help="print request counts and latency per endpoint when the job exits (or set METRICS_SUMMARY=true)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=os.getenv("PROFILE", "false").lower() == "true",
+        help="time each phase of the job and print where the time went: network, output or processing (or set PROFILE=true)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=os.getenv("PROFILE_DIR"),
+        help="also write a cProfile dump and tracemalloc report per phase to this directory; implies --profile (or set PROFILE_DIR)",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=float(os.getenv("JOB_DEADLINE", "3600")),
+        help="give up on retries and new requests once the job has run this many seconds; 0 means no limit (or set JOB_DEADLINE)",
+    )
+    # None lets logs pick the level and format from LOG_LEVEL, VERBOSE_LOGGING and LOG_FORMAT
+    parser.add_argument(
+        "--log-level",
+        type=str.upper,
+        choices=LOG_LEVELS,
+        help="DEBUG shows every per-item decision; the default INFO shows progress and summaries (or set LOG_LEVEL)",
+    )
+    parser.add_argument(
+        "--log-format",
+        type=str.lower,
+        choices=LOG_FORMATS,
+        help="json writes one JSON object per line, for journald or a log shipper (or set LOG_FORMAT)",
+    )
+    return parser
+
+
+# Command-line options shared by every collection and playlist job
+def add_job_arguments(parser):
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        default=os.getenv("PLAN_MODE", "false").lower() == "true",
+        help="compute the exact adds and removes and print the API calls the apply phase would make, without writing anything (or set PLAN_MODE=true)",
+    )
+    return add_common_arguments(parser)
+
+
+# Read movie metadata from the columnar library snapshot in STATE_DIR (see snapshot.py)
+def add_snapshot_argument(parser):
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        default=os.getenv("USE_LIBRARY_SNAPSHOT", "false").lower() == "true",
+        help="read movie metadata from the library snapshot instead of scanning the server, rebuilding it when older "
+             "than LIBRARY_SNAPSHOT_MAX_AGE seconds (or set USE_LIBRARY_SNAPSHOT=true)",
+    )
+    return parser
+
+
+def parse_job_args(description, argv=None):
+    return add_job_arguments(argparse.ArgumentParser(description=description)).parse_args(argv)
@@ -0,0 +1,55 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Exclusions by cast member ("never list Shirley Temple movies") used to read the People list
+# of every movie. Instead each name is resolved to its Emby person IDs once per job and the
+# server lists the movies those people appear in (PersonIds), so the check is one set lookup
+# per movie and the scans do not need to download People at all.
+
+
+class PersonIndex:
+    def __init__(self, item_people=None):
+        self.item_people = item_people or {}  # item ID -> configured name of the person in it
+
+    # exact=False matches every person whose name contains a configured name, as the People
+    # checks in the RomComs rules always did; exact=True only matches the name itself.
+    @classmethod
+    def build(cls, client, names, item_type="Movie", exact=False):
+        item_people = {}
+        for name in names:
+            wanted = name.lower()
+            persons = client.get_json("/Persons", params={"SearchTerm": name}).get("Items", [])
+            person_ids = [person["Id"] for person in persons
+                          if (person.get("Name", "").lower() == wanted if exact else wanted in person.get("Name", "").lower())]
+            if not person_ids:
+                logger.info(f"No person named {name} on the server")
+                continue
+
+            params = {"PersonIds": ",".join(person_ids), "Recursive": True, "IncludeItemTypes": item_type}
+            items = client.get_json("/Items", params=params).get("Items", [])
+            for item in items:
+                item_people.setdefault(item["Id"], name)
+            logger.info(f"{name}: {len(person_ids)} person IDs, {len(items)} items")
+        return cls(item_people)
+
+    # The same index from the People column of a library snapshot, without asking the server
+    @classmethod
+    def from_snapshot(cls, library, names, exact=False):
+        item_people = {}
+        for name in names:
+            wanted = name.lower()
+            codes = library.codes_where("People", lambda person: person.lower() == wanted if exact else wanted in person.lower())
+            for row in library.rows_with("People", codes):
+                item_people.setdefault(library.item_id(row), name)
+        return cls(item_people)
+
+    # The configured name of the excluded person in this item, or None
+    def person_in(self, item_id):
+        return self.item_people.get(item_id)
+
+    def __contains__(self, item_id):
+        return item_id in self.item_people
+
+    def __len__(self):
+        return len(self.item_people)
@@ -0,0 +1,317 @@
+import bisect
+import hashlib
+import logging
+import math
+import os
+import time
+
+from mediaserver_automation import posters, state
+
+logger = logging.getLogger(__name__)
+
+APPLIED_STATE_NAME = "applied"
+
+
+# Fingerprint of a collection's computed membership and poster. Together with the item count
+# after the last apply it is saved per collection ID in STATE_DIR/applied.json, so a run that
+# computes the same membership, on a server that still reports the same ChildCount, can skip
+# reading the collection and the whole write phase.
+def membership_fingerprint(item_ids, poster_path=None):
+    digest = hashlib.sha256()
+    for item_id in sorted(set(item_ids)):
+        digest.update(item_id.encode("utf-8") + b"\n")
+    if poster_path and os.path.exists(poster_path):
+        digest.update(posters.prepare(poster_path)[1].encode("utf-8"))
+    return digest.hexdigest()
+
+
+# True when collection (its listing entry, see EmbyClient.find_collection) still holds what the
+# last run applied and the new run computed the same fingerprint
+def is_unchanged(collection, fingerprint):
+    if not collection:
+        return False
+    applied = state.load(APPLIED_STATE_NAME).get(collection.get("Id"))
+    return bool(applied) and applied.get("fingerprint") == fingerprint and applied.get("count") == collection.get("ChildCount")
+
+
+def record_applied(collection_id, fingerprint, count):
+    def change(document):
+        document[collection_id] = {"fingerprint": fingerprint, "count": count}
+    try:
+        state.update(APPLIED_STATE_NAME, change)
+    except OSError as e:
+        logger.warning(f"Failed to save the applied membership: {str(e)}")
+
+
+# Remember what apply_collection_plan left in the collection, unless the poster upload failed
+# and has to be tried again next run
+def record_applied_plan(plan, collection_id, existing_ids, fingerprint):
+    if plan.poster_key and posters.needs_upload(collection_id, plan.poster_key):
+        return
+    count = len(set(existing_ids).difference(plan.to_remove).union(plan.to_add))
+    record_applied(collection_id, fingerprint, count)
+
+
+# Something else changed the collection (the event-driven updater): check it in full next run
+def forget_applied(collection_id):
+    if collection_id in state.load(APPLIED_STATE_NAME):
+        try:
+            state.update(APPLIED_STATE_NAME, lambda document: document.pop(collection_id, None))
+        except OSError as e:
+            logger.warning(f"Failed to save the applied membership: {str(e)}")
+
+
+# Work out which items to add and remove to turn the current membership into the desired one.
+# Order of desired_ids is kept so batches are sent in the order the job found the items.
+def diff(current_ids, desired_ids):
+    current = set(current_ids)
+    desired = set(desired_ids)
+    to_add = [item_id for item_id in dict.fromkeys(desired_ids) if item_id not in current]
+    to_remove = [item_id for item_id in dict.fromkeys(current_ids) if item_id not in desired]
+    return to_add, to_remove
+
+
+# Moves that turn the order of entry_ids into wanted_order (the same entries, reordered), as
+# (entry ID, new index) pairs for Emby's playlist move endpoint, applied one after another; the
+# index is taken after the entry has been lifted out of the list. Entries on a longest increasing
+# subsequence of the wanted positions stay put and every other entry moves exactly once, which is
+# the fewest moves that can sort the list.
+def ordering_moves(entry_ids, wanted_order):
+    position = {entry_id: index for index, entry_id in enumerate(wanted_order)}
+    ranks = [position[entry_id] for entry_id in entry_ids]
+
+    # Patience sorting: tails[k] is the smallest rank ending an increasing run of length k + 1
+    tails, tail_index, previous = [], [], [None] * len(ranks)
+    for index, rank in enumerate(ranks):
+        k = bisect.bisect_left(tails, rank)
+        previous[index] = tail_index[k - 1] if k else None
+        if k == len(tails):
+            tails.append(rank)
+            tail_index.append(index)
+        else:
+            tails[k] = rank
+            tail_index[k] = index
+    keep = set()
+    index = tail_index[-1] if tail_index else None
+    while index is not None:
+        keep.add(entry_ids[index])
+        index = previous[index]
+
+    # Move the others in wanted order, each to just after the entry that precedes it there
+    current = list(entry_ids)
+    moves = []
+    for rank, entry_id in enumerate(wanted_order):
+        if entry_id in keep:
+            continue
+        current.remove(entry_id)
+        new_index = current.index(wanted_order[rank - 1]) + 1 if rank else 0
+        current.insert(new_index, entry_id)
+        moves.append((entry_id, new_index))
+    return moves
+
+
+# The exact membership changes for one collection or playlist and the API calls needed to apply them
+class MembershipPlan:
+    kind = None
+
+    def __init__(self, name, target_id, to_add, to_remove, batch_size, names=None):
+        self.name = name
+        self.target_id = target_id  # None when the collection/playlist has to be created
+        self.to_add = list(to_add)
+        self.to_remove = list(to_remove)
+        self.batch_size = batch_size
+        self.names = names or {}  # item ID -> display name, for the plan printout
+
+    def is_empty(self):
+        return not self.to_add and not self.to_remove
+
+    # List of (method, endpoint template, number of calls, description)
+    def api_calls(self):
+        raise NotImplementedError
+
+    def total_calls(self):
+        return sum(count for _, _, count, _ in self.api_calls())
+
+    def print_summary(self, show_items=True):
+        lines = [f"\nPlan for {self.kind} '{self.name}':"]
+        if not self.target_id:
+            lines.append(f"  {self.kind.capitalize()} does not exist yet and would be created")
+        lines.append(f"  Items to add: {len(self.to_add)}")
+        if show_items:
+            lines.extend(f"    + {self.names.get(item_id, item_id)}" for item_id in self.to_add)
+        lines.append(f"  Items to remove: {len(self.to_remove)}")
+        if show_items:
+            lines.extend(f"    - {self.names.get(item_id, item_id)}" for item_id in self.to_remove)
+        lines.append(f"  API calls the apply phase would make: {self.total_calls()}")
+        for method, endpoint, count, description in self.api_calls():
+            lines.append(f"    {count} x {method} {endpoint} ({description})")
+        # One record, so the plan stays together in JSON-lines output
+        logger.info("\n".join(lines), extra={"plan_adds": len(self.to_add), "plan_removes": len(self.to_remove),
+                                             "plan_api_calls": self.total_calls()})
+
+
+class CollectionPlan(MembershipPlan):
+    kind = "collection"
+
+    def __init__(self, name, target_id, to_add, to_remove, batch_size=20, names=None, poster_path=None):
+        super().__init__(name, target_id, to_add, to_remove, batch_size, names)
+        # The poster is uploaded only when its content differs from what this collection last got
+        self.poster_path = None  # Source image, set only when an upload is needed
+        self.poster_upload_path = None  # Resized variant (or the source itself) that is sent
+        self.poster_key = None
+        self.poster_unchanged = False
+        if poster_path and os.path.exists(poster_path):
+            self.poster_upload_path, self.poster_key = posters.prepare(poster_path)
+            if posters.needs_upload(target_id, self.poster_key):
+                self.poster_path = poster_path
+            else:
+                self.poster_unchanged = True
+
+    def api_calls(self):
+        calls = []
+        remaining = len(self.to_add)
+        if not self.target_id and remaining:
+            first_batch = min(remaining, self.batch_size)
+            calls.append(("POST", "/Collections", 1, f"create collection with {first_batch} items"))
+            remaining -= first_batch
+        if remaining:
+            calls.append(("POST", "/Collections/{id}/Items", math.ceil(remaining / self.batch_size),
+                          f"add {remaining} items in batches of {self.batch_size}"))
+        if self.to_remove and self.target_id:
+            calls.append(("DELETE", "/Collections/{id}/Items", 1, f"remove {len(self.to_remove)} items"))
+        if self.poster_path:
+            calls.append(("POST", "/Items/{id}/Images/Primary", 1, f"upload {os.path.basename(self.poster_path)}"))
+        return calls
+
+
+class PlaylistPlan(MembershipPlan):
+    kind = "playlist"
+
+    # to_remove holds PlaylistItemId entry IDs, which is what the removal endpoint takes; moves
+    # the (entry ID, new index) pairs from ordering_moves, when the playlist is kept in date order
+    def __init__(self, name, target_id, to_add, to_remove, batch_size=100, names=None, moves=None):
+        super().__init__(name, target_id, to_add, to_remove, batch_size, names)
+        self.moves = list(moves or [])
+
+    def is_empty(self):
+        return super().is_empty() and not self.moves
+
+    def api_calls(self):
+        calls = []
+        if not self.target_id and self.to_add:
+            calls.append(("POST", "/Playlists", 1, "create playlist"))
+        if self.to_add:
+            calls.append(("POST", "/Playlists/{id}/Items", math.ceil(len(self.to_add) / self.batch_size),
+                          f"add {len(self.to_add)} items in batches of {self.batch_size}"))
+        if self.to_remove:
+            calls.append(("DELETE", "/Playlists/{id}/Items", math.ceil(len(self.to_remove) / self.batch_size),
+                          f"remove {len(self.to_remove)} entries in batches of {self.batch_size}"))
+        if self.moves:
+            calls.append(("POST", "/Playlists/{id}/Items/{entry id}/Move/{index}", len(self.moves),
+                          f"move {len(self.moves)} entries into date order"))
+        return calls
+
+
+# Apply a collection plan; returns the collection ID, or None if the collection could not be created.
+# Items are added before stale ones are removed, so an interrupted run leaves extra items behind
+# rather than missing ones. With a checkpoint.Checkpoint as journal the plan is saved before the
+# first request and trimmed as batches succeed; whatever failed stays in it for the next run's
+# finish_interrupted_write.
+def apply_collection_plan(client, plan, parent_id, batch_delay=1, journal=None):
+    collection_id = plan.target_id
+    to_add = plan.to_add
+    complete = True
+    if journal:
+        journal.begin_write(plan, parent_id)
+
+    if not collection_id:
+        if not to_add:
+            logger.warning(f"No items found to create collection '{plan.name}' with. Cannot create empty collection.")
+            if journal:
+                journal.end_write()
+            return None
+        logger.info(f"Creating new collection '{plan.name}' with {len(to_add)} items...")
+        collection_id = client.create_collection(plan.name, parent_id, to_add[:plan.batch_size])
+        if not collection_id:
+            logger.error(f"Failed to create collection '{plan.name}'")
+            return None
+        logger.info(f"Successfully created new collection with ID: {collection_id}")
+        if journal:
+            journal.write_progress(collection_id=collection_id, added=to_add[:plan.batch_size])
+        to_add = to_add[plan.batch_size:]
+
+    if to_add:
+        logger.info(f"Adding {len(to_add)} items to collection in batches of {plan.batch_size}")
+        failed_batches = 0
+        for i in range(0, len(to_add), plan.batch_size):
+            if i and batch_delay:
+                time.sleep(batch_delay)
+            batch = to_add[i:i + plan.batch_size]
+            if client.add_to_collection(collection_id, batch, plan.batch_size):
+                if journal:
+                    journal.write_progress(added=batch)
+            else:
+                failed_batches += 1
+        if failed_batches:
+            logger.warning(f"Some batches failed while adding items to '{plan.name}'")
+            complete = False
+
+    if plan.to_remove and plan.target_id:
+        logger.info(f"Removing {len(plan.to_remove)} items from collection")
+        if client.remove_from_collection(collection_id, plan.to_remove):
+            removed = plan.to_remove
+        else:
+            # Last resort: remove the items one by one
+            logger.warning("Bulk removal failed, attempting to remove items one by one...")
+            removed = [item_id for item_id in plan.to_remove if client.remove_from_collection(collection_id, [item_id])]
+            logger.info(f"Removed {len(removed)}/{len(plan.to_remove)} items individually")
+            complete = complete and len(removed) == len(plan.to_remove)
+        if journal:
+            journal.write_progress(removed=removed)
+    if journal:
+        if complete:
+            journal.end_write()
+        else:
+            pending = journal.pending_write() or {}
+            logger.warning(f"Left {len(pending.get('to_add', []))} adds and {len(pending.get('to_remove', []))} removes "
+                           f"of '{plan.name}' for the next run to retry")
+
+    if plan.poster_path:
+        logger.info("Setting custom poster image for collection")
+        response = client.upload_image(collection_id, plan.poster_upload_path)
+        logger.info(f"Set collection image response: {response.status_code}")
+        if response.status_code in [200, 204]:
+            posters.record_upload(collection_id, plan.poster_key)
+    elif plan.poster_unchanged:
+        logger.info("Custom poster unchanged since the last upload, skipping")
+
+    return collection_id
+
+
+# Finish the write phase an earlier run of the job was interrupted in, before a new plan is
+# worked out; the new plan's diff then corrects anything that changed since
+def finish_interrupted_write(client, journal, user_id, batch_delay=1):
+    pending = journal.pending_write()
+    if not pending:
+        return
+    collection_id = pending.get("collection_id")
+    if not collection_id:
+        # Killed before the collection ID was saved; it may exist already
+        collection = client.find_collection(user_id, pending["collection"])
+        collection_id = collection.get("Id") if collection else None
+    to_add = pending["to_add"]
+    to_remove = pending["to_remove"] if collection_id else []
+    if collection_id:
+        # Only send what the collection still needs: it may have been changed since the write was planned
+        current_ids = client.get_collection_item_ids(user_id, collection_id)
+        if current_ids is not None:
+            current_ids = set(current_ids)
+            to_add = [item_id for item_id in to_add if item_id not in current_ids]
+            to_remove = [item_id for item_id in to_remove if item_id in current_ids]
+    logger.info(f"Finishing the interrupted write phase of '{pending['collection']}': "
+                f"{len(to_add)} adds and {len(to_remove)} removes left")
+    plan = CollectionPlan(pending["collection"], collection_id, to_add, to_remove)
+    collection_id = apply_collection_plan(client, plan, pending.get("parent_id"), batch_delay, journal)
+    if collection_id:
+        forget_applied(collection_id)
+
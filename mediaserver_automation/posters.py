@@ -0,0 +1,176 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from mediaserver_automation import config, state
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "posters"
+CACHE_DIR_NAME = "poster-cache"
+CHUNK_SIZE = 1024 * 1024
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+# Emby shows collection images a few hundred pixels wide; twice that still looks sharp on
+# high-DPI screens. POSTER_MAX_WIDTH=0 uploads the original files untouched.
+DEFAULT_MAX_WIDTH = 800
+DEFAULT_MAX_HEIGHT = 1200
+DEFAULT_JPEG_QUALITY = 85
+
+# Remembers what was last uploaded to each collection, so an unchanged image is not pushed to
+# Emby again. The state document looks like:
+#
+#   {"collections": {collection ID: upload key},
+#    "files": {poster path: {"size": ..., "mtime_ns": ..., "sha256": ...}}}
+#
+# "files" caches each poster's hash by size and modification time, so a nightly run only
+# stats the file instead of reading it. The upload key is the source hash plus the resize
+# settings, so changing either one uploads the poster again.
+#
+# Resized variants are cached in STATE_DIR/poster-cache, named after their upload key. They
+# need Pillow (pip install "mediaserver-automation[posters]"); without it the originals are
+# uploaded as before.
+
+state_lock = threading.Lock()  # Posters can be prepared from several threads at once
+pillow_warning = threading.Event()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as image_file:
+        for chunk in iter(lambda: image_file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def poster_sha256(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    with state_lock:
+        cached = state.load(STATE_NAME).get("files", {}).get(path)
+    if cached and cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns:
+        return cached["sha256"]
+
+    sha256 = file_sha256(path)
+    cached = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+    with state_lock:
+        state.update(STATE_NAME, lambda document: document.setdefault("files", {}).update({path: cached}))
+    return sha256
+
+
+# A new collection (no ID yet) always needs its poster
+def needs_upload(collection_id, upload_key):
+    if not collection_id:
+        return True
+    with state_lock:
+        return state.load(STATE_NAME).get("collections", {}).get(collection_id) != upload_key
+
+
+def record_upload(collection_id, upload_key):
+    with state_lock:
+        state.update(STATE_NAME, lambda document: document.setdefault("collections", {}).update({collection_id: upload_key}))
+
+
+# (max width, max height, JPEG quality) for the processed variants
+def variant_settings():
+    return (int(os.getenv("POSTER_MAX_WIDTH", DEFAULT_MAX_WIDTH)),
+            int(os.getenv("POSTER_MAX_HEIGHT", DEFAULT_MAX_HEIGHT)),
+            int(os.getenv("POSTER_JPEG_QUALITY", DEFAULT_JPEG_QUALITY)))
+
+
+def import_pillow():
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        if not pillow_warning.is_set():
+            pillow_warning.set()
+            logger.info("Pillow is not installed, uploading posters at their original size (pip install Pillow)")
+        return None
+    return Image, ImageOps
+
+
+# Shrink the image to fit the bounding box and recompress it. Images with real transparency
+# stay PNG, everything else becomes a progressive JPEG. Returns (bytes, extension).
+def render_variant(path, max_width, max_height, quality, pillow):
+    Image, ImageOps = pillow
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((max_width, max_height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P") and image.convert("RGBA").getextrema()[3][0] < 255:
+            image.save(buffer, "PNG", optimize=True)
+            return buffer.getvalue(), ".png"
+        image.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+        return buffer.getvalue(), ".jpg"
+
+
+def write_atomically(path, data):
+    fd, temp_path = tempfile.mkstemp(prefix=".poster.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as variant_file:
+            variant_file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+# Return (path to upload, upload key) for a poster: the cached resized variant when there is
+# one, otherwise it is rendered now. Falls back to the original file if it cannot be processed.
+def prepare(path):
+    sha256 = poster_sha256(path)
+    max_width, max_height, quality = variant_settings()
+    if max_width <= 0 or max_height <= 0:
+        return path, sha256
+
+    upload_key = f"{sha256}-{max_width}x{max_height}q{quality}"
+    cache_dir = config.state_path(CACHE_DIR_NAME)
+    for extension in IMAGE_EXTENSIONS:
+        cached = os.path.join(cache_dir, upload_key + extension)
+        if os.path.exists(cached):
+            return cached, upload_key
+
+    pillow = import_pillow()
+    if not pillow:
+        return path, sha256
+    try:
+        data, extension = render_variant(path, max_width, max_height, quality, pillow)
+    except Exception as e:
+        logger.warning(f"Failed to process poster {path}, uploading the original: {str(e)}")
+        return path, sha256
+
+    # Small images that are already well compressed can come out larger; keep the original bytes
+    original_size = os.path.getsize(path)
+    if len(data) >= original_size:
+        extension = os.path.splitext(path)[1].lower()
+        with open(path, 'rb') as image_file:
+            data = image_file.read()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    variant = os.path.join(cache_dir, upload_key + extension)
+    write_atomically(variant, data)
+    logger.info(f"Prepared poster {os.path.basename(path)}: {original_size / 1024:.0f} KB -> {len(data) / 1024:.0f} KB")
+    return variant, upload_key
+
+
+# Prepare several posters at once; Pillow releases the GIL while decoding and encoding.
+# Returns {source path: (path to upload, upload key)}.
+def prepare_all(paths, max_workers=4):
+    paths = [path for path in dict.fromkeys(paths) if os.path.exists(path)]
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        return dict(zip(paths, executor.map(prepare, paths)))
+
+
+# Every image in the poster directory
+def poster_files():
+    poster_dir = config.poster_dir()
+    if not os.path.isdir(poster_dir):
+        return []
+    return sorted(os.path.join(poster_dir, name) for name in os.listdir(poster_dir)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
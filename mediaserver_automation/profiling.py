@@ -0,0 +1,290 @@
+import atexit
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+from mediaserver_automation import logs, metrics
+
+# Phase timers for the collection and playlist jobs. A job moves through top-level phases
+# (user resolution, library scan, rule evaluation, validation, write-back) with phase(), and
+# can mark nested work such as watch-status lookups with section() or @timed. Time is
+# exclusive: a section's time is taken out of the phase it runs in. For every phase the
+# report splits wall time into network (Emby request latency), output (time spent writing
+# to stdout) and the rest, which is mostly JSON decoding and rule evaluation. Log records are
+# written by the background writer thread (logs.JobLogging); that time is charged to the phase
+# the record was logged in, but as it runs beside the job it is not taken out of the rest.
+#
+# With a report directory each top-level phase also gets a cProfile dump plus its top
+# functions, and a tracemalloc comparison of what the phase left allocated.
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+
+
+# Snapshot without the profiler's own bookkeeping, so the memory report shows the job's allocations
+def take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+
+class PhaseStats:
+    def __init__(self, name):
+        self.name = name
+        self.entries = 0
+        self.wall_seconds = 0.0
+        self.requests = 0
+        self.network_seconds = 0.0
+        self.output_seconds = 0.0
+        self.output_bytes = 0
+        self.job_thread_output_seconds = 0.0  # The part of output_seconds the job itself waited for
+        self.peak_memory = None  # Bytes, only when tracemalloc is running
+
+    def other_seconds(self):
+        return max(self.wall_seconds - self.network_seconds - self.job_thread_output_seconds, 0.0)
+
+    def as_dict(self):
+        return {
+            "phase": self.name,
+            "entries": self.entries,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "requests": self.requests,
+            "network_seconds": round(self.network_seconds, 6),
+            "output_seconds": round(self.output_seconds, 6),
+            "output_bytes": self.output_bytes,
+            "other_seconds": round(self.other_seconds(), 6),
+            "peak_memory_bytes": self.peak_memory,
+        }
+
+
+# Wraps sys.stdout to charge the time spent printing to the current phase
+class TimedOutput:
+    def __init__(self, profiler, stream):
+        self.profiler = profiler
+        self.stream = stream
+
+    def write(self, text):
+        start = time.perf_counter()
+        written = self.stream.write(text)
+        self.profiler.charge_output(time.perf_counter() - start, len(text))
+        return written
+
+    def flush(self):
+        start = time.perf_counter()
+        self.stream.flush()
+        self.profiler.charge_output(time.perf_counter() - start, 0)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class PhaseProfiler:
+    def __init__(self, request_metrics=None):
+        self.metrics = request_metrics or metrics.REGISTRY
+        self.enabled = False
+        self.report_dir = None
+        self.job = None
+        self.phases = {}  # name -> PhaseStats, in the order phases were first entered
+        self.stack = []  # [name, started, requests at start, network seconds at start]
+        self.top_level = None  # (name, report file prefix, cProfile.Profile, tracemalloc snapshot) for the current phase
+        self.phase_count = 0
+        self.thread = threading.current_thread()
+        self.output_lock = threading.Lock()
+        self.finished = False
+
+    def enable(self, job_name, report_dir=None):
+        self.enabled = True
+        self.job = job_name
+        self.report_dir = report_dir
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+            tracemalloc.start()
+        sys.stdout = TimedOutput(self, sys.stdout)
+        self.phase("startup")
+
+    def _stats(self, name):
+        if name not in self.phases:
+            self.phases[name] = PhaseStats(name)
+        return self.phases[name]
+
+    # Start timing the innermost frame
+    def _push(self, name):
+        self._stats(name).entries += 1
+        self.stack.append([name, time.perf_counter(), self.metrics.total_requests(), self.metrics.total_seconds()])
+
+    # Charge the innermost frame's time since it was (re)started and leave it paused
+    def _charge_top(self):
+        name, started, requests_at_start, network_at_start = self.stack[-1]
+        stats = self._stats(name)
+        stats.wall_seconds += time.perf_counter() - started
+        stats.requests += self.metrics.total_requests() - requests_at_start
+        stats.network_seconds += self.metrics.total_seconds() - network_at_start
+
+    def _resume_top(self):
+        if self.stack:
+            self.stack[-1][1:] = [time.perf_counter(), self.metrics.total_requests(), self.metrics.total_seconds()]
+
+    # On the job's thread output goes to the innermost frame; on the log writer thread to the
+    # phase of the record being written (only phases the job has entered already)
+    def charge_output(self, seconds, size):
+        on_job_thread = threading.current_thread() is self.thread
+        if on_job_thread:
+            stats = self._stats(self.stack[-1][0]) if self.stack else None
+        else:
+            stats = self.phases.get(getattr(logs.WRITER_CONTEXT, "phase", None))
+        if stats is None:
+            return
+        with self.output_lock:
+            stats.output_seconds += seconds
+            stats.output_bytes += size
+            if on_job_thread:
+                stats.job_thread_output_seconds += seconds
+
+    def _end_top_level(self):
+        if not self.top_level:
+            return
+        name, prefix, profile, snapshot = self.top_level
+        self.top_level = None
+        if profile:
+            profile.disable()
+            self._write_profile(prefix, profile)
+        if snapshot:
+            self._stats(name).peak_memory = max(tracemalloc.get_traced_memory()[1], self._stats(name).peak_memory or 0)
+            self._write_allocations(name, prefix, snapshot, take_snapshot())
+
+    # End the current top-level phase (and any open sections) and start the next one
+    def phase(self, name):
+        if not self.enabled or self.finished:
+            return
+        while self.stack:
+            self._charge_top()
+            self.stack.pop()
+        self._end_top_level()
+
+        self.phase_count += 1
+        prefix = profile = snapshot = None
+        if self.report_dir:
+            slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+            prefix = os.path.join(self.report_dir, f"{self.phase_count:02d}-{slug}")
+            tracemalloc.reset_peak()
+            snapshot = take_snapshot()
+            profile = cProfile.Profile()
+        self.top_level = (name, prefix, profile, snapshot)
+        self._push(name)
+        if profile:
+            profile.enable()
+
+    # Nested, exclusive timing inside the current phase, e.g. the watch-status lookups
+    def section(self, name):
+        return _Section(self, name)
+
+    def finish(self):
+        if not self.enabled or self.finished:
+            return
+        while self.stack:
+            self._charge_top()
+            self.stack.pop()
+        self._end_top_level()
+        self.finished = True
+        if isinstance(sys.stdout, TimedOutput):
+            sys.stdout = sys.stdout.stream
+
+    def report(self):
+        self.finish()
+        phases = list(self.phases.values())
+        total = sum(stats.wall_seconds for stats in phases)
+        print(f"\nPhase profile for {self.job} ({total:.2f}s):")
+        print(f"  {'phase':<26} {'wall_s':>9} {'share':>6} {'requests':>9} {'network_s':>10} {'output_s':>9} {'other_s':>9}"
+              + (f" {'peak_MB':>8}" if self.report_dir else ""))
+        for stats in phases:
+            share = stats.wall_seconds / total * 100 if total else 0
+            line = (f"  {stats.name:<26} {stats.wall_seconds:>9.3f} {share:>5.1f}% {stats.requests:>9} "
+                    f"{stats.network_seconds:>10.3f} {stats.output_seconds:>9.3f} {stats.other_seconds():>9.3f}")
+            if self.report_dir:
+                line += f" {(stats.peak_memory or 0) / (1024 * 1024):>8.1f}" if stats.peak_memory is not None else f" {'-':>8}"
+            print(line)
+
+        if self.report_dir:
+            summary_path = os.path.join(self.report_dir, "phases.json")
+            with open(summary_path, "w") as summary_file:
+                json.dump({"job": self.job, "total_seconds": round(total, 6),
+                           "phases": [stats.as_dict() for stats in phases]}, summary_file, indent=2)
+            print(f"Profile report written to {self.report_dir}")
+
+    def _write_profile(self, prefix, profile):
+        profile.dump_stats(f"{prefix}.prof")
+        text = io.StringIO()
+        stats = pstats.Stats(profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+        with open(f"{prefix}-functions.txt", "w") as report_file:
+            report_file.write(text.getvalue())
+
+    def _write_allocations(self, name, prefix, before, after):
+        with open(f"{prefix}-memory.txt", "w") as report_file:
+            current, peak = tracemalloc.get_traced_memory()
+            report_file.write(f"Traced memory at end of phase: {current / 1024:.1f} KB, peak during phase: {peak / 1024:.1f} KB\n")
+            report_file.write(f"Top {TOP_ALLOCATIONS} allocation changes during '{name}':\n")
+            for stat in after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]:
+                report_file.write(f"{stat}\n")
+
+
+class _Section:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.active = False
+
+    def __enter__(self):
+        profiler = self.profiler
+        # Sections are only timed on the job's main thread, inside a phase
+        if profiler.enabled and not profiler.finished and profiler.stack and threading.current_thread() is profiler.thread:
+            profiler._charge_top()
+            profiler._push(self.name)
+            self.active = True
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.active and self.profiler.stack:
+            self.profiler._charge_top()
+            self.profiler.stack.pop()
+            self.profiler._resume_top()
+        return False
+
+
+PROFILER = PhaseProfiler()
+
+
+# Decorator form of PROFILER.section()
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with PROFILER.section(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Move the job into its next phase, for both the phase timers and the log counters
+def phase(name):
+    logs.set_phase(name)
+    PROFILER.phase(name)
+
+
+# Turn on phase timing for this job and print (and optionally write) the report when it exits
+def setup_job(job_name, enabled=False, report_dir=None):
+    if not (enabled or report_dir):
+        return
+    PROFILER.enable(job_name, report_dir)
+    atexit.register(PROFILER.report)
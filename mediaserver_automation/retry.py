@@ -0,0 +1,283 @@
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from mediaserver_automation import metrics, state
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_STATE_NAME = "circuit"
+
+# Statuses worth retrying: the server is overloaded, restarting or behind a proxy that timed out.
+# Anything else (404, 400, 401...) fails the same way every time.
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# A POST that reached the server may have been applied, so it is only retried when the server
+# says it did not process it
+RETRYABLE_POST_STATUSES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class DeadlineExceeded(requests.Timeout):
+    pass
+
+
+# Raised for every request once the circuit is open or the deadline has passed, so the jobs'
+# per-item error handlers re-raise them: carrying on would only turn each failed lookup into a
+# wrong "not watched" or "not excluded" decision. cli.run_jobs stops the job on them.
+ABORTING_ERRORS = (CircuitOpenError, DeadlineExceeded)
+
+
+# How hard to try, read from the environment:
+#   MAX_RETRIES                 attempts per request, as the playlist script always counted them (3)
+#   RETRY_BACKOFF_BASE          first backoff in seconds, doubled on every attempt (0.5)
+#   RETRY_BACKOFF_MAX           longest single backoff in seconds (30)
+#   REQUEST_TIMEOUT             read timeout in seconds for one attempt (60)
+#   CIRCUIT_BREAKER_THRESHOLD   consecutive failed attempts that open the circuit (5)
+#   CIRCUIT_BREAKER_COOLDOWN    seconds an open circuit rejects requests before trying again (300)
+#   RATE_LIMIT                  most requests per second to one server, 0 for no limit (0)
+class RetryPolicy:
+    def __init__(self, max_attempts=3, backoff_base=0.5, backoff_max=30.0, timeout=60.0,
+                 breaker_threshold=5, breaker_cooldown=300.0, rate_limit=0.0):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.rate_limit = rate_limit
+
+    @classmethod
+    def from_environment(cls):
+        return cls(
+            max_attempts=int(os.getenv("MAX_RETRIES", "3")),
+            backoff_base=float(os.getenv("RETRY_BACKOFF_BASE", "0.5")),
+            backoff_max=float(os.getenv("RETRY_BACKOFF_MAX", "30")),
+            timeout=float(os.getenv("REQUEST_TIMEOUT", "60")),
+            breaker_threshold=int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "5")),
+            breaker_cooldown=float(os.getenv("CIRCUIT_BREAKER_COOLDOWN", "300")),
+            rate_limit=float(os.getenv("RATE_LIMIT", "0")),
+        )
+
+    def is_retryable(self, method, status_code):
+        if method.upper() in IDEMPOTENT_METHODS:
+            return status_code in RETRYABLE_STATUSES
+        return status_code in RETRYABLE_POST_STATUSES
+
+    # A POST is only retried if the connection was never made, so it cannot have been applied
+    def is_retryable_error(self, method, error):
+        if method.upper() in IDEMPOTENT_METHODS:
+            return True
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    # Exponential backoff with full jitter, so several jobs retrying together spread out
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+# Wall-clock budget for the whole job. Once it is spent no request is retried or started,
+# so a struggling server cannot keep a cron job running into the next one.
+class Deadline:
+    def __init__(self):
+        self.expires_at = None
+
+    def start(self, seconds):
+        self.expires_at = time.monotonic() + seconds if seconds and seconds > 0 else None
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+
+DEADLINE = Deadline()
+
+
+# One breaker per server, shared by every session in the process. After breaker_threshold
+# consecutive failures (connection errors and 5xx responses) the circuit opens and requests
+# fail immediately for breaker_cooldown seconds; then one request is let through to probe.
+# The open state is saved, so the cron jobs that follow also skip a server that is down.
+class CircuitBreaker:
+    def __init__(self, server, threshold, cooldown):
+        self.server = server
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.open_until = state.load(CIRCUIT_STATE_NAME).get(server, 0)
+        self.probing = False
+
+    def before_request(self):
+        with self.lock:
+            if not self.open_until:
+                return
+            if time.time() < self.open_until or self.probing:
+                raise CircuitOpenError(f"Circuit open for {self.server}: too many consecutive failures, "
+                                       f"retrying after {time.strftime('%H:%M:%S', time.localtime(self.open_until))}")
+            self.probing = True  # Cooldown over: let this one request through
+
+    def record_success(self):
+        with self.lock:
+            was_open = bool(self.open_until)
+            self.failures = 0
+            self.open_until = 0
+            self.probing = False
+        if was_open:
+            logger.info(f"Circuit closed for {self.server}")
+            self._save(0)
+
+    # Open on reaching the threshold, or again straight away when the probe after a cooldown fails
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            probe_failed = self.probing
+            self.probing = False
+            if not probe_failed and self.failures != self.threshold:
+                return
+            self.open_until = time.time() + self.cooldown
+            open_until = self.open_until
+        logger.error(f"Circuit opened for {self.server} after {self.failures} consecutive failures; "
+                     f"requests fail immediately for {self.cooldown:.0f}s")
+        self._save(open_until)
+
+    def _save(self, open_until):
+        def change(document):
+            if open_until:
+                document[self.server] = open_until
+            else:
+                document.pop(self.server, None)
+        try:
+            state.update(CIRCUIT_STATE_NAME, change)
+        except OSError as e:
+            logger.warning(f"Failed to save circuit state: {str(e)}")
+
+
+# Spaces requests to one server evenly, across all threads, so a scan never sends more than
+# rate requests per second. Each caller reserves the next free slot and sleeps until it.
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+breakers = {}
+limiters = {}
+servers_lock = threading.Lock()
+
+
+def server_key(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def breaker_for(url, policy):
+    server = server_key(url)
+    with servers_lock:
+        if server not in breakers:
+            breakers[server] = CircuitBreaker(server, policy.breaker_threshold, policy.breaker_cooldown)
+        return breakers[server]
+
+
+def limiter_for(url, policy):
+    server = server_key(url)
+    with servers_lock:
+        if server not in limiters:
+            limiters[server] = RateLimiter(policy.rate_limit)
+        return limiters[server]
+
+
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to normal backoff
+
+
+# Instrumented session that retries transient failures under the shared policy, deadline,
+# circuit breaker and rate limit. Every attempt goes through send(), so metrics count each one and the retries.
+class RetryingSession(metrics.InstrumentedSession):
+    def __init__(self, policy=None, metrics=None):
+        super().__init__(metrics)
+        self.policy = policy or RetryPolicy.from_environment()
+
+    def request(self, method, url, **kwargs):
+        breaker = breaker_for(url, self.policy)
+        limiter = limiter_for(url, self.policy)
+        timeout_override = kwargs.pop("timeout", None)
+        attempt = 0
+        while True:
+            remaining = DEADLINE.remaining()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded(f"Job deadline passed before {method} {url}")
+            breaker.before_request()
+            limiter.wait()
+
+            timeout = timeout_override
+            if timeout is None:
+                timeout = self.policy.timeout if remaining is None else min(self.policy.timeout, remaining)
+                timeout = (min(10.0, timeout), timeout)  # (connect, read)
+            try:
+                response = super().request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record_failure()
+                delay = self._next_delay(method, attempt, None) if self.policy.is_retryable_error(method, e) else None
+                if delay is None:
+                    raise
+                logger.warning(f"{method} {url} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if not self.policy.is_retryable(method, response.status_code):
+                    return response
+                delay = self._next_delay(method, attempt, retry_after_seconds(response))
+                if delay is None:
+                    return response
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+
+            attempt += 1
+            self.metrics.record_retry(method, url)
+            time.sleep(delay)
+            if hasattr(kwargs.get("data"), "seek"):
+                kwargs["data"].seek(0)  # Streamed upload: send the file from the start again
+
+    # Seconds to wait before the next attempt, or None when no attempt is left in the budget
+    def _next_delay(self, method, attempt, retry_after):
+        if attempt + 1 >= self.policy.max_attempts:
+            return None
+        delay = self.policy.backoff(attempt, retry_after)
+        remaining = DEADLINE.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+
+def setup_job(deadline_seconds=None):
+    DEADLINE.start(deadline_seconds)
@@ -0,0 +1,161 @@
+import datetime
+import re
+
+# Membership rules for every collection and playlist job. The scheduled scripts and the
+# event-driven updaters all evaluate items through these functions so they always agree.
+# Each *_exclusion_reason function returns a human readable reason, or None if the item belongs.
+
+# Disney Collection
+DISNEY_COLLECTION_NAME = "Disney Collection"  ## Desired name of the collection -- Update this as necessary
+DISNEY_STUDIOS = ["Disney", "Marvel", "Lucasfilm"]  ## Array of studios to search for -- Add or Remove as necessary
+DISNEY_RATINGS = ["G", "PG"]  ## Desired Content Rating to search for -- Updated as necessary
+
+# Romantic Comedies
+ROMCOMS_COLLECTION_NAME = "Romantic Comedies"  ## Desired name of the collection -- Update this as necessary
+ROMCOMS_REQUIRED_GENRES = ["Comedy", "Romance"]  ## Both of these genres are required
+ROMCOMS_EXCLUDED_GENRES = ["Animation"]  ## Exclude these genres
+ROMCOMS_EXCLUDED_ACTORS = ["Shirley Temple"]  ## Fixed name - was incorrectly "Shirley Ellison"
+ROMCOMS_HARD_EXCLUDED_TITLES = ["Baby Take a Bow", "Elemental", "Hercules"]  ## Specifically troublesome movies
+
+# Unwatched Movies
+UNWATCHED_COLLECTION_NAME = "Unwatched Movies"  ## Desired name of the collection
+UNWATCHED_WATCH_STATUS_USER = "Dusty & Lara"  ## User whose watch status to check
+UNWATCHED_EXCLUDED_PERSON = "shirley temple"  ## Lower-case; movies mentioning this person are never listed
+
+# Recently Added playlist
+DEFAULT_EXCLUDE_ITEMS = "Candy Cane,Mistletoe,Rudolph,Holly,Nick,Jingle,Holiday,Christmas,Xmas,Grinch,X-mas,Nutcracker,Santa,Snow,Winter,December,Hanukkah,Chanukah,Kwanzaa,New Year,Noel,Yule,Yuletide,Yule log,Yul,David Mendoza"
+
+# Fields the rules read, for item queries that should return everything needed in one request
+MOVIE_FIELDS = "Path,Overview,People,Genres,Studios,OfficialRating"
+# The same without People, for scans that take cast exclusions from a people.PersonIndex
+MOVIE_LIST_FIELDS = "Path,Overview,Genres,Studios,OfficialRating"
+AUDIO_FIELDS = "DateCreated,Artists"
+
+
+# With studio_ids (from studios.matching_studios) the studios are matched by ID instead of by name
+def matches_disney(item, studio_ids=None):
+    if 'Studios' not in item or 'OfficialRating' not in item:
+        return False
+    if item['OfficialRating'] not in DISNEY_RATINGS:
+        return False
+    if studio_ids is not None:
+        return any(studio.get('Id') in studio_ids for studio in item['Studios'])
+    return any(any(desired_studio in studio['Name'] for desired_studio in DISNEY_STUDIOS)
+               for studio in item['Studios'])
+
+
+# With person_index the cast check is a lookup in the index; without it the item's People are read
+def romcom_exclusion_reason(item, person_index=None):
+    movie_name = item.get('Name', '')
+    path = item.get('Path', '')
+    overview = item.get('Overview', '')
+    genres = item.get('Genres', [])
+
+    if movie_name in ROMCOMS_HARD_EXCLUDED_TITLES:
+        return "Hard-coded exclusion"
+    if any(genre in ROMCOMS_EXCLUDED_GENRES for genre in genres):
+        return "Contains excluded genre"
+    if not all(genre in genres for genre in ROMCOMS_REQUIRED_GENRES):
+        return "Missing required genres"
+
+    for actor in ROMCOMS_EXCLUDED_ACTORS:
+        if path and actor.lower() in path.lower():
+            return "Excluded actor in path"
+    for actor in ROMCOMS_EXCLUDED_ACTORS:
+        if actor.lower() in movie_name.lower() or (overview and actor.lower() in overview.lower()):
+            return "Excluded actor in title/overview"
+    if person_index is not None:
+        actor = person_index.person_in(item.get('Id'))
+        return f"Cast includes {actor}" if actor else None
+    for person in item.get('People', []):
+        for actor in ROMCOMS_EXCLUDED_ACTORS:
+            if actor.lower() in person.get('Name', '').lower():
+                return f"Cast includes {actor}"
+    return None
+
+
+def matches_romcom(item):
+    return romcom_exclusion_reason(item) is None
+
+
+# Returns True if the user data shows the movie as watched
+def is_played(user_data):
+    return (user_data.get('Played', False)
+            or user_data.get('PlayedPercentage', 0) > 90
+            or user_data.get('PlayCount', 0) > 0)
+
+
+# Shirley Temple checks shared by the Unwatched Movies job and the collection audit
+def excluded_person_reason(item, person_index=None):
+    path = item.get('Path', '')
+    overview = item.get('Overview', '')
+
+    if path and UNWATCHED_EXCLUDED_PERSON in path.lower():
+        return "Shirley Temple in path"
+    if UNWATCHED_EXCLUDED_PERSON in item.get('Name', '').lower() or (overview and UNWATCHED_EXCLUDED_PERSON in overview.lower()):
+        return "Shirley Temple in title/overview"
+    if person_index is not None:
+        return "Stars Shirley Temple" if item.get('Id') in person_index else None
+    for person in item.get('People', []):
+        if person.get('Name', '').lower() == UNWATCHED_EXCLUDED_PERSON:
+            return "Stars Shirley Temple"
+    return None
+
+
+# item is the movie as the admin user lists it; watch_user_data is the watch status user's UserData
+# for it. Played according to either one leaves the movie out, as the scheduled job decides it.
+def unwatched_exclusion_reason(item, watch_user_data, person_index=None):
+    reason = excluded_person_reason(item, person_index)
+    if reason:
+        return reason
+    if is_played(item.get('UserData', {})):
+        return "Marked as watched in item details"
+    if is_played(watch_user_data):
+        return "Watched"
+    return None
+
+
+def matches_unwatched(item, watch_user_data):
+    return unwatched_exclusion_reason(item, watch_user_data) is None
+
+
+EMBY_DATE = re.compile(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?')
+
+
+# Parse an Emby date such as 2024-01-31T20:15:00.0000000Z into an aware datetime. Servers and
+# versions differ in the number of fraction digits (none up to seven) and in Z or an offset;
+# a value without either is UTC. Raises ValueError for anything else.
+def parse_emby_date(value):
+    match = EMBY_DATE.fullmatch(value.strip()) if isinstance(value, str) else None
+    if not match:
+        raise ValueError(f"Not an Emby date: {value!r}")
+    seconds, fraction, zone = match.groups()
+    parsed = datetime.datetime.strptime(seconds, '%Y-%m-%dT%H:%M:%S')
+    if fraction:
+        parsed = parsed.replace(microsecond=int(fraction[:6].ljust(6, '0')))
+    if not zone or zone == 'Z':
+        return parsed.replace(tzinfo=datetime.timezone.utc)
+    offset = datetime.timedelta(hours=int(zone[1:3]), minutes=int(zone[-2:]))
+    return parsed.replace(tzinfo=datetime.timezone(-offset if zone[0] == '-' else offset))
+
+
+def is_recently_added(item, now, number_of_days):
+    return (now - parse_emby_date(item["DateCreated"])).days < number_of_days
+
+
+def recently_added_exclusion_reason(item, exclude_items):
+    if any(exclude_item.lower() in item["Name"].lower() for exclude_item in exclude_items):
+        return "matches exclusion criteria"
+    if "Artists" in item and any(any(exclude_item.lower() in artist.lower() for exclude_item in exclude_items) for artist in item["Artists"]):
+        return "artist matches exclusion criteria"
+    return None
+
+
+# Collection name, membership predicate, the item type it applies to (None = any video) and
+# whether items that stop matching are taken out again. The Disney Collection only ever grows.
+# matches_unwatched also takes the watch status user's UserData for the item.
+COLLECTION_RULES = [
+    (DISNEY_COLLECTION_NAME, matches_disney, None, False),
+    (ROMCOMS_COLLECTION_NAME, matches_romcom, "Movie", True),
+    (UNWATCHED_COLLECTION_NAME, matches_unwatched, "Movie", True),
+]
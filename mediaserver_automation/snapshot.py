@@ -0,0 +1,331 @@
+import datetime
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+from mediaserver_automation import config, libraries
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "library.snapshot"
+MAGIC = b"MSASNAP1"
+VERSION = 1
+MAX_AGE = 3600  # Rebuild the snapshot when it is older than this (LIBRARY_SNAPSHOT_MAX_AGE)
+FIELDS = "Path,Overview,People,Genres,Studios,OfficialRating,ProductionYear,DateCreated"
+
+# Library metadata saved in STATE_DIR as one columnar file that is memory-mapped instead of
+# parsed, so a cold process can open a 100k-item library in milliseconds. The layout is
+#
+#   MAGIC | header length (uint32) | JSON header | columns, each aligned to 8 bytes
+#
+# The header names the server and libraries, and gives every column's type code, offset and
+# length. Columns are native-endian arrays read through memoryview.cast, nothing is copied:
+#
+#   Id.data          fixed-width IDs (Id.width bytes each, NUL padded), in item order
+#   Id.order         item rows sorted by ID, for binary search
+#   DateCreated      int64 seconds since the epoch, 0 when unknown
+#   ProductionYear   uint16, 0 when unknown
+#   Type, OfficialRating
+#                    uint16 code into the column's dictionary
+#   Genres, Studios, People
+#                    per item, a range of uint32 codes into the column's dictionary:
+#                    <column>.offsets (one more than there are items) and <column>.codes
+#   Name, Path, Overview
+#                    UTF-8 strings: <column>.offsets and <column>.data
+#
+# A dictionary is a string table of names (<column>.names) and, for Studios and People, one
+# of IDs (<column>.ids). Per-user data such as watch state is left out: it differs per user
+# and changes far more often than the metadata does.
+
+DICTIONARY_COLUMNS = ["Type", "OfficialRating"]
+LIST_COLUMNS = ["Genres", "Studios", "People"]
+STRING_COLUMNS = ["Name", "Path", "Overview"]
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.0000000Z"
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def date_seconds(value):
+    if not value:
+        return 0
+    return int(datetime.datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def emby_date(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).strftime(DATE_FORMAT)
+
+
+# Collects the columns of a snapshot being written
+class ColumnWriter:
+    def __init__(self):
+        self.columns = {}  # name -> (type code, length, bytes)
+
+    def add(self, name, typecode, values):
+        values = array(typecode, values)
+        self.columns[name] = (typecode, len(values), values.tobytes())
+
+    def add_strings(self, name, strings):
+        encoded = [value.encode("utf-8") for value in strings]
+        offsets = [0]
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        self.add(f"{name}.offsets", "I", offsets)
+        self.columns[f"{name}.data"] = ("B", offsets[-1], b"".join(encoded))
+
+    # Dictionary-encode one value per item; code 0 is the empty value
+    def add_dictionary(self, name, values):
+        codes = {"": 0}
+        self.add(name, "H", [codes.setdefault(value or "", len(codes)) for value in values])
+        self.add_strings(f"{name}.names", codes)
+
+    # Dictionary-encode a list of (name, ID) entries per item
+    def add_lists(self, name, lists, with_ids=True):
+        codes = {}
+        offsets = [0]
+        item_codes = []
+        for entries in lists:
+            item_codes.extend(codes.setdefault(entry, len(codes)) for entry in entries)
+            offsets.append(len(item_codes))
+        self.add(f"{name}.offsets", "I", offsets)
+        self.add(f"{name}.codes", "I", item_codes)
+        self.add_strings(f"{name}.names", [entry[0] for entry in codes])
+        if with_ids:
+            self.add_strings(f"{name}.ids", [entry[1] for entry in codes])
+
+    def write(self, path, header):
+        layout = {}
+        position = 0
+        for name, (typecode, length, data) in self.columns.items():
+            layout[name] = [typecode, position, length]
+            position += len(data) + (-len(data) % 8)
+        header = json.dumps(dict(header, version=VERSION, byteorder=sys.byteorder, columns=layout)).encode("utf-8")
+        prefix = MAGIC + struct.pack("<I", len(header)) + header
+        prefix += b"\0" * (-len(prefix) % 8)
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".snapshot.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as snapshot_file:
+                snapshot_file.write(prefix)
+                for _, _, data in self.columns.values():
+                    snapshot_file.write(data)
+                    snapshot_file.write(b"\0" * (-len(data) % 8))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+# Write items as returned by /Items with FIELDS to a snapshot file
+def write(path, items, server=None, library_ids=None):
+    ids = [item["Id"].encode("utf-8") for item in items]
+    width = max((len(item_id) for item_id in ids), default=1)
+    columns = ColumnWriter()
+    columns.columns["Id.data"] = ("B", width * len(ids), b"".join(item_id.ljust(width, b"\0") for item_id in ids))
+    columns.add("Id.order", "I", sorted(range(len(ids)), key=ids.__getitem__))
+    columns.add("DateCreated", "q", [date_seconds(item.get("DateCreated")) for item in items])
+    columns.add("ProductionYear", "H", [item.get("ProductionYear") or 0 for item in items])
+    for name in DICTIONARY_COLUMNS:
+        columns.add_dictionary(name, [item.get(name) for item in items])
+    columns.add_lists("Genres", [[(genre, None) for genre in item.get("Genres", [])] for item in items], with_ids=False)
+    for name in ("Studios", "People"):
+        columns.add_lists(name, [[(entry.get("Name", ""), entry.get("Id", "")) for entry in item.get(name, [])] for item in items])
+    for name in STRING_COLUMNS:
+        columns.add_strings(name, [item.get(name) or "" for item in items])
+    columns.write(path, {"server": server, "library_ids": library_ids or [], "built_at": time.time(),
+                         "count": len(items), "id_width": width})
+
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, "rb") as snapshot_file:
+            self.mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.header = self._read_header()
+            view = memoryview(self.mmap)
+            self.views = [view]
+            self.columns = {}
+            start = self.header["data_start"]
+            for name, (typecode, offset, length) in self.header["columns"].items():
+                size = array(typecode).itemsize
+                column = view[start + offset:start + offset + length * size].cast(typecode)
+                self.views.append(column)
+                self.columns[name] = column
+        except BaseException:
+            self.close()
+            raise
+        self.path = path
+        self.count = self.header["count"]
+        self.width = self.header["id_width"]
+        self.dictionaries = {}
+
+    def _read_header(self):
+        if self.mmap[:len(MAGIC)] != MAGIC:
+            raise SnapshotError("not a library snapshot")
+        (length,) = struct.unpack_from("<I", self.mmap, len(MAGIC))
+        header_end = len(MAGIC) + 4 + length
+        header = json.loads(self.mmap[len(MAGIC) + 4:header_end].decode("utf-8"))
+        if header.get("version") != VERSION or header.get("byteorder") != sys.byteorder:
+            raise SnapshotError(f"snapshot version {header.get('version')} ({header.get('byteorder')}-endian) "
+                                f"cannot be read here")
+        header["data_start"] = header_end + (-header_end % 8)
+        return header
+
+    def close(self):
+        for view in reversed(getattr(self, "views", [])):
+            view.release()
+        self.views = []
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def server(self):
+        return self.header.get("server")
+
+    @property
+    def library_ids(self):
+        return self.header.get("library_ids", [])
+
+    def age(self):
+        return time.time() - self.header.get("built_at", 0)
+
+    def string(self, name, row):
+        offsets = self.columns[f"{name}.offsets"]
+        return self.columns[f"{name}.data"][offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
+
+    # [(name, ID)] entries of a dictionary-encoded column, indexed by code; decoded once
+    def dictionary(self, name):
+        if name not in self.dictionaries:
+            names = [self.string(f"{name}.names", code) for code in range(len(self.columns[f"{name}.names.offsets"]) - 1)]
+            if f"{name}.ids.offsets" in self.columns:
+                ids = [self.string(f"{name}.ids", code) for code in range(len(names))]
+            else:
+                ids = [None] * len(names)
+            self.dictionaries[name] = list(zip(names, ids))
+        return self.dictionaries[name]
+
+    # Dictionary codes of a column whose name satisfies predicate(name)
+    def codes_where(self, name, predicate):
+        return [code for code, (entry_name, _) in enumerate(self.dictionary(name)) if predicate(entry_name)]
+
+    def item_id(self, row):
+        return self.columns["Id.data"][row * self.width:(row + 1) * self.width].tobytes().rstrip(b"\0").decode("utf-8")
+
+    # Row of an item ID, or None; a binary search over Id.order
+    def row_of(self, item_id):
+        order = self.columns["Id.order"]
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.item_id(order[middle]) < item_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order) and self.item_id(order[low]) == item_id:
+            return order[low]
+        return None
+
+    def codes(self, name, row):
+        offsets = self.columns[f"{name}.offsets"]
+        return self.columns[f"{name}.codes"][offsets[row]:offsets[row + 1]]
+
+    # Rows whose list column holds any of the given dictionary codes, in item order
+    def rows_with(self, name, codes):
+        codes = set(codes)
+        if not codes:
+            return []
+        offsets = self.columns[f"{name}.offsets"]
+        item_codes = self.columns[f"{name}.codes"]
+        rows = []
+        row = 0
+        for position, code in enumerate(item_codes):
+            if code in codes:
+                while offsets[row + 1] <= position:
+                    row += 1
+                if not rows or rows[-1] != row:
+                    rows.append(row)
+        return rows
+
+    def item_type(self, row):
+        return self.dictionary("Type")[self.columns["Type"][row]][0]
+
+    # The item as /Items with FIELDS returns it; fields the server did not send are left out
+    def item(self, row):
+        item = {"Id": self.item_id(row), "Name": self.string("Name", row), "Type": self.item_type(row)}
+        for name in ("Path", "Overview"):
+            value = self.string(name, row)
+            if value:
+                item[name] = value
+        rating = self.columns["OfficialRating"][row]
+        if rating:
+            item["OfficialRating"] = self.dictionary("OfficialRating")[rating][0]
+        if self.columns["ProductionYear"][row]:
+            item["ProductionYear"] = self.columns["ProductionYear"][row]
+        if self.columns["DateCreated"][row]:
+            item["DateCreated"] = emby_date(self.columns["DateCreated"][row])
+        item["Genres"] = [self.dictionary("Genres")[code][0] for code in self.codes("Genres", row)]
+        for name in ("Studios", "People"):
+            entries = self.dictionary(name)
+            item[name] = [{"Name": entries[code][0], "Id": entries[code][1]} for code in self.codes(name, row)]
+        return item
+
+    def get(self, item_id):
+        row = self.row_of(item_id)
+        return None if row is None else self.item(row)
+
+    def rows(self, item_type=None):
+        if item_type is None:
+            return range(self.count)
+        codes = {code for code, (name, _) in enumerate(self.dictionary("Type")) if name == item_type}
+        types = self.columns["Type"]
+        return [row for row in range(self.count) if types[row] in codes]
+
+    def items(self, item_type=None):
+        return [self.item(row) for row in self.rows(item_type)]
+
+
+# Scan the libraries with every field the rules read and save them as the snapshot
+def build(client, library_ids, path=None):
+    path = path or config.state_path(SNAPSHOT_FILE)
+    params = {"Recursive": True, "MediaTypes": "Video", "Fields": FIELDS}
+    start = time.perf_counter()
+    items = libraries.scan(lambda library_id: client.get_json("/Items", params=dict(params, ParentId=library_id)).get("Items", []),
+                           library_ids)
+    write(path, items, server=client.base_url, library_ids=library_ids)
+    logger.info(f"Saved library snapshot of {len(items)} items in {time.perf_counter() - start:.1f}s "
+                f"({os.path.getsize(path) / 1024:.0f} KB)")
+    return Snapshot(path)
+
+
+# The saved snapshot of these libraries on this client's server, rebuilt when it is missing,
+# unreadable, older than max_age or refresh is set
+def load(client, library_ids, refresh=False, max_age=None):
+    max_age = float(os.getenv("LIBRARY_SNAPSHOT_MAX_AGE", MAX_AGE)) if max_age is None else max_age
+    path = config.state_path(SNAPSHOT_FILE)
+    if not refresh and os.path.exists(path):
+        try:
+            snapshot = Snapshot(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable library snapshot {path}: {str(e)}")
+        else:
+            if snapshot.server == client.base_url and snapshot.library_ids == list(library_ids) and snapshot.age() <= max_age:
+                return snapshot
+            snapshot.close()
+    return build(client, library_ids, path)
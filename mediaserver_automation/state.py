@@ -0,0 +1,59 @@
+import json
+import logging
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, updates are not serialized
+    fcntl = None
+
+from mediaserver_automation import config
+
+logger = logging.getLogger(__name__)
+
+
+# Small JSON documents the jobs keep between runs, one file per name under STATE_DIR.
+# A missing or unreadable file just means nothing is remembered yet.
+def load(name):
+    path = config.state_path(f"{name}.json")
+    try:
+        with open(path) as state_file:
+            return json.load(state_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable state file {path}: {str(e)}")
+        return {}
+
+
+# Write to a temporary file and rename it over the old one, so an interrupted run never
+# leaves a half-written document behind
+def save(name, data):
+    path = config.state_path(f"{name}.json")
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as state_file:
+            json.dump(data, state_file, indent=2, sort_keys=True)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+# Load, change and save a document while holding its lock file, so jobs running at the same
+# time (or fan-out children sharing a STATE_DIR) never save over each other's changes.
+# change(document) edits the document in place. Returns the saved document.
+def update(name, change):
+    path = config.state_path(f"{name}.json")
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f".{name}.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        document = load(name)
+        change(document)
+        save(name, document)
+        return document
@@ -0,0 +1,41 @@
+import logging
+import os
+import time
+
+from mediaserver_automation import state
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "studios"
+MAX_AGE = 24 * 3600  # Studios are added rarely; relist them once a day (STUDIO_CACHE_MAX_AGE)
+
+# A library has a few hundred studios, so matching names like "Disney" against every studio of
+# every movie repeats the same comparisons thousands of times. Instead /Studios is listed once,
+# the matching studio IDs are kept in STATE_DIR, and the library is queried by StudioIds. The
+# cache is per server and per list of names, so editing DISNEY_STUDIOS relists at once.
+
+
+def name_matches(studio_name, names):
+    return any(name in studio_name for name in names)
+
+
+# {studio ID: studio name} for the studios whose name contains one of the given names
+def matching_studios(client, names, refresh=False, max_age=None):
+    max_age = float(os.getenv("STUDIO_CACHE_MAX_AGE", MAX_AGE)) if max_age is None else max_age
+    document = state.load(STATE_NAME)
+    cached = document.get(client.base_url)
+    if (not refresh and cached and cached.get("names") == list(names)
+            and time.time() - cached.get("listed_at", 0) <= max_age):
+        return cached["studios"]
+
+    all_studios = client.get_json("/Studios").get("Items", [])
+    studios = {studio["Id"]: studio.get("Name", "") for studio in all_studios
+               if name_matches(studio.get("Name", ""), names)}
+    logger.info(f"{len(studios)} of {len(all_studios)} studios match {', '.join(names)}")
+
+    cached = {"names": list(names), "listed_at": time.time(), "studios": studios}
+    try:
+        state.update(STATE_NAME, lambda document: document.update({client.base_url: cached}))
+    except OSError as e:
+        logger.warning(f"Failed to save studio cache: {str(e)}")
+    return studios
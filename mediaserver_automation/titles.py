@@ -0,0 +1,145 @@
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import Counter
+
+from mediaserver_automation import config, snapshot, state
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "title-index"
+MIN_SCORE = 0.45  # Below this a match is a guess, not an answer
+MAX_AGE = 24 * 3600  # Rebuild the index once a day, or sooner with --refresh-index
+
+LEADING_ARTICLE = re.compile(r"^(the|a|an) ")
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+TRAILING_YEAR = re.compile(r"\s*[\(\[]?((?:19|20)\d{2})[\)\]]?\s*$")
+
+# Movie titles from the server, kept in STATE_DIR so title lookups do not need a search
+# request. Titles are normalized (case, accents, punctuation, "&", a leading "The") and
+# compared by trigram similarity, so "Monsters Inc" finds "Monsters, Inc." and a typo still
+# ranks the right movie first. A year in the query ("Casper 1995", "Casper (1995)") or passed
+# separately picks between remakes.
+
+
+def normalize(title):
+    title = unicodedata.normalize("NFKD", title or "").encode("ascii", "ignore").decode().lower()
+    title = NON_ALPHANUMERIC.sub(" ", title.replace("&", " and ")).strip()
+    return LEADING_ARTICLE.sub("", title)
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Split "Casper (1995)" into ("Casper", 1995); titles without a trailing year keep year None
+def split_year(query):
+    match = TRAILING_YEAR.search(query)
+    if match and match.start() > 0:
+        return query[:match.start()], int(match.group(1))
+    return query, None
+
+
+class TitleIndex:
+    def __init__(self, entries, server=None, built_at=None):
+        self.entries = entries  # [item ID, name, production year or None, path]
+        self.server = server
+        self.built_at = built_at or time.time()
+        self.normalized = [normalize(entry[1]) for entry in entries]
+        self.postings = {}  # trigram -> indexes of the entries that contain it
+        self.sizes = []
+        for index, name in enumerate(self.normalized):
+            grams = trigrams(name)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(index)
+
+    @classmethod
+    def build(cls, client):
+        params = {"IncludeItemTypes": "Movie", "Recursive": True, "Fields": "ProductionYear,Path"}
+        items = client.get_json("/Items", params=params).get("Items", [])
+        entries = [[item["Id"], item.get("Name", ""), item.get("ProductionYear"), item.get("Path", "")] for item in items]
+        logger.info(f"Built title index with {len(entries)} movies")
+        return cls(entries, server=client.base_url)
+
+    # Movies of a snapshot.Snapshot, read from its columns without materializing whole items
+    @classmethod
+    def from_snapshot(cls, library):
+        years = library.columns["ProductionYear"]
+        entries = [[library.item_id(row), library.string("Name", row), years[row] or None, library.string("Path", row)]
+                   for row in library.rows("Movie")]
+        return cls(entries, server=library.server, built_at=library.header.get("built_at"))
+
+    @classmethod
+    def load(cls, server):
+        document = state.load(INDEX_NAME)
+        if document.get("server") != server or "entries" not in document:
+            return None
+        return cls(document["entries"], server=server, built_at=document.get("built_at"))
+
+    def save(self):
+        state.save(INDEX_NAME, {"server": self.server, "built_at": self.built_at, "entries": self.entries})
+
+    def age(self):
+        return time.time() - self.built_at
+
+    # Ranked [(score, entry)] best first. Score is the trigram Dice similarity of the normalized
+    # titles (1.0 for an identical title), adjusted when a year is known.
+    def search(self, query, year=None, limit=5):
+        title, query_year = split_year(query)
+        year = year or query_year
+        normalized = normalize(title)
+        grams = trigrams(normalized)
+        if not normalized:
+            return []
+
+        shared = Counter()
+        for gram in grams:
+            for index in self.postings.get(gram, ()):
+                shared[index] += 1
+
+        ranked = []
+        for index, count in shared.items():
+            if self.normalized[index] == normalized:
+                score = 1.0
+            else:
+                score = 2 * count / (len(grams) + self.sizes[index])
+            entry_year = self.entries[index][2]
+            if year and entry_year:
+                difference = abs(entry_year - year)
+                # Release years differ by one between sources often enough to only cost a little
+                score += 0.1 if difference == 0 else (-0.05 if difference == 1 else -0.3)
+            ranked.append((score, index))
+        ranked.sort(key=lambda match: (-match[0], self.entries[match[1]][1]))
+        return [(score, self.entries[index]) for score, index in ranked[:limit]]
+
+
+# The saved index for this client's server, rebuilt when missing, older than max_age or refresh is set.
+# With use_snapshot the titles come from the library snapshot, which is rebuilt the same way.
+def load_index(client, refresh=False, max_age=None, use_snapshot=False):
+    if use_snapshot:
+        with snapshot.load(client, config.parse_ids(os.getenv("EMBY_LIBRARY_PARENT_ID")), refresh=refresh) as library:
+            return TitleIndex.from_snapshot(library)
+    max_age = float(os.getenv("TITLE_INDEX_MAX_AGE", MAX_AGE)) if max_age is None else max_age
+    index = None if refresh else TitleIndex.load(client.base_url)
+    if index is None or index.age() > max_age:
+        index = TitleIndex.build(client)
+        index.save()
+    return index
+
+
+# Best match for a title, or None. A saved index that has no good match is rebuilt once, in
+# case the movie was added since the index was built.
+def find_movie(client, title, year=None, refresh=False, use_snapshot=False):
+    index = load_index(client, refresh, use_snapshot=use_snapshot)
+    matches = index.search(title, year)
+    if (not matches or matches[0][0] < MIN_SCORE) and not refresh and index.age() > 60:
+        logger.info("No close match in the saved title index, rebuilding it")
+        index = load_index(client, refresh=True, use_snapshot=use_snapshot)
+        matches = index.search(title, year)
+    if not matches or matches[0][0] < MIN_SCORE:
+        return None, matches
+    return matches[0][1], matches
@@ -0,0 +1,100 @@
+import logging
+import threading
+
+from mediaserver_automation import rules, studios
+
+logger = logging.getLogger(__name__)
+
+# Collection rules evaluated over a whole snapshot.Snapshot at once instead of item by item.
+# Type, genres, studios, ratings and cast are integer codes in the snapshot, so each rule is
+# a handful of mask operations over those columns. With NumPy (pip install
+# "mediaserver-automation[fast]") the masks are arrays built straight from the memory-mapped
+# columns, without copying; without it the same masks are built in Python, more slowly.
+#
+# The masks cover what can be decided from codes. The checks that read text (hard-excluded
+# titles, an excluded actor named in the path or overview) stay in rules.py, which the jobs
+# still run on the rows returned here, so both ways of running a job always agree.
+
+numpy_notice = threading.Event()
+
+
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        if not numpy_notice.is_set():
+            numpy_notice.set()
+            logger.info("NumPy is not installed, evaluating the snapshot rules in Python (pip install numpy)")
+        return None
+    return numpy
+
+
+class RuleEngine:
+    def __init__(self, library, numpy=None):
+        self.library = library
+        self.np = numpy if numpy is not None else import_numpy()
+        self.count = len(library)
+
+    def codes(self, name, predicate):
+        return self.library.codes_where(name, predicate)
+
+    def column(self, name):
+        return self.np.frombuffer(self.library.columns[name], dtype=self.library.columns[name].format)
+
+    # Rows whose single-value column (Type, OfficialRating) holds one of the codes
+    def value_mask(self, name, codes):
+        if self.np:
+            return self.np.isin(self.column(name), self.np.array(codes, dtype=self.np.uint16))
+        codes = set(codes)
+        return [code in codes for code in self.library.columns[name]]
+
+    # Rows whose list column (Genres, Studios, People) holds any of the codes
+    def list_mask(self, name, codes):
+        if self.np:
+            np = self.np
+            offsets = self.column(f"{name}.offsets").astype(np.int64)
+            hits = np.isin(self.column(f"{name}.codes"), np.array(codes, dtype=np.uint32))
+            hits_before = np.concatenate(([0], np.cumsum(hits, dtype=np.int64)))
+            return hits_before[offsets[1:]] > hits_before[offsets[:-1]]
+        rows = set(self.library.rows_with(name, codes))
+        return [row in rows for row in range(self.count)]
+
+    def all_of(self, *masks):
+        if self.np:
+            return self.np.logical_and.reduce(masks)
+        return [all(values) for values in zip(*masks)]
+
+    def none_of(self, mask):
+        if self.np:
+            return ~mask
+        return [not value for value in mask]
+
+    def rows(self, mask):
+        if self.np:
+            return self.np.flatnonzero(mask).tolist()
+        return [row for row, value in enumerate(mask) if value]
+
+    # Same as rules.matches_disney: a wanted rating and a studio whose name contains a wanted studio
+    def disney_rows(self):
+        ratings = self.codes("OfficialRating", lambda rating: rating in rules.DISNEY_RATINGS)
+        studio_codes = self.codes("Studios", lambda name: studios.name_matches(name, rules.DISNEY_STUDIOS))
+        return self.rows(self.all_of(self.value_mask("OfficialRating", ratings), self.list_mask("Studios", studio_codes)))
+
+    # Movies with every required genre, none of the excluded genres and no excluded actor in the cast.
+    # rules.romcom_exclusion_reason still has to pass for each of them.
+    def romcom_rows(self):
+        masks = [self.value_mask("Type", self.codes("Type", lambda item_type: item_type == "Movie"))]
+        for genre in rules.ROMCOMS_REQUIRED_GENRES:
+            masks.append(self.list_mask("Genres", self.codes("Genres", lambda name: name == genre)))
+        masks.append(self.none_of(self.list_mask("Genres", self.codes("Genres", lambda name: name in rules.ROMCOMS_EXCLUDED_GENRES))))
+        actors = [actor.lower() for actor in rules.ROMCOMS_EXCLUDED_ACTORS]
+        masks.append(self.none_of(self.list_mask("People", self.codes("People", lambda name: any(actor in name.lower() for actor in actors)))))
+        return self.rows(self.all_of(*masks))
+
+    # {collection name: candidate rows} for every collection the snapshot can decide. Unwatched
+    # Movies depends on live watch state, which the snapshot does not hold.
+    def evaluate(self):
+        return {
+            rules.DISNEY_COLLECTION_NAME: self.disney_rows(),
+            rules.ROMCOMS_COLLECTION_NAME: self.romcom_rows(),
+        }
@@ -0,0 +1,106 @@
+import logging
+import os
+import time
+
+from mediaserver_automation import rules, state
+
+logger = logging.getLogger(__name__)
+
+STATE_NAME = "watch_state"
+FULL_SYNC_INTERVAL = 7 * 24 * 3600  # Re-read every movie's play state once a week (WATCH_STATE_FULL_SYNC_INTERVAL)
+OVERLAP = 3600  # Re-read plays this many seconds before the last sync, for clock skew between hosts
+PAGE_SIZE = 50
+USER_DATA_KEYS = ("Played", "PlayedPercentage", "PlayCount", "LastPlayedDate")
+
+# The watch status user's play state for every movie, kept in STATE_DIR between runs. Only a
+# handful of movies change state each day, so instead of asking for each movie's UserData the
+# store asks for the user's movies sorted by DatePlayed, newest first, and stops at the first
+# one played before the last sync: a few requests per run. Marking a movie unplayed leaves
+# DatePlayed alone, so every FULL_SYNC_INTERVAL (or with --full-watch-sync) the whole library
+# is listed once more and the store replaced.
+
+
+class WatchState:
+    def __init__(self, client, user_id):
+        self.client = client
+        self.user_id = user_id
+        self.key = f"{client.base_url}|{user_id}"
+        self.items = {}  # item ID -> the UserData keys above
+
+    # Bring the store up to date and return it. Unknown movies have never been played.
+    def sync(self, full=False, full_sync_interval=None):
+        if full_sync_interval is None:
+            full_sync_interval = float(os.getenv("WATCH_STATE_FULL_SYNC_INTERVAL", FULL_SYNC_INTERVAL))
+        document = state.load(STATE_NAME)
+        stored = document.get(self.key) or {}
+        started = time.time()
+
+        if full or not stored or started - stored.get("full_at", 0) > full_sync_interval:
+            self.items = self.list_all(stored.get("items"))
+            entry = {"full_at": started}
+        else:
+            self.items = stored["items"]
+            self.apply_changes_since(stored["synced_at"] - OVERLAP)
+            entry = {"full_at": stored["full_at"]}
+
+        entry.update(synced_at=started, items=self.items)
+        try:
+            state.update(STATE_NAME, lambda document: document.update({self.key: entry}))
+        except OSError as e:
+            logger.warning(f"Failed to save the watch state: {str(e)}")
+        return self.items
+
+    def user_items(self, **params):
+        params = dict(params, Recursive=True, IncludeItemTypes="Movie")
+        return self.client.get_json(f"/Users/{self.user_id}/Items", params=params)
+
+    # Every movie's play state; previous is the store being replaced, to report how far it had drifted
+    def list_all(self, previous=None):
+        items = {item["Id"]: self.user_data(item) for item in self.user_items().get("Items", [])}
+        if previous is not None:
+            drifted = sum(1 for item_id, user_data in items.items()
+                          if rules.is_played(user_data) != rules.is_played(previous.get(item_id, {})))
+            logger.info(f"Full watch state sync: {len(items)} movies, {drifted} changed without a newer play date")
+        else:
+            logger.info(f"Full watch state sync: {len(items)} movies")
+        return items
+
+    # Page through the movies played since cutoff (epoch seconds), newest first. A play date that
+    # cannot be parsed is kept and skipped over rather than ending or failing the sync.
+    def apply_changes_since(self, cutoff):
+        changed = 0
+        unreadable = 0
+        start_index = 0
+        while True:
+            page = self.user_items(SortBy="DatePlayed", SortOrder="Descending",
+                                   StartIndex=start_index, Limit=PAGE_SIZE).get("Items", [])
+            for item in page:
+                user_data = self.user_data(item)
+                played_at = user_data.get("LastPlayedDate")
+                if not played_at:
+                    return self.changes_applied(changed, unreadable)
+                try:
+                    played_before_cutoff = rules.parse_emby_date(played_at).timestamp() < cutoff
+                except ValueError:
+                    unreadable += 1
+                    played_before_cutoff = False
+                if played_before_cutoff:
+                    return self.changes_applied(changed, unreadable)
+                if self.items.get(item["Id"]) != user_data:
+                    self.items[item["Id"]] = user_data
+                    changed += 1
+            if len(page) < PAGE_SIZE:
+                return self.changes_applied(changed, unreadable)
+            start_index += PAGE_SIZE
+
+    @staticmethod
+    def changes_applied(changed, unreadable):
+        if unreadable:
+            logger.warning(f"Incremental watch state sync: {unreadable} movies had a play date that could not be read")
+        logger.info(f"Incremental watch state sync: {changed} movies played since the last run")
+        return changed
+
+    @staticmethod
+    def user_data(item):
+        user_data = item.get("UserData") or {}
+        return {key: user_data[key] for key in USER_DATA_KEYS if user_data.get(key) is not None}
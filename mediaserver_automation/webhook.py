@@ -0,0 +1,162 @@
+import hmac
+import ipaddress
+import json
+import logging
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from mediaserver_automation import config, logs, metrics
+from mediaserver_automation.client import EmbyClient
+from mediaserver_automation.incremental import IncrementalUpdater
+from mediaserver_automation.work_queue import CoalescingWorkQueue
+
+WEBHOOK_PATH = "/emby/webhook"  # Point the Emby webhook at http://<host>:<WEBHOOK_PORT>/emby/webhook
+METRICS_PATH = "/metrics"  # Prometheus scrape endpoint on the same port
+
+# Emby webhook events we act on; anything else is acknowledged and ignored
+LIBRARY_EVENTS = ["library.new"]
+REMOVE_EVENTS = ["library.deleted"]
+WATCH_EVENTS = ["playback.stop", "item.markplayed", "item.markunplayed"]
+
+logger = logging.getLogger(__name__)
+
+
+# Emby sends webhooks either as a JSON body or as multipart/form-data with a "data" field
+def parse_payload(content_type, body):
+    payload = _parse_json_payload(content_type, body)
+    if not isinstance(payload, dict):
+        raise ValueError(f"expected a JSON object, got {type(payload).__name__}")
+    return payload
+
+
+def _parse_json_payload(content_type, body):
+    content_type = content_type or ""
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=default_policy).parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "data":
+                return json.loads(part.get_content())
+        raise ValueError("multipart payload has no 'data' field")
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        fields = parse_qs(body.decode())
+        if "data" not in fields:
+            raise ValueError("form payload has no 'data' field")
+        return json.loads(fields["data"][0])
+    return json.loads(body)
+
+
+# Map a webhook payload to (changed item IDs, removed item IDs). user_ids are the users whose
+# play state affects membership (IncrementalUpdater.play_state_user_ids).
+def payload_changes(payload, user_ids):
+    event = payload.get("Event", "")
+    item = payload.get("Item")
+    user = payload.get("User")
+    item_id = item.get("Id") if isinstance(item, dict) else None
+    if not item_id:
+        return [], []
+    if event in LIBRARY_EVENTS:
+        return [item_id], []
+    if event in REMOVE_EVENTS:
+        return [], [item_id]
+    if event in WATCH_EVENTS and isinstance(user, dict) and user.get("Id") in user_ids:
+        return [item_id], []
+    return [], []
+
+
+# Constant-time comparison, so the response time does not give the token away
+def token_matches(given, expected):
+    return hmac.compare_digest(given.encode(), expected.encode())
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlparse(self.path).path != METRICS_PATH:
+            self.send_error(404)
+            return
+        metrics.send_metrics(self)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != WEBHOOK_PATH:
+            self.send_error(404)
+            return
+        if self.server.token and not token_matches(parse_qs(url.query).get("token", [""])[0], self.server.token):
+            self.send_error(403)
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = parse_payload(self.headers.get("Content-Type"), body)
+        except ValueError as e:
+            logger.error(f"Rejected webhook payload: {str(e)}")
+            self.send_error(400)
+            return
+
+        changed_ids, removed_ids = payload_changes(payload, self.server.user_ids)
+        self.server.work_queue.submit(changed_ids, removed_ids)
+        # Respond straight away; the work queue applies the change after its debounce window
+        self.send_response(204)
+        self.end_headers()
+
+    # Emby retries failed deliveries, so successful requests are not worth a log line each
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(settings, work_queue, user_ids):
+    server = ThreadingHTTPServer((settings.webhook_host, settings.webhook_port), WebhookRequestHandler)
+    server.work_queue = work_queue
+    server.user_ids = set(user_ids)
+    server.token = settings.webhook_token
+    return server
+
+
+def main():
+    config.load_environment()
+    settings = config.Settings()
+    logs.setup_job("WebhookReceiver")
+
+    missing_vars = settings.missing("EMBY_SERVER_URL", "EMBY_API_KEY", "EMBY_USER_ID", "EMBY_LIBRARY_PARENT_ID")
+    if missing_vars:
+        logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+        logger.error("Please add them to your .env file or set them as environment variables")
+        exit(1)
+
+    # Anyone who can reach the port can trigger collection writes, so other hosts need the token
+    if not settings.webhook_token and not is_loopback(settings.webhook_host):
+        logger.error(f"WEBHOOK_TOKEN is required when WEBHOOK_HOST is {settings.webhook_host}")
+        logger.error("Set WEBHOOK_TOKEN, or leave WEBHOOK_HOST at 127.0.0.1 to accept local requests only")
+        exit(1)
+
+    metrics.REGISTRY.job = "WebhookReceiver"
+    updater = IncrementalUpdater(EmbyClient(settings.base_url, settings.api_key), settings)
+    try:
+        updater.start()
+    except Exception as e:
+        logger.error(f"Failed to load current membership: {str(e)}")
+        exit(1)
+
+    work_queue = CoalescingWorkQueue(updater.apply_changes, settings.event_debounce_seconds).start()
+    server = create_server(settings, work_queue, updater.play_state_user_ids())
+    logger.info(f"Listening for Emby webhooks on http://{settings.webhook_host}:{settings.webhook_port}{WEBHOOK_PATH}")
+    logger.info(f"Serving metrics on http://{settings.webhook_host}:{settings.webhook_port}{METRICS_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        work_queue.stop()
+        logger.info("Webhook receiver stopped")
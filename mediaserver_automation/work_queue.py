@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Debounced, coalescing queue of item changes. Producers (webhook requests, WebSocket
+# messages) only record item IDs; a single worker thread waits until changes stop arriving
+# for debounce_seconds (or max_delay_seconds have passed since the first pending change)
+# and then hands the whole de-duplicated batch to the handler in one call.
+class CoalescingWorkQueue:
+    def __init__(self, handler, debounce_seconds=5, max_delay_seconds=60):
+        self.handler = handler  # handler(changed_ids, removed_ids)
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.condition = threading.Condition()
+        self.changed = set()
+        self.removed = set()
+        self.first_change_at = None
+        self.last_change_at = None
+        self.stopped = False
+        self.worker = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.worker.start()
+        return self
+
+    def submit(self, changed_ids=(), removed_ids=()):
+        with self.condition:
+            self.changed.update(changed_ids)
+            self.removed.update(removed_ids)
+            if not self.changed and not self.removed:
+                return
+            now = time.monotonic()
+            if self.first_change_at is None:
+                self.first_change_at = now
+            self.last_change_at = now
+            self.condition.notify()
+
+    # Number of distinct items waiting for the next batch
+    def pending(self):
+        with self.condition:
+            return len(self.changed | self.removed)
+
+    # Wait for the next due batch; once stopped, whatever is still pending is returned at once
+    def _next_batch(self):
+        with self.condition:
+            while True:
+                if self.first_change_at is not None:
+                    now = time.monotonic()
+                    due = min(self.last_change_at + self.debounce_seconds, self.first_change_at + self.max_delay_seconds)
+                    if self.stopped or now >= due:
+                        removed = self.removed
+                        changed = self.changed - removed
+                        self.changed, self.removed = set(), set()
+                        self.first_change_at = self.last_change_at = None
+                        return changed, removed
+                    self.condition.wait(due - now)
+                elif self.stopped:
+                    return None
+                else:
+                    self.condition.wait()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            changed, removed = batch
+            try:
+                logger.info(f"Processing batch of {len(changed)} changed and {len(removed)} removed items")
+                self.handler(changed, removed)
+            except Exception as e:
+                logger.error(f"Failed to process queued changes: {str(e)}")
+
+    # Stop the worker; pending changes are processed first unless flush is False
+    def stop(self, flush=True):
+        with self.condition:
+            if not flush:
+                self.changed, self.removed = set(), set()
+                self.first_change_at = self.last_change_at = None
+            self.stopped = True
+            self.condition.notify()
+        if self.worker.is_alive():
+            self.worker.join()
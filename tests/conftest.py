@@ -0,0 +1,30 @@
+import pytest
+
+import fake_emby
+
+
+# Every test gets its own STATE_DIR, so nothing is remembered between tests or from real runs
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("STATE_DIR", str(tmp_path / "state"))
+    return tmp_path / "state"
+
+
+# The local stand-in Emby server from benchmarks/fake_emby.py, with a small library
+@pytest.fixture
+def emby():
+    server = fake_emby.start_server(movies=200, tracks=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# Job environment pointing at the fake server, without collection posters
+@pytest.fixture
+def emby_env(emby, monkeypatch, tmp_path):
+    monkeypatch.setenv("EMBY_SERVER_URL", emby.url)
+    monkeypatch.setenv("EMBY_API_KEY", emby.api_key)
+    monkeypatch.setenv("EMBY_USER_ID", fake_emby.ADMIN_USER)
+    monkeypatch.setenv("EMBY_LIBRARY_PARENT_ID", fake_emby.MOVIE_LIBRARY_ID)
+    monkeypatch.setenv("POSTER_DIR", str(tmp_path / "posters"))
+    return emby
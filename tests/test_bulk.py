@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import bulk, retry
+from mediaserver_automation.client import EmbyClient
+
+
+def test_results_keep_input_order_and_count_failures(caplog):
+    def task(item):
+        time.sleep(0.01 * (10 - item))  # Later items finish first
+        if item == 3:
+            raise RuntimeError("404 - Not Found")
+        return item % 2 == 0
+
+    caplog.set_level(logging.INFO, logger=bulk.__name__)
+    succeeded, failed = bulk.run_all(task, range(10), "Checking", max_workers=4)
+    assert succeeded == [0, 2, 4, 6, 8]
+    assert failed == [1, 3, 5, 7, 9]
+    assert "Checking: failed for 3: 404 - Not Found" in caplog.messages
+    assert "Checking: 5/10 succeeded" in caplog.messages[-1]
+
+
+def test_at_most_max_workers_at_once():
+    lock = threading.Lock()
+    running = [0, 0]  # Now, most at once
+
+    def task(item):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return True
+
+    assert bulk.run_all(task, range(12), "Sleeping", max_workers=3) == (list(range(12)), [])
+    assert running[1] == 3
+    assert bulk.run_all(task, [], "Sleeping") == ([], [])
+
+
+@pytest.mark.parametrize("error", [retry.CircuitOpenError("Circuit open"), retry.DeadlineExceeded("Deadline passed")])
+def test_aborting_errors_are_raised(error):
+    def task(item):
+        if item == 5:
+            raise error
+        return True
+
+    with pytest.raises(type(error)):
+        bulk.run_all(task, range(10), "Deleting playlists", max_workers=2)
+
+
+# Playlist deletes the server refuses are reported back, and the rest still go through
+def test_failed_deletes_are_returned(emby):
+    client = EmbyClient(emby.url, emby.api_key)
+    playlists = [{"Id": fake_emby.make_id("playlist", index), "Name": f"Playlist {index}"} for index in range(10)]
+    for playlist in playlists:
+        emby.library.playlists[playlist["Id"]] = {"Name": playlist["Name"], "Entries": []}
+    emby.inject_failures(403, 3)  # Not retried
+
+    deleted, failed = bulk.run_all(lambda playlist: client.request("DELETE", f"/Items/{playlist['Id']}").status_code == 204,
+                                   playlists, "Deleting playlists", max_workers=4)
+    assert len(deleted) == 7 and len(failed) == 3
+    assert sorted(emby.library.playlists) == sorted(playlist["Id"] for playlist in failed)
@@ -0,0 +1,158 @@
+import time
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import checkpoint, planner
+from mediaserver_automation.client import EmbyClient
+
+ITEM_IDS = ["a", "b", "c"]
+
+
+@pytest.fixture(autouse=True)
+def save_every_record(monkeypatch):
+    monkeypatch.setattr(checkpoint, "SAVE_INTERVAL", 0)
+
+
+def test_interrupted_progress_is_resumed():
+    journal = checkpoint.Checkpoint("job")
+    assert journal.resume("phase", ITEM_IDS) == {}
+    journal.record("a", "watched")
+
+    assert checkpoint.Checkpoint("job").resume("phase", ITEM_IDS) == {"a": "watched"}
+    assert checkpoint.Checkpoint("job").resume("other phase", ITEM_IDS) == {}
+    assert checkpoint.Checkpoint("job").resume("phase", ITEM_IDS[:2]) == {}
+
+
+def test_old_progress_is_not_resumed():
+    journal = checkpoint.Checkpoint("job")
+    journal.resume("phase", ITEM_IDS)
+    journal.record("a", "watched")
+    journal.progress["saved_at"] = time.time() - checkpoint.MAX_AGE - 60
+    journal.save("progress")
+
+    assert checkpoint.Checkpoint("job").resume("phase", ITEM_IDS) == {}
+
+
+def test_finished_progress_is_dropped():
+    journal = checkpoint.Checkpoint("job")
+    journal.resume("phase", ITEM_IDS)
+    journal.record("a", "watched")
+    journal.finish()
+
+    assert checkpoint.Checkpoint("job").document == {}
+
+
+# Progress saves leave the write phase alone and the other way round, so a copy of the document
+# loaded earlier never puts back what the other part already dropped
+def test_saves_replace_only_their_own_part():
+    progress_journal = checkpoint.Checkpoint("job")
+    write_journal = checkpoint.Checkpoint("job")
+    write_journal.begin_write(planner.CollectionPlan("Test Collection", "c1", ["a"], []), "parent")
+
+    progress_journal.resume("phase", ITEM_IDS)
+    progress_journal.record("a", "watched")
+    assert checkpoint.Checkpoint("job").pending_write()["to_add"] == ["a"]
+
+    write_journal.end_write()
+    progress_journal.record("b", "watched")
+    assert checkpoint.Checkpoint("job").pending_write() is None
+    assert checkpoint.Checkpoint("job").resume("phase", ITEM_IDS) == {"a": "watched", "b": "watched"}
+
+
+# A --plan run overlapping a real run reads the journal but never writes it
+def test_plan_journal_stays_in_memory(state_dir):
+    journal = checkpoint.Checkpoint("job")
+    journal.resume("phase", ITEM_IDS)
+    journal.record("a", "watched")
+    journal.begin_write(planner.CollectionPlan("Test Collection", "c1", ["a"], []), "parent")
+    saved = (state_dir / "checkpoint.job.json").read_text()
+
+    plan_journal = checkpoint.Checkpoint("job", persist=False)
+    assert plan_journal.resume("phase", ITEM_IDS) == {"a": "watched"}
+    plan_journal.record("b", "unwatched")
+    plan_journal.finish()
+    plan_journal.end_write()
+    assert (state_dir / "checkpoint.job.json").read_text() == saved
+
+
+def collection(emby, item_ids):
+    collection_id = fake_emby.make_id("collection", "Test Collection")
+    emby.library.collections[collection_id] = {"Name": "Test Collection", "Items": list(item_ids)}
+    return collection_id
+
+
+def movie_ids(emby, count):
+    return [item_id for item_id, item in emby.library.items.items() if item["Type"] == "Movie"][:count]
+
+
+# A failed add batch stays in the journal, and the next run sends it
+def test_failed_add_batch_is_replayed(emby):
+    client = EmbyClient(emby.url, emby.api_key)
+    movies = movie_ids(emby, 44)
+    kept, to_add, to_remove = movies[:2], movies[2:42], movies[42:]
+    collection_id = collection(emby, kept + to_remove)
+    plan = planner.CollectionPlan("Test Collection", collection_id, to_add, to_remove)
+
+    emby.inject_failures(403, 1)  # The first add batch
+    planner.apply_collection_plan(client, plan, fake_emby.MOVIE_LIBRARY_ID, batch_delay=0,
+                                  journal=checkpoint.Checkpoint("job"))
+    assert sorted(emby.library.collections[collection_id]["Items"]) == sorted(kept + to_add[20:])
+    pending = checkpoint.Checkpoint("job").pending_write()
+    assert pending["to_add"] == to_add[:20]
+    assert pending["to_remove"] == []
+
+    planner.finish_interrupted_write(client, checkpoint.Checkpoint("job"), fake_emby.ADMIN_USER, batch_delay=0)
+    assert sorted(emby.library.collections[collection_id]["Items"]) == sorted(kept + to_add)
+    assert checkpoint.Checkpoint("job").pending_write() is None
+
+
+def test_failed_removal_is_replayed(emby):
+    client = EmbyClient(emby.url, emby.api_key)
+    kept, first, second = movie_ids(emby, 3)
+    collection_id = collection(emby, [kept, first, second])
+    plan = planner.CollectionPlan("Test Collection", collection_id, [], [first, second])
+
+    emby.inject_failures(403, 4)  # Both bulk removal requests, then both requests for the first movie
+    planner.apply_collection_plan(client, plan, fake_emby.MOVIE_LIBRARY_ID, batch_delay=0,
+                                  journal=checkpoint.Checkpoint("job"))
+    assert emby.library.collections[collection_id]["Items"] == [kept, first]
+    assert checkpoint.Checkpoint("job").pending_write()["to_remove"] == [first]
+
+    planner.finish_interrupted_write(client, checkpoint.Checkpoint("job"), fake_emby.ADMIN_USER, batch_delay=0)
+    assert emby.library.collections[collection_id]["Items"] == [kept]
+    assert checkpoint.Checkpoint("job").pending_write() is None
+
+
+# Items added or removed by someone else since the write was planned are not sent again
+def test_replay_skips_what_the_collection_already_has(emby):
+    client = EmbyClient(emby.url, emby.api_key)
+    kept, added, removed = movie_ids(emby, 3)
+    collection_id = collection(emby, [kept, added])
+    journal = checkpoint.Checkpoint("job")
+    journal.begin_write(planner.CollectionPlan("Test Collection", collection_id, [added], [removed]),
+                        fake_emby.MOVIE_LIBRARY_ID)
+
+    sent = []
+    request = client.request
+    client.request = lambda method, endpoint, **kwargs: sent.append((method, endpoint)) or request(method, endpoint, **kwargs)
+    planner.finish_interrupted_write(client, checkpoint.Checkpoint("job"), fake_emby.ADMIN_USER, batch_delay=0)
+    assert sent == [("GET", f"/Collections/{collection_id}/Items")]
+    assert emby.library.collections[collection_id]["Items"] == [kept, added]
+    assert checkpoint.Checkpoint("job").pending_write() is None
+
+
+def test_old_write_phase_is_not_finished(emby):
+    kept, removed = movie_ids(emby, 2)
+    collection_id = collection(emby, [kept, removed])
+    journal = checkpoint.Checkpoint("job")
+    journal.begin_write(planner.CollectionPlan("Test Collection", collection_id, [], [removed]),
+                        fake_emby.MOVIE_LIBRARY_ID)
+    journal.document["pending_write"]["started_at"] = time.time() - checkpoint.MAX_AGE - 60
+    journal.save("pending_write")
+
+    client = EmbyClient(emby.url, emby.api_key)
+    planner.finish_interrupted_write(client, checkpoint.Checkpoint("job"), fake_emby.ADMIN_USER, batch_delay=0)
+    assert emby.library.collections[collection_id]["Items"] == [kept, removed]
+    assert checkpoint.Checkpoint("job").document == {}
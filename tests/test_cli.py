@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from mediaserver_automation import cli
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = ["collections", "playlist", "check-watched", "search", "check-collection",
+            "posters", "snapshot", "fan-out", "listen", "webhook"]
+HEAVY_MODULES = ["dotenv", "requests"]
+
+# Run cli.main(argv) in a fresh interpreter, like cron starts it. Prints the heavy modules
+# imported before and after, and the exit code.
+SCRIPT = """
+import json, sys
+from mediaserver_automation import cli
+heavy = lambda: sorted(name for name in HEAVY_MODULES if name in sys.modules)
+before = heavy()
+try:
+    exit_code = cli.main(ARGV)
+except SystemExit as e:
+    exit_code = e.code
+print(json.dumps({"before": before, "after": heavy(), "exit_code": exit_code}))
+"""
+
+
+def run_cli(argv):
+    script = SCRIPT.replace("HEAVY_MODULES", repr(HEAVY_MODULES)).replace("ARGV", repr(argv))
+    result = subprocess.run([sys.executable, "-c", script], cwd=project_root,
+                            capture_output=True, text=True, check=True)
+    return result.stdout, json.loads(result.stdout.splitlines()[-1])
+
+
+def test_every_command_is_covered():
+    parser = cli.build_parser()
+    commands = next(action for action in parser._actions if action.dest == "command")
+    assert sorted(commands.choices) == sorted(COMMANDS)
+
+
+# --help prints the command's usage without loading requests or python-dotenv
+@pytest.mark.parametrize("command", COMMANDS)
+def test_help_stays_lazy(command):
+    output, result = run_cli([command, "--help"])
+    assert result["exit_code"] == 0
+    assert output.startswith(f"usage: mediaserver-automation {command}")
+    assert result["before"] == result["after"] == []
+
+
+# requests and python-dotenv are imported once a command actually runs
+def test_running_a_command_imports_requests_and_dotenv(emby_env):
+    _, result = run_cli(["search", "movie", "--limit", "1"])
+    assert result["before"] == []
+    assert result["after"] == HEAVY_MODULES
+    assert result["exit_code"] == 0
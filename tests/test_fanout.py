@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import fanout
+
+
+def test_read_metrics_counts_every_non_2xx_attempt_as_failed(tmp_path):
+    path = tmp_path / "server.prom"
+    path.write_text(
+        '# TYPE emby_requests_total counter\n'
+        'emby_requests_total{job="J",method="GET",endpoint="/Users",status="200"} 10\n'
+        'emby_requests_total{job="J",method="POST",endpoint="/Collections",status="204"} 2\n'
+        'emby_requests_total{job="J",method="GET",endpoint="/Items",status="429"} 3\n'
+        'emby_requests_total{job="J",method="GET",endpoint="/Items",status="503"} 1\n'
+        'emby_requests_total{job="J",method="GET",endpoint="/Items",status="404"} 1\n'
+        'emby_requests_total{job="J",method="GET",endpoint="/Items",status="error"} 2\n'
+        'emby_request_retries_total{job="J",method="GET",endpoint="/Items"} 4\n'
+    )
+    assert fanout.read_metrics(path) == (19, 4, 7)
+
+
+def test_load_servers_rejects_bad_files(tmp_path):
+    path = tmp_path / "servers.json"
+    for servers in [[], {"name": "home"}, [{"EMBY_SERVER_URL": "x"}], [{"name": "a"}, {"name": "a"}]]:
+        path.write_text(json.dumps(servers))
+        with pytest.raises(ValueError):
+            fanout.load_servers(path)
+
+
+# A server past --server-timeout is terminated, not killed, so its metrics still reach the summary
+def test_timed_out_server_still_reports_its_requests(tmp_path):
+    server = fake_emby.start_server(movies=50, tracks=0, latency=0.3)
+    try:
+        servers = [{
+            "name": "slow",
+            "EMBY_SERVER_URL": server.url,
+            "EMBY_API_KEY": server.api_key,
+            "EMBY_USER_ID": fake_emby.ADMIN_USER,
+            "EMBY_LIBRARY_PARENT_ID": fake_emby.MOVIE_LIBRARY_ID,
+            "STATE_DIR": str(tmp_path / "state"),
+            "POSTER_DIR": str(tmp_path / "posters"),
+        }]
+        with open(tmp_path / "output.txt", "w") as output:
+            fan_out = fanout.FanOut(servers, ["collections", "--only", "unwatched"], server_timeout=2, stream=output)
+            [result] = fan_out.run(1)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert result.status == "timed out after 2s"
+    assert result.requests and result.requests > 0
+    assert result.errors == 0
@@ -0,0 +1,162 @@
+import threading
+from types import SimpleNamespace
+
+import fake_emby
+
+from mediaserver_automation import config, rules
+from mediaserver_automation.client import EmbyClient
+from mediaserver_automation.incremental import IncrementalUpdater
+from mediaserver_automation.listener import LibraryEventListener, websocket_url
+from mediaserver_automation.work_queue import CoalescingWorkQueue
+
+
+def make_updater(server):
+    settings = SimpleNamespace(
+        username=fake_emby.ADMIN_USER,
+        library_parent_ids=[fake_emby.MOVIE_LIBRARY_ID],
+        library_parent_id=fake_emby.MOVIE_LIBRARY_ID,
+        music_library_ids=[],
+        music_library_id=None,
+    )
+    return IncrementalUpdater(EmbyClient(server.url, server.api_key), settings)
+
+
+def add_collection(library, name, item_ids):
+    collection_id = fake_emby.make_id("collection", name)
+    library.collections[collection_id] = {"Name": name, "Items": list(item_ids)}
+    return collection_id
+
+
+# Movies nobody has played and that no exclusion applies to
+def unwatched_movies(library):
+    admin_user_id = library.user_id(fake_emby.ADMIN_USER)
+    watch_user_id = library.user_id(fake_emby.WATCH_STATUS_USER)
+    return [item_id for item_id, item in library.items.items()
+            if item["Type"] == "Movie"
+            and rules.excluded_person_reason(item) is None
+            and not rules.is_played(library.user_data[admin_user_id][item_id])
+            and not rules.is_played(library.user_data[watch_user_id][item_id])]
+
+
+# Work queue that also counts the notifications the listener has handed it
+class CountingWorkQueue(CoalescingWorkQueue):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submitted = 0
+        self.submitted_condition = threading.Condition()
+
+    def submit(self, changed_ids=(), removed_ids=()):
+        super().submit(changed_ids, removed_ids)
+        with self.submitted_condition:
+            self.submitted += 1
+            self.submitted_condition.notify_all()
+
+    def wait_for_submitted(self, count, timeout=5):
+        with self.submitted_condition:
+            return self.submitted_condition.wait_for(lambda: self.submitted >= count, timeout)
+
+
+# Run the listener against the fake server's notification WebSocket, reached through
+# EMBY_WEBSOCKET_URL as a deployment with a stand-in server would
+def start_listener(emby, updater, monkeypatch):
+    monkeypatch.setenv("EMBY_WEBSOCKET_URL", emby.websocket_url)
+    work_queue = CountingWorkQueue(updater.apply_changes, debounce_seconds=0.05).start()
+    listener = LibraryEventListener(work_queue, updater.play_state_user_ids(), websocket_url(config.Settings()))
+    threading.Thread(target=listener.run, daemon=True).start()
+    assert emby.wait_for_websockets(lambda server: server.websockets)
+    return listener, work_queue
+
+
+# Send the notifications over the socket, wait until the listener has handed every one of them
+# (and the ForceKeepAlive sent on connect) to the work queue, then let the queue apply the batch
+def stream(emby, updater, monkeypatch, messages):
+    listener, work_queue = start_listener(emby, updater, monkeypatch)
+    for message in messages:
+        emby.send_event(message["MessageType"], message["Data"])
+    assert work_queue.wait_for_submitted(len(messages) + 1)
+    listener.stop()
+    work_queue.stop()
+    return listener
+
+
+def test_notifications_update_collections_like_the_scheduled_jobs(emby, monkeypatch):
+    library = emby.library
+    admin_user_id = library.user_id(fake_emby.ADMIN_USER)
+    watch_user_id = library.user_id(fake_emby.WATCH_STATUS_USER)
+
+    disney_id = next(item_id for item_id, item in library.items.items() if rules.matches_disney(item))
+    stays, played_by_admin, played_by_watch_user, new = unwatched_movies(library)[:4]
+    disney_collection = add_collection(library, rules.DISNEY_COLLECTION_NAME, [disney_id])
+    unwatched_collection = add_collection(library, rules.UNWATCHED_COLLECTION_NAME,
+                                          [stays, played_by_admin, played_by_watch_user])
+
+    updater = make_updater(emby)
+    updater.start()
+
+    library.items[disney_id]["OfficialRating"] = "R"
+    library.user_data[admin_user_id][played_by_admin]["Played"] = True
+    library.user_data[watch_user_id][played_by_watch_user]["PlayCount"] = 2
+    listener = stream(emby, updater, monkeypatch, [
+        {"MessageType": "ForceKeepAlive", "Data": 60},
+        {"MessageType": "LibraryChanged", "Data": {"ItemsUpdated": [disney_id, stays]}},
+        {"MessageType": "UserDataChanged", "Data": {"UserId": admin_user_id, "UserDataList": [{"ItemId": played_by_admin}]}},
+        {"MessageType": "UserDataChanged", "Data": {"UserId": watch_user_id, "UserDataList": [{"ItemId": played_by_watch_user}]}},
+        {"MessageType": "LibraryChanged", "Data": {"ItemsAdded": [new]}},
+        {"MessageType": "Sessions", "Data": []},
+    ])
+
+    assert listener.keep_alive_interval == 30
+    # The Disney Collection only ever grows, as in the scheduled job
+    assert library.collections[disney_collection]["Items"] == [disney_id]
+    # Played by either user leaves Unwatched Movies, as in the scheduled job
+    assert library.collections[unwatched_collection]["Items"] == [stays, new]
+    assert updater.collections[rules.UNWATCHED_COLLECTION_NAME]["members"] == {stays, new}
+
+
+def test_other_users_play_state_is_ignored(emby, monkeypatch):
+    library = emby.library
+    updater = make_updater(emby)
+    updater.start()
+    requests_before = emby.stats.snapshot()["requests"]
+
+    movie_id = unwatched_movies(library)[0]
+    stream(emby, updater, monkeypatch, [{"MessageType": "UserDataChanged",
+                      "Data": {"UserId": fake_emby.make_id("user", "guest"), "UserDataList": [{"ItemId": movie_id}]}}])
+
+    assert emby.stats.snapshot()["requests"] == requests_before
+
+
+# The listener answers the server's ForceKeepAlive at half its timeout
+def test_keep_alive_follows_the_server_timeout(emby, monkeypatch):
+    emby.keep_alive_timeout = 2
+    updater = make_updater(emby)
+    updater.start()
+    listener, work_queue = start_listener(emby, updater, monkeypatch)
+
+    keep_alives = lambda server: [message for message in server.websocket_messages if message["MessageType"] == "KeepAlive"]
+    assert emby.wait_for_websockets(lambda server: len(keep_alives(server)) >= 3, timeout=10)
+    assert listener.keep_alive_interval == 1
+    listener.stop()
+    work_queue.stop()
+
+
+# Notifications sent after the server dropped the socket arrive over the new connection
+def test_reconnects_after_the_server_closes_the_socket(emby, monkeypatch):
+    monkeypatch.setattr("mediaserver_automation.listener.RECONNECT_DELAY", 0.1)
+    library = emby.library
+    watch_user_id = library.user_id(fake_emby.WATCH_STATUS_USER)
+    stays, played = unwatched_movies(library)[:2]
+    unwatched_collection = add_collection(library, rules.UNWATCHED_COLLECTION_NAME, [stays, played])
+    updater = make_updater(emby)
+    updater.start()
+    listener, work_queue = start_listener(emby, updater, monkeypatch)
+
+    emby.close_websockets()
+    assert emby.wait_for_websockets(lambda server: server.websocket_connections == 2 and server.websockets)
+    library.user_data[watch_user_id][played]["Played"] = True
+    emby.send_event("UserDataChanged", {"UserId": watch_user_id, "UserDataList": [{"ItemId": played}]})
+    assert work_queue.wait_for_submitted(3)  # Both ForceKeepAlives and the play
+    listener.stop()
+    work_queue.stop()
+
+    assert library.collections[unwatched_collection]["Items"] == [stays]
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import libraries
+from mediaserver_automation.client import EmbyClient
+
+
+def movie(item_id):
+    return {"Id": item_id, "Name": f"Movie {item_id}"}
+
+
+# The first library finishes last, so the threads complete out of order
+def test_scan_merges_in_library_order_without_duplicates():
+    contents = {"a": ["1", "2", "3"], "b": ["3", "4"], "c": ["2", "5", "4", "6"]}
+
+    def fetch(library_id):
+        time.sleep(0.2 if library_id == "a" else 0)
+        return [movie(item_id) for item_id in contents[library_id]]
+
+    items = libraries.scan(fetch, ["a", "b", "c"])
+    assert [item["Id"] for item in items] == ["1", "2", "3", "4", "5", "6"]
+
+
+def test_no_library_searches_the_whole_server():
+    fetched = []
+    assert libraries.scan(lambda library_id: fetched.append(library_id) or [movie("1")], []) == [movie("1")]
+    assert fetched == [None]
+
+
+# A failed library fails the scan, but only after the other scans have finished
+def test_scan_raises_the_first_failure():
+    finished = []
+
+    def fetch(library_id):
+        if library_id == "broken":
+            raise RuntimeError("500 - Internal Server Error")
+        time.sleep(0.1)
+        finished.append(library_id)
+        return [movie(library_id)]
+
+    with pytest.raises(RuntimeError, match="500"):
+        libraries.scan(fetch, ["a", "broken", "b"])
+    assert sorted(finished) == ["a", "b"]
+
+
+def test_scan_of_several_fake_emby_libraries():
+    server = fake_emby.start_server(movies=90, tracks=0, libraries=3)
+    try:
+        client = EmbyClient(server.url, server.api_key)
+        user_id = server.library.user_id(fake_emby.ADMIN_USER)
+        library_ids = fake_emby.library_ids("movies", 3)
+
+        def fetch(library_id):
+            params = {"ParentId": library_id, "Recursive": "true", "IncludeItemTypes": "Movie"}
+            return client.get_json(f"/Users/{user_id}/Items", params=params)["Items"]
+
+        # Listing a library twice must not list its movies twice
+        items = libraries.scan(fetch, library_ids + library_ids[:1])
+        assert len(items) == 90
+        assert [item["ParentId"] for item in items[:30]] == [library_ids[0]] * 30
+        assert [item["ParentId"] for item in items[-30:]] == [library_ids[2]] * 30
+    finally:
+        server.shutdown()
+        server.server_close()
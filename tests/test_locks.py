@@ -0,0 +1,87 @@
+import signal
+import sys
+import threading
+import time
+import types
+from types import SimpleNamespace
+
+import pytest
+
+from mediaserver_automation import cli, locks, logs, retry
+
+
+def test_only_one_holder_at_a_time():
+    first = locks.JobLock("Job")
+    second = locks.JobLock("Job")
+    assert first.acquire()
+    assert not second.acquire()
+    assert locks.JobLock("OtherJob").acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_overlapping_starts_become_one_follow_up_run():
+    runs = []
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def run_once():
+        runs.append(len(runs) + 1)
+        if len(runs) == 1:
+            started.set()
+            proceed.wait(5)
+        return 0
+
+    first = threading.Thread(target=lambda: runs.append(("exit", locks.run_exclusively("Job", run_once))))
+    first.start()
+    assert started.wait(5)
+    # Three more cron ticks while the first run is busy: each one leaves a request and exits
+    assert [locks.run_exclusively("Job", run_once) for _ in range(3)] == [None, None, None]
+    proceed.set()
+    first.join(5)
+
+    assert runs == [1, 2, ("exit", 0)]
+    assert not locks.JobLock("Job").follow_up_requested()
+
+
+def test_failed_run_sets_the_exit_code():
+    assert locks.run_exclusively("Job", lambda: 1) == 1
+
+
+# Job modules for run_jobs that record how much of the deadline was left when they started
+@pytest.fixture
+def recording_jobs(monkeypatch):
+    package_logger = logs.get_logger()
+    saved = package_logger.handlers, package_logger.level, package_logger.propagate
+    sigterm = signal.getsignal(signal.SIGTERM)
+    remaining = []
+
+    def make_job(name):
+        job = types.ModuleType(name)
+        job.JOB_NAME = name
+
+        def run(args):
+            remaining.append((name, retry.DEADLINE.remaining()))
+            time.sleep(0.3)
+            return 0
+        job.run = run
+        monkeypatch.setitem(sys.modules, name, job)
+        return name
+
+    yield [make_job("first_test_job"), make_job("second_test_job")], remaining
+    logs.JOB_LOGGING.stop(summary=False)
+    package_logger.handlers, package_logger.level, package_logger.propagate = saved
+    signal.signal(signal.SIGTERM, sigterm)
+    retry.DEADLINE.start(None)
+
+
+@pytest.mark.parametrize("plan, exclusive", [(True, True), (False, True), (False, False)])
+def test_every_job_gets_the_whole_deadline(recording_jobs, plan, exclusive):
+    module_names, remaining = recording_jobs
+    args = SimpleNamespace(plan=plan, deadline=1.0, metrics_file=None, metrics_summary=False,
+                           profile=False, profile_dir=None, log_level="WARNING", log_format="text")
+    assert cli.run_jobs(args, "Test", module_names, exclusive=exclusive) == 0
+
+    assert [name for name, _ in remaining] == module_names
+    assert all(0.9 < seconds <= 1.0 for _, seconds in remaining)
@@ -0,0 +1,73 @@
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+from mediaserver_automation import logs
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Stream that counts flushes
+class RecordingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        super().flush()
+
+
+def record(level, message):
+    return logging.LogRecord("mediaserver_automation.test", level, __file__, 1, message, None, None)
+
+
+def test_info_stays_buffered_and_warnings_flush(monkeypatch):
+    monkeypatch.setattr(logs, "FLUSH_INTERVAL", 3600)
+    stream = RecordingStream()
+    handler = logs.BufferedStreamHandler(stream)
+    handler.setFormatter(logs.TextFormatter())
+
+    handler.emit(record(logging.INFO, "Found 3 movies"))
+    handler.emit(record(logging.DEBUG, "Adding movie: Casper"))
+    assert stream.flushes == 0
+    handler.emit(record(logging.WARNING, "Some batches failed"))
+    assert stream.flushes == 1
+    assert stream.getvalue() == "Found 3 movies\nDEBUG: Adding movie: Casper\nWARNING: Some batches failed\n"
+
+
+# Job logging in a fresh interpreter with stdout piped, so nothing reaches the pipe before a flush
+SCRIPT = """
+import sys
+from mediaserver_automation import logs
+logger = logs.setup_job("TestJob", "INFO", FORMAT)
+logs.set_phase("scan")
+for i in range(200):
+    logger.info("Processed %d movies", i)
+    logs.count("movies")
+logger.debug("not shown")
+EXIT
+"""
+
+
+@pytest.mark.parametrize("log_format", ["text", "json"])
+@pytest.mark.parametrize("exit_statement", ["", "sys.exit(3)", "raise RuntimeError('job failed')"])
+def test_everything_is_written_at_exit(log_format, exit_statement):
+    script = SCRIPT.replace("FORMAT", repr(log_format)).replace("EXIT", exit_statement)
+    result = subprocess.run([sys.executable, "-c", script], cwd=project_root, capture_output=True, text=True)
+    lines = result.stdout.splitlines()
+    if log_format == "json":
+        entries = [json.loads(line) for line in lines]
+        assert [entry["message"] for entry in entries[:200]] == [f"Processed {i} movies" for i in range(200)]
+        assert {(entry["job"], entry["phase"]) for entry in entries[:200]} == {("TestJob", "scan")}
+        summary = entries[200]["message"]
+    else:
+        assert lines[:200] == [f"Processed {i} movies" for i in range(200)]
+        summary = "\n".join(lines[200:])
+    assert summary == "Log summary by phase:\n  scan: movies 200"
+    assert "not shown" not in result.stdout
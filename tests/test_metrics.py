@@ -0,0 +1,80 @@
+import pytest
+import requests
+
+import fake_emby
+
+from mediaserver_automation import metrics
+
+USER_ID = fake_emby.make_id("user", fake_emby.ADMIN_USER)
+
+
+@pytest.mark.parametrize("url, template", [
+    (f"http://emby:8096/Users/{USER_ID}/Items/{USER_ID}/UserData", "/Users/{id}/Items/{id}/UserData"),
+    ("http://emby:8096/users/0f8e2f5c-3a1b-4c2d-9e8f-1a2b3c4d5e6f/items/12345", "/Users/{id}/Items/{id}"),
+    ("http://emby:8096/emby/collections/987/Items?Ids=1,2,3", "/Collections/{id}/Items"),
+    ("http://emby:8096/Playlists/42/Items/7/Move/3", "/Playlists/{id}/Items/{id}/Move/{id}"),
+    ("http://emby:8096/Persons?SearchTerm=Shirley", "/Persons"),
+])
+def test_endpoint_template(url, template):
+    assert metrics.endpoint_template(url) == template
+
+
+def session_for(emby, registry):
+    session = metrics.InstrumentedSession(registry)
+    session.headers["X-MediaBrowser-Token"] = emby.api_key
+    return session
+
+
+def test_requests_are_counted_by_template_and_status(emby):
+    registry = metrics.RequestMetrics()
+    session = session_for(emby, registry)
+    for item_id in list(emby.library.items)[:3]:
+        session.get(f"{emby.url}/Users/{USER_ID}/Items/{item_id}")
+    emby.inject_failures(503, 1)
+    session.get(f"{emby.url}/Users")
+    with pytest.raises(requests.ConnectionError):
+        session.get("http://127.0.0.1:9/Users")
+
+    assert registry.requests == {
+        ("GET", "/Users/{id}/Items/{id}", "200"): 3,
+        ("GET", "/Users", "503"): 1,
+        ("GET", "/Users", "error"): 1,
+    }
+    assert registry.total_requests() == 5
+    assert registry.bytes_received[("GET", "/Users/{id}/Items/{id}")] > 0
+
+
+def test_textfile_is_prometheus_text(emby, tmp_path):
+    registry = metrics.RequestMetrics()
+    registry.job = "Test \"Job\""
+    session = session_for(emby, registry)
+    session.get(f"{emby.url}/Users")
+    session.get(f"{emby.url}/Users")
+    registry.record_retry("GET", f"{emby.url}/Users")
+
+    path = tmp_path / "emby.prom"
+    registry.write_textfile(str(path))
+    lines = path.read_text().splitlines()
+    labels = 'job="Test \\"Job\\"",method="GET",endpoint="/Users"'
+    assert f'emby_requests_total{{{labels},status="200"}} 2' in lines
+    assert f'emby_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f'emby_request_duration_seconds_count{{{labels}}} 2' in lines
+    assert f'emby_request_retries_total{{{labels}}} 1' in lines
+    assert "# TYPE emby_request_duration_seconds histogram" in lines
+    assert [entry.name for entry in tmp_path.iterdir()] == ["emby.prom"]
+
+
+def test_metrics_are_served(monkeypatch):
+    registry = metrics.RequestMetrics()
+    registry.observe("GET", "http://emby:8096/Users", 200, 0.01)
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    server = metrics.serve("127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        response = requests.get(f"{url}/metrics")
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'emby_requests_total{method="GET",endpoint="/Users",status="200"} 1' in response.text.splitlines()
+        assert requests.get(f"{url}/other").status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
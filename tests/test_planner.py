@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+from mediaserver_automation import planner
+
+
+def test_diff_keeps_the_order_items_were_found_in():
+    to_add, to_remove = planner.diff(["a", "b", "c", "b"], ["d", "c", "e", "d"])
+    assert to_add == ["d", "e"]
+    assert to_remove == ["a", "b"]
+
+
+def test_fingerprint_ignores_order_and_duplicates():
+    assert planner.membership_fingerprint(["a", "b"]) == planner.membership_fingerprint(["b", "a", "b"])
+    assert planner.membership_fingerprint(["a", "b"]) != planner.membership_fingerprint(["a"])
+
+
+def test_applied_membership_is_remembered_until_forgotten():
+    fingerprint = planner.membership_fingerprint(["a", "b"])
+    collection = {"Id": "c1", "ChildCount": 2}
+    assert not planner.is_unchanged(collection, fingerprint)
+
+    planner.record_applied("c1", fingerprint, 2)
+    planner.record_applied("c2", "other", 5)
+    assert planner.is_unchanged(collection, fingerprint)
+    assert not planner.is_unchanged({"Id": "c1", "ChildCount": 3}, fingerprint)
+    assert not planner.is_unchanged(collection, planner.membership_fingerprint(["a"]))
+    assert not planner.is_unchanged(None, fingerprint)
+
+    planner.forget_applied("c1")
+    assert not planner.is_unchanged(collection, fingerprint)
+    assert planner.is_unchanged({"Id": "c2", "ChildCount": 5}, "other")
+
+
+def test_collection_plan_api_calls():
+    plan = planner.CollectionPlan("New", None, [str(i) for i in range(45)], [], batch_size=20)
+    assert [(method, count) for method, _, count, _ in plan.api_calls()] == [("POST", 1), ("POST", 2)]
+    assert plan.total_calls() == 3
+
+    plan = planner.CollectionPlan("Existing", "c1", ["a"], ["b", "c"])
+    assert [(method, count) for method, _, count, _ in plan.api_calls()] == [("POST", 1), ("DELETE", 1)]
+    assert not plan.is_empty()
+    assert planner.CollectionPlan("Existing", "c1", [], []).is_empty()
+
+
+# Apply moves the way Emby's move endpoint does: lift the entry out, insert it at the new index
+def apply_moves(entry_ids, moves):
+    entries = list(entry_ids)
+    for entry_id, new_index in moves:
+        entries.remove(entry_id)
+        entries.insert(new_index, entry_id)
+    return entries
+
+
+def longest_increasing_run(values):
+    best = [1] * len(values)
+    for i in range(len(values)):
+        for j in range(i):
+            if values[j] < values[i]:
+                best[i] = max(best[i], best[j] + 1)
+    return max(best, default=0)
+
+
+@pytest.mark.parametrize("entry_ids, wanted, expected_moves", [
+    ([], [], 0),
+    (["a"], ["a"], 0),
+    (["a", "b", "c"], ["a", "b", "c"], 0),
+    (["c", "a", "b"], ["a", "b", "c"], 1),
+    (["b", "c", "d", "a"], ["a", "b", "c", "d"], 1),
+    (["d", "c", "b", "a"], ["a", "b", "c", "d"], 3),
+])
+def test_ordering_moves_examples(entry_ids, wanted, expected_moves):
+    moves = planner.ordering_moves(entry_ids, wanted)
+    assert len(moves) == expected_moves
+    assert apply_moves(entry_ids, moves) == wanted
+
+
+def test_ordering_moves_is_minimal():
+    rng = random.Random(7)
+    for size in list(range(1, 9)) + [40, 200]:
+        for _ in range(25):
+            wanted = [f"e{i}" for i in range(size)]
+            entry_ids = rng.sample(wanted, size)
+            moves = planner.ordering_moves(entry_ids, wanted)
+            assert apply_moves(entry_ids, moves) == wanted
+            ranks = [wanted.index(entry_id) for entry_id in entry_ids]
+            assert len(moves) == size - longest_increasing_run(ranks)
+            assert len({entry_id for entry_id, _ in moves}) == len(moves)  # Each entry moves at most once
+
+
+def test_playlist_plan_counts_moves():
+    plan = planner.PlaylistPlan("Recently Added", "p1", [], [], moves=[("e1", 0), ("e2", 3)])
+    assert not plan.is_empty()
+    assert plan.total_calls() == 2
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import config, planner, posters
+from mediaserver_automation.client import EmbyClient
+
+
+@pytest.fixture
+def poster(tmp_path):
+    path = tmp_path / "poster.jpg"
+    path.write_bytes(b"\xff\xd8 first poster")
+    return path
+
+
+@pytest.fixture
+def original_size(monkeypatch):
+    monkeypatch.setenv("POSTER_MAX_WIDTH", "0")
+
+
+def count_hashing(monkeypatch):
+    hashed = []
+    file_sha256 = posters.file_sha256
+    monkeypatch.setattr(posters, "file_sha256", lambda path: hashed.append(path) or file_sha256(path))
+    return hashed
+
+
+# The hash is read from the state while the file's size and modification time are unchanged
+def test_poster_hash_is_cached_by_size_and_mtime(poster, monkeypatch):
+    hashed = count_hashing(monkeypatch)
+    first = posters.poster_sha256(str(poster))
+    assert posters.poster_sha256(str(poster)) == first
+    assert len(hashed) == 1
+
+    poster.write_bytes(b"\xff\xd8 second, longer poster")
+    assert posters.poster_sha256(str(poster)) != first
+    assert len(hashed) == 2
+
+
+def apply_with_poster(client, collection_id, poster):
+    plan = planner.CollectionPlan("Test Collection", collection_id, [], [], poster_path=str(poster))
+    planner.apply_collection_plan(client, plan, fake_emby.MOVIE_LIBRARY_ID, batch_delay=0)
+    return plan
+
+
+def test_unchanged_poster_is_not_uploaded_again(emby, poster, original_size):
+    client = EmbyClient(emby.url, emby.api_key)
+    collection_id = fake_emby.make_id("collection", "Test Collection")
+    emby.library.collections[collection_id] = {"Name": "Test Collection", "Items": []}
+
+    plan = apply_with_poster(client, collection_id, poster)
+    assert plan.poster_path == str(poster)
+    assert emby.library.images[collection_id] == poster.read_bytes()
+
+    del emby.library.images[collection_id]
+    plan = apply_with_poster(client, collection_id, poster)
+    assert plan.poster_unchanged and plan.poster_path is None
+    assert collection_id not in emby.library.images
+
+    poster.write_bytes(b"\xff\xd8 replaced poster")
+    plan = apply_with_poster(client, collection_id, poster)
+    assert emby.library.images[collection_id] == b"\xff\xd8 replaced poster"
+
+
+# A collection without an ID yet always gets its poster
+def test_new_collection_needs_upload(poster, original_size):
+    upload_key = posters.prepare(str(poster))[1]
+    posters.record_upload("c1", upload_key)
+    assert not posters.needs_upload("c1", upload_key)
+    assert posters.needs_upload("c2", upload_key)
+    assert posters.needs_upload(None, upload_key)
+
+
+# A variant already in the cache is used as is, without loading Pillow
+def test_cached_variant_is_reused(poster, monkeypatch):
+    monkeypatch.setattr(posters, "import_pillow", lambda: pytest.fail("rendered a cached variant"))
+    sha256 = posters.poster_sha256(str(poster))
+    upload_key = f"{sha256}-{posters.DEFAULT_MAX_WIDTH}x{posters.DEFAULT_MAX_HEIGHT}q{posters.DEFAULT_JPEG_QUALITY}"
+    cache_dir = config.state_path(posters.CACHE_DIR_NAME)
+    os.makedirs(cache_dir)
+    variant = os.path.join(cache_dir, upload_key + ".jpg")
+    with open(variant, 'wb') as variant_file:
+        variant_file.write(b"\xff\xd8 small")
+
+    assert posters.prepare(str(poster)) == (variant, upload_key)
+
+    # Other resize settings need their own variant
+    monkeypatch.setenv("POSTER_JPEG_QUALITY", "50")
+    monkeypatch.setattr(posters, "import_pillow", lambda: None)
+    assert posters.prepare(str(poster)) == (str(poster), sha256)
+
+
+def test_original_is_uploaded_without_resizing(poster, original_size):
+    assert posters.prepare(str(poster)) == (str(poster), posters.poster_sha256(str(poster)))
+
+
+def test_original_is_uploaded_without_pillow(poster, monkeypatch):
+    monkeypatch.setattr(posters, "import_pillow", lambda: None)
+    assert posters.prepare(str(poster)) == (str(poster), posters.poster_sha256(str(poster)))
+    assert not os.path.exists(config.state_path(posters.CACHE_DIR_NAME))
+
+
+def test_variant_is_rendered_once(tmp_path, monkeypatch):
+    Image = pytest.importorskip("PIL.Image")
+    path = tmp_path / "large.jpg"
+    Image.effect_noise((2000, 3000), 64).convert("RGB").save(path, "JPEG", quality=95)
+
+    variant, upload_key = posters.prepare(str(path))
+    assert os.path.dirname(variant) == config.state_path(posters.CACHE_DIR_NAME)
+    assert os.path.basename(variant) == upload_key + ".jpg"
+    with Image.open(variant) as image:
+        assert image.width <= posters.DEFAULT_MAX_WIDTH and image.height <= posters.DEFAULT_MAX_HEIGHT
+
+    monkeypatch.setattr(posters, "render_variant", lambda *args: pytest.fail("rendered the poster again"))
+    assert posters.prepare(str(path)) == (variant, upload_key)
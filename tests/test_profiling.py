@@ -0,0 +1,74 @@
+import io
+import logging
+import sys
+
+import pytest
+
+from mediaserver_automation import logs, profiling
+
+
+@pytest.fixture
+def job_logging():
+    package_logger = logs.get_logger()
+    saved = package_logger.handlers, package_logger.level, package_logger.propagate, sys.stdout
+    job_logging = logs.JobLogging()
+    yield job_logging
+    job_logging.stop(summary=False)
+    package_logger.handlers, package_logger.level, package_logger.propagate, sys.stdout = saved
+    logs.set_phase("startup")
+
+
+def test_log_output_is_charged_to_the_phase_it_was_logged_in(job_logging, monkeypatch):
+    monkeypatch.setattr(sys, "stdout", io.StringIO())
+    profiler = profiling.PhaseProfiler()
+    profiler.enable("TestJob")
+    job_logging.start("TestJob", level="INFO", stream=sys.stdout)
+    logger = logs.get_logger("TestJob")
+
+    for name, lines in [("library scan", 200), ("write-back", 5)]:
+        logs.set_phase(name)
+        profiler.phase(name)
+        for i in range(lines):
+            logger.info("%s line %d", name, i)
+    job_logging.stop(summary=False)
+    profiler.finish()
+
+    scan = profiler.phases["library scan"]
+    write_back = profiler.phases["write-back"]
+    assert scan.output_bytes == sum(len(f"library scan line {i}\n") for i in range(200))
+    assert write_back.output_bytes == sum(len(f"write-back line {i}\n") for i in range(5))
+    assert scan.output_seconds > 0
+    # Written by the log writer thread, beside the job: not taken out of the phase's other time
+    assert scan.job_thread_output_seconds == 0
+    assert scan.other_seconds() == pytest.approx(scan.wall_seconds - scan.network_seconds)
+
+
+def test_prints_on_the_job_thread_are_taken_out_of_other_time(monkeypatch):
+    monkeypatch.setattr(sys, "stdout", io.StringIO())
+    profiler = profiling.PhaseProfiler()
+    profiler.enable("TestJob")
+    profiler.phase("report")
+    print("x" * 99)
+    with profiler.section("nested"):
+        print("y")
+    profiler.finish()
+
+    assert profiler.phases["report"].output_bytes == 100
+    assert profiler.phases["nested"].output_bytes == 2
+    assert profiler.phases["report"].job_thread_output_seconds == profiler.phases["report"].output_seconds
+    assert not isinstance(sys.stdout, profiling.TimedOutput)
+
+
+def test_sections_are_exclusive(monkeypatch):
+    monkeypatch.setattr(sys, "stdout", io.StringIO())
+    profiler = profiling.PhaseProfiler()
+    profiler.enable("TestJob")
+    profiler.phase("rule evaluation")
+    for _ in range(3):
+        with profiler.section("watch-status resolution"):
+            logging.getLogger(__name__).debug("inside")
+    profiler.finish()
+
+    assert profiler.phases["watch-status resolution"].entries == 3
+    assert profiler.phases["rule evaluation"].entries == 1
+    assert set(profiler.phases) == {"startup", "rule evaluation", "watch-status resolution"}
@@ -0,0 +1,81 @@
+import datetime
+import json
+from datetime import timezone
+from types import SimpleNamespace
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import rules
+from mediaserver_automation.jobs import recently_added
+
+
+def write_users(tmp_path, users):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps(users))
+    return str(path)
+
+
+def test_load_users_fills_in_the_defaults(tmp_path):
+    path = write_users(tmp_path, [
+        {"EMBY_USER_ID": "alice", "PLAYLIST_NAME": "Alice's New Music", "NUMBER_OF_DAYS": "30"},
+        {"EMBY_USER_ID": "bob", "EXCLUDE_ITEMS": "Christmas, Holiday"},
+    ])
+    assert recently_added.load_users(path, "Recently Added", 90, "Santa") == [
+        {"user_name": "alice", "playlist_name": "Alice's New Music", "number_of_days": 30, "exclude_items": ["Santa"]},
+        {"user_name": "bob", "playlist_name": "Recently Added (bob)", "number_of_days": 90, "exclude_items": ["Christmas", "Holiday"]},
+    ]
+
+
+@pytest.mark.parametrize("users, error", [
+    ({"EMBY_USER_ID": "alice"}, "non-empty JSON list"),
+    ([], "non-empty JSON list"),
+    (["alice"], "User #1 .* has no EMBY_USER_ID"),
+    ([{"EMBY_USER_ID": "alice"}, {"PLAYLIST_NAME": "Bob's"}], "User #2 .* has no EMBY_USER_ID"),
+    ([{"EMBY_USER_ID": "alice", "PLAYLIST_NAME": "Shared"}, {"EMBY_USER_ID": "bob", "PLAYLIST_NAME": "Shared"}],
+     "'Shared' appears more than once"),
+])
+def test_load_users_rejects_bad_files(tmp_path, users, error):
+    with pytest.raises(ValueError, match=error):
+        recently_added.load_users(write_users(tmp_path, users), "Recently Added", 90, "")
+
+
+@pytest.fixture
+def music(monkeypatch):
+    server = fake_emby.start_server(movies=0, tracks=400)
+    monkeypatch.setenv("EMBY_SERVER_URL", server.url)
+    monkeypatch.setenv("EMBY_API_KEY", server.api_key)
+    monkeypatch.setenv("EMBY_MUSIC_LIBRARY_ID", fake_emby.MUSIC_LIBRARY_ID)
+    for name in ("EMBY_USER_ID", "PLAYLIST_NAME", "EXCLUDE_ITEMS", "DELETE_ALL_PLAYLISTS", "SORT_PLAYLIST_BY_DATE"):
+        monkeypatch.delenv(name, raising=False)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# Each user gets their own days and exclusions, from a single scan of the music library
+def test_playlists_for_several_users_from_one_scan(music, tmp_path, monkeypatch):
+    path = write_users(tmp_path, [
+        {"EMBY_USER_ID": fake_emby.ADMIN_USER, "NUMBER_OF_DAYS": "30"},
+        {"EMBY_USER_ID": fake_emby.WATCH_STATUS_USER, "PLAYLIST_NAME": "New Music", "EXCLUDE_ITEMS": "Artist 00"},
+    ])
+    monkeypatch.setenv("NUMBER_OF_DAYS", "90")
+    assert recently_added.run(SimpleNamespace(plan=False, users=path)) == 0
+
+    now = datetime.datetime.now(timezone.utc)
+    tracks = [item for item in music.library.items.values() if item["Type"] == "Audio"]
+
+    def expected(number_of_days, exclude_items):
+        return {track["Id"] for track in tracks if rules.is_recently_added(track, now, number_of_days)
+                and not rules.recently_added_exclusion_reason(track, exclude_items)}
+
+    playlists = {playlist["Name"]: {item_id for _, item_id in playlist["Entries"]} for playlist in music.library.playlists.values()}
+    admin_tracks = expected(30, rules.DEFAULT_EXCLUDE_ITEMS.split(","))
+    shared_tracks = expected(90, ["Artist 00"])
+    assert playlists == {f"Recently Added ({fake_emby.ADMIN_USER})": admin_tracks, "New Music": shared_tracks}
+    assert 0 < len(admin_tracks) < len(shared_tracks) < len(expected(90, []))
+
+    # One scan of the music library and one playlist listing, shared by both users
+    requests = music.stats.snapshot()["requests"]
+    assert sum(count for key, count in requests.items() if key.lower() == "get /items") == 2
@@ -0,0 +1,171 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from mediaserver_automation import retry
+from mediaserver_automation.client import EmbyClient
+from mediaserver_automation.jobs import unwatched
+
+
+@pytest.fixture(autouse=True)
+def fresh_retry_state():
+    retry.breakers.clear()
+    retry.limiters.clear()
+    retry.DEADLINE.start(None)
+    yield
+    retry.breakers.clear()
+    retry.limiters.clear()
+    retry.DEADLINE.start(None)
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_backoff_is_capped_full_jitter():
+    policy = retry.RetryPolicy(backoff_base=1, backoff_max=5)
+    for attempt in range(6):
+        assert 0 <= policy.backoff(attempt) <= min(5, 2 ** attempt)
+    assert policy.backoff(0, retry_after=3) == 3
+    assert policy.backoff(0, retry_after=120) == 5
+
+
+def test_which_statuses_are_retried():
+    policy = retry.RetryPolicy()
+    assert policy.is_retryable("GET", 503)
+    assert policy.is_retryable("DELETE", 500)
+    assert not policy.is_retryable("GET", 404)
+    assert policy.is_retryable("POST", 429)
+    assert not policy.is_retryable("POST", 500)
+    assert policy.is_retryable_error("GET", requests.ReadTimeout())
+    assert policy.is_retryable_error("POST", requests.ConnectTimeout())
+    assert not policy.is_retryable_error("POST", requests.ReadTimeout())
+
+
+def test_breaker_opens_probes_and_closes(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(retry.time, "time", clock)
+    breaker = retry.CircuitBreaker("http://emby", threshold=3, cooldown=60)
+
+    for _ in range(2):
+        breaker.record_failure()
+        breaker.before_request()
+    breaker.record_failure()
+    with pytest.raises(retry.CircuitOpenError):
+        breaker.before_request()
+    # Saved, so the next job skips the server too
+    assert retry.CircuitBreaker("http://emby", 3, 60).open_until == clock.now + 60
+
+    clock.now += 61
+    breaker.before_request()  # The probe
+    with pytest.raises(retry.CircuitOpenError):
+        breaker.before_request()  # Only one probe at a time
+    breaker.record_success()
+    breaker.before_request()
+    assert retry.CircuitBreaker("http://emby", 3, 60).open_until == 0
+
+
+def test_failed_probe_reopens_at_once(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(retry.time, "time", clock)
+    breaker = retry.CircuitBreaker("http://emby", threshold=2, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    clock.now += 61
+    breaker.before_request()
+    breaker.record_failure()
+    with pytest.raises(retry.CircuitOpenError):
+        breaker.before_request()
+    assert breaker.open_until == clock.now + 60
+
+
+def test_session_retries_transient_statuses(emby, monkeypatch):
+    monkeypatch.setattr(retry.time, "sleep", lambda seconds: None)
+    client = EmbyClient(emby.url, emby.api_key)
+    client.session.policy = retry.RetryPolicy(max_attempts=3)
+    emby.inject_failures(503, 2)
+    assert client.request("GET", "/Users").status_code == 200
+
+    emby.inject_failures(503, 3)
+    assert client.request("GET", "/Users").status_code == 503
+
+
+def test_no_request_after_the_deadline(emby):
+    client = EmbyClient(emby.url, emby.api_key)
+    retry.DEADLINE.expires_at = retry.time.monotonic() - 1
+    requests_before = emby.stats.snapshot()["requests"]
+    with pytest.raises(retry.DeadlineExceeded):
+        client.request("GET", "/Users")
+    assert emby.stats.snapshot()["requests"] == requests_before
+
+
+# Once the circuit opens in the middle of the per-movie lookups the job stops, instead of
+# treating every remaining movie as unwatched
+def test_open_circuit_stops_the_unwatched_job(emby_env, monkeypatch):
+    monkeypatch.setattr(unwatched.watchstate.WatchState, "sync", lambda self, full=False: 1 / 0)
+    calls = []
+    original = retry.CircuitBreaker.before_request
+
+    def before_request(breaker):
+        calls.append(1)
+        if len(calls) > 20:
+            raise retry.CircuitOpenError("Circuit open")
+        return original(breaker)
+
+    monkeypatch.setattr(retry.CircuitBreaker, "before_request", before_request)
+    with pytest.raises(retry.CircuitOpenError):
+        unwatched.run(SimpleNamespace(plan=False, full_watch_sync=False))
+    assert len(calls) == 21
+    assert emby_env.library.collections == {}
+
+
+def test_rate_limiter_spaces_requests(monkeypatch):
+    clock = Clock()
+    slept = []
+
+    def sleep(seconds):
+        slept.append(round(seconds, 6))
+        clock.now += seconds
+
+    monkeypatch.setattr(retry.time, "monotonic", clock)
+    monkeypatch.setattr(retry.time, "sleep", sleep)
+    limiter = retry.RateLimiter(4)
+    for _ in range(3):
+        limiter.wait()
+    assert slept == [0.25, 0.25]
+
+    # An idle limiter does not save up a burst
+    clock.now += 10
+    limiter.wait()
+    limiter.wait()
+    assert slept == [0.25, 0.25, 0.25]
+
+    unlimited = retry.RateLimiter(0)
+    for _ in range(3):
+        unlimited.wait()
+    assert len(slept) == 3
+
+
+def test_rate_limit_is_shared_by_threads_and_sessions(emby, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT", "50")
+    policy = retry.RetryPolicy.from_environment()
+    assert retry.limiter_for(emby.url + "/Users", policy) is retry.limiter_for(emby.url + "/Items", policy)
+    assert retry.limiter_for("http://other:8096/Users", policy) is not retry.limiter_for(emby.url, policy)
+
+    clients = [EmbyClient(emby.url, emby.api_key) for _ in range(4)]
+    started = retry.time.monotonic()
+    threads = [threading.Thread(target=lambda client=client: [client.request("GET", "/Users") for _ in range(5)])
+               for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 20 requests at 50 per second: the first goes at once, the rest 20 ms apart
+    assert retry.time.monotonic() - started >= 19 * 0.02 - 0.01
@@ -0,0 +1,61 @@
+import re
+from types import SimpleNamespace
+
+from mediaserver_automation import rules
+from mediaserver_automation.jobs import romcoms
+from mediaserver_automation.retry import RetryingSession
+
+MOVIE_DETAILS = re.compile(r"/users/[^/]+/items/[^/?]+$", re.IGNORECASE)
+
+
+def record_requests(monkeypatch):
+    sent = []
+    request = RetryingSession.request
+
+    def recording(session, method, url, **kwargs):
+        sent.append((method, url))
+        return request(session, method, url, **kwargs)
+
+    monkeypatch.setattr(RetryingSession, "request", recording)
+    return sent
+
+
+def romcom_collection(library):
+    return next((collection for collection in library.collections.values()
+                 if collection["Name"] == rules.ROMCOMS_COLLECTION_NAME), None)
+
+
+# The movies the full rules keep, reading every movie's whole cast list
+def expected_romcoms(library):
+    return sorted(item_id for item_id, item in library.items.items()
+                  if item["Type"] == "Movie" and rules.romcom_exclusion_reason(item) is None)
+
+
+# Validation reuses the scan and the person index instead of fetching every candidate
+def test_validation_fetches_no_movie_details(emby_env, monkeypatch):
+    library = emby_env.library
+    candidates = [item for item in library.items.values() if item["Type"] == "Movie"
+                  and rules.romcom_exclusion_reason(item) is None]
+    temple = {"Name": "Shirley Temple", "Id": library.person_ids["Shirley Temple"], "Type": "Actor"}
+    candidates[0]["People"][0] = temple
+    sent = record_requests(monkeypatch)
+
+    assert romcoms.run(SimpleNamespace(plan=False, snapshot=False)) == 0
+    assert [url for _, url in sent if MOVIE_DETAILS.search(url)] == []
+    collection = romcom_collection(library)
+    assert candidates[0]["Id"] not in collection["Items"]
+    assert sorted(collection["Items"]) == expected_romcoms(library)
+
+
+# A repeat run with nothing to change reads the library and the collection's ChildCount, and
+# neither fetches movies nor lists or writes the collection
+def test_unchanged_repeat_run_writes_nothing(emby_env, monkeypatch, caplog):
+    assert romcoms.run(SimpleNamespace(plan=False, snapshot=False)) == 0
+    sent = record_requests(monkeypatch)
+
+    with caplog.at_level("INFO"):
+        assert romcoms.run(SimpleNamespace(plan=False, snapshot=False)) == 0
+    assert {method for method, _ in sent} == {"GET"}
+    assert [url for _, url in sent if MOVIE_DETAILS.search(url) or "/Collections/" in url] == []
+    assert "Romantic Comedies collection is unchanged, nothing written" in caplog.messages
+    assert "Romantic Comedies collection updated successfully!" not in caplog.messages
@@ -0,0 +1,37 @@
+import datetime
+
+import pytest
+
+from mediaserver_automation import rules
+
+UTC = datetime.timezone.utc
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-01-31T20:15:00.0000000Z", datetime.datetime(2024, 1, 31, 20, 15, tzinfo=UTC)),
+    ("2024-01-31T20:15:00.1234567Z", datetime.datetime(2024, 1, 31, 20, 15, 0, 123456, tzinfo=UTC)),
+    ("2024-01-31T20:15:00.5Z", datetime.datetime(2024, 1, 31, 20, 15, 0, 500000, tzinfo=UTC)),
+    ("2024-01-31T20:15:00Z", datetime.datetime(2024, 1, 31, 20, 15, tzinfo=UTC)),
+    ("2024-01-31T20:15:00", datetime.datetime(2024, 1, 31, 20, 15, tzinfo=UTC)),
+    ("2024-01-31T22:15:00.000+02:00", datetime.datetime(2024, 1, 31, 20, 15, tzinfo=UTC)),
+    ("2024-01-31T15:15:00-0500", datetime.datetime(2024, 1, 31, 20, 15, tzinfo=UTC)),
+])
+def test_parse_emby_date(value, expected):
+    assert rules.parse_emby_date(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "yesterday", "2024-01-31", "2024-01-31T20:15:00.Z", None])
+def test_parse_emby_date_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        rules.parse_emby_date(value)
+
+
+@pytest.mark.parametrize("user_data, played", [
+    ({}, False),
+    ({"Played": True}, True),
+    ({"Played": False, "PlayedPercentage": 95}, True),
+    ({"Played": False, "PlayedPercentage": 50}, False),
+    ({"Played": False, "PlayCount": 2}, True),
+])
+def test_is_played(user_data, played):
+    assert bool(rules.is_played(user_data)) == played
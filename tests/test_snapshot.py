@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import snapshot, vectorized
+from mediaserver_automation.client import EmbyClient
+from mediaserver_automation.jobs import disney
+
+
+def server_items(server):
+    client = EmbyClient(server.url, server.api_key)
+    params = {"Recursive": True, "MediaTypes": "Video", "Fields": snapshot.FIELDS}
+    return client.get_json("/Items", params=params)["Items"]
+
+
+def test_items_read_back_as_the_server_sent_them(emby, tmp_path):
+    items = server_items(emby)
+    path = tmp_path / "library.snapshot"
+    snapshot.write(str(path), items, server=emby.url, library_ids=[fake_emby.MOVIE_LIBRARY_ID])
+
+    with snapshot.Snapshot(str(path)) as library:
+        assert len(library) == len(items)
+        assert library.server == emby.url
+        for row, item in enumerate(items):
+            read = library.item(row)
+            for key in ("Id", "Name", "Type", "Path", "Overview", "OfficialRating", "ProductionYear", "Genres"):
+                assert read.get(key) == item.get(key), key
+            assert read["DateCreated"][:19] == item["DateCreated"][:19]  # Kept to the second
+            assert [(s["Name"], s["Id"]) for s in read["Studios"]] == [(s["Name"], s["Id"]) for s in item["Studios"]]
+            assert [p["Name"] for p in read["People"]] == [p["Name"] for p in item["People"]]
+        assert library.get(items[42]["Id"])["Name"] == items[42]["Name"]
+        assert library.get("missing") is None
+
+
+def test_load_reuses_the_saved_snapshot_until_the_libraries_change(emby):
+    client = EmbyClient(emby.url, emby.api_key)
+    with snapshot.load(client, [fake_emby.MOVIE_LIBRARY_ID]) as library:
+        built_at = library.header["built_at"]
+    requests_before = emby.stats.snapshot()["requests"]
+
+    with snapshot.load(client, [fake_emby.MOVIE_LIBRARY_ID]) as library:
+        assert library.header["built_at"] == built_at
+    assert emby.stats.snapshot()["requests"] == requests_before
+
+    with snapshot.load(client, [fake_emby.MOVIE_LIBRARY_ID, "other"]) as library:
+        assert library.header["built_at"] != built_at
+
+
+def test_snapshot_run_matches_the_server_run(emby_env):
+    library = emby_env.library
+    assert disney.run(SimpleNamespace(plan=False, snapshot=False)) == 0
+    [collection] = library.collections.values()
+    from_server = set(collection["Items"])
+    library.collections.clear()
+
+    assert disney.run(SimpleNamespace(plan=False, snapshot=True)) == 0
+    [collection] = library.collections.values()
+    assert set(collection["Items"]) == from_server
+
+
+# A failure after the snapshot is opened must not leave it mapped
+@pytest.mark.parametrize("target, name", [(snapshot.Snapshot, "codes_where"), (vectorized.RuleEngine, "disney_rows")])
+def test_snapshot_is_closed_when_reading_it_fails(emby_env, monkeypatch, target, name):
+    closed = []
+    original_close = snapshot.Snapshot.close
+    monkeypatch.setattr(snapshot.Snapshot, "close", lambda self: closed.append(self) or original_close(self))
+    monkeypatch.setattr(target, name, lambda self, *args: 1 / 0)
+
+    assert disney.run(SimpleNamespace(plan=False, snapshot=True)) == 1
+    assert len(closed) == 1
+    assert closed[0].mmap.closed
+    assert emby_env.library.collections == {}
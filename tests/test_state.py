@@ -0,0 +1,32 @@
+import json
+import threading
+
+from mediaserver_automation import state
+
+
+def test_missing_or_unreadable_documents_load_empty(state_dir):
+    assert state.load("nothing") == {}
+    state_dir.mkdir(parents=True)
+    (state_dir / "broken.json").write_text("{not json")
+    assert state.load("broken") == {}
+
+
+def test_save_replaces_the_document(state_dir):
+    state.save("doc", {"a": 1})
+    state.save("doc", {"b": 2})
+    assert json.loads((state_dir / "doc.json").read_text()) == {"b": 2}
+    assert [path.name for path in state_dir.iterdir() if path.suffix == ".tmp"] == []
+
+
+def test_concurrent_updates_keep_every_change():
+    def writer(name):
+        for i in range(20):
+            state.update("shared", lambda document: document.update({f"{name}-{i}": i}))
+
+    threads = [threading.Thread(target=writer, args=(f"writer{n}",)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(state.load("shared")) == 6 * 20
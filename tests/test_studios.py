@@ -0,0 +1,46 @@
+import pytest
+
+from mediaserver_automation import studios
+from mediaserver_automation.client import EmbyClient
+
+DISNEY = ["Disney", "Pixar"]
+
+
+@pytest.fixture
+def client(emby):
+    return EmbyClient(emby.url, emby.api_key)
+
+
+def studio_listings(emby):
+    return sum(count for key, count in emby.stats.snapshot()["requests"].items() if key.lower() == "get /studios")
+
+
+def test_matching_studios_are_listed_once(emby, client):
+    matched = studios.matching_studios(client, DISNEY)
+    assert sorted(matched.values()) == ["Disney Television Animation", "Pixar", "Walt Disney Pictures"]
+    assert studio_listings(emby) == 1
+
+    assert studios.matching_studios(client, DISNEY) == matched
+    assert studio_listings(emby) == 1
+
+
+def test_cache_expires_and_follows_the_names(emby, client, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(studios.time, "time", lambda: clock[0])
+    studios.matching_studios(client, DISNEY, max_age=60)
+
+    clock[0] += 60
+    studios.matching_studios(client, DISNEY, max_age=60)
+    assert studio_listings(emby) == 1
+
+    clock[0] += 1
+    studios.matching_studios(client, DISNEY, max_age=60)
+    assert studio_listings(emby) == 2
+
+    # Other names, a refresh or a STUDIO_CACHE_MAX_AGE of 0 list the studios again
+    assert list(studios.matching_studios(client, ["Pixar"]).values()) == ["Pixar"]
+    studios.matching_studios(client, ["Pixar"], refresh=True)
+    monkeypatch.setenv("STUDIO_CACHE_MAX_AGE", "0")
+    clock[0] += 1
+    studios.matching_studios(client, ["Pixar"])
+    assert studio_listings(emby) == 5
@@ -0,0 +1,92 @@
+import pytest
+
+from mediaserver_automation import titles
+from mediaserver_automation.client import EmbyClient
+
+ENTRIES = [
+    ["1", "Monsters, Inc.", 2001, "/movies/Monsters, Inc. (2001)"],
+    ["2", "Monsters University", 2013, "/movies/Monsters University (2013)"],
+    ["3", "Casper", 1995, "/movies/Casper (1995)"],
+    ["4", "Casper", 2025, "/movies/Casper (2025)"],
+    ["5", "The Little Mermaid", 1989, "/movies/The Little Mermaid (1989)"],
+    ["6", "Amélie", 2001, "/movies/Amelie (2001)"],
+    ["7", "Beauty & the Beast", 1991, "/movies/Beauty and the Beast (1991)"],
+]
+
+
+@pytest.mark.parametrize("title, normalized", [
+    ("Monsters, Inc.", "monsters inc"),
+    ("The Little Mermaid", "little mermaid"),
+    ("Amélie", "amelie"),
+    ("Beauty & the Beast", "beauty and the beast"),
+    ("A", "a"),
+    (None, ""),
+])
+def test_normalize(title, normalized):
+    assert titles.normalize(title) == normalized
+
+
+@pytest.mark.parametrize("query, split", [
+    ("Casper (1995)", ("Casper", 1995)),
+    ("Casper 1995", ("Casper", 1995)),
+    ("Casper [2025]", ("Casper", 2025)),
+    ("1917", ("1917", None)),
+    ("Casper", ("Casper", None)),
+])
+def test_split_year(query, split):
+    assert titles.split_year(query) == split
+
+
+def ranked_ids(index, query, year=None):
+    return [entry[0] for _, entry in index.search(query, year)]
+
+
+def test_exact_title_scores_one_and_ranks_first():
+    index = titles.TitleIndex(ENTRIES)
+    score, entry = index.search("Monsters Inc")[0]
+    assert entry[0] == "1"
+    assert score == 1.0
+    assert ranked_ids(index, "the little mermaid")[0] == "5"
+    assert ranked_ids(index, "Amelie")[0] == "6"
+    assert ranked_ids(index, "Beauty and the Beast")[0] == "7"
+
+
+def test_typo_still_ranks_the_right_movie_first():
+    index = titles.TitleIndex(ENTRIES)
+    score, entry = index.search("Monstres University")[0]
+    assert entry[0] == "2"
+    assert titles.MIN_SCORE <= score < 1.0
+
+
+def test_year_picks_between_remakes():
+    index = titles.TitleIndex(ENTRIES)
+    assert ranked_ids(index, "Casper (1995)")[0] == "3"
+    assert ranked_ids(index, "Casper", year=2025)[0] == "4"
+    assert ranked_ids(index, "Casper", year=2024)[0] == "4"  # One year off costs little
+    assert sorted(ranked_ids(index, "Casper")[:2]) == ["3", "4"]
+
+
+def test_unrelated_query_has_no_good_match():
+    index = titles.TitleIndex(ENTRIES)
+    matches = index.search("Zzyzx Road")
+    assert not matches or matches[0][0] < titles.MIN_SCORE
+    assert index.search("!!!") == []
+
+
+def test_index_is_saved_per_server(emby):
+    client = EmbyClient(emby.url, emby.api_key)
+    index = titles.load_index(client)
+    assert len(index.entries) == 200
+    requests_before = emby.stats.snapshot()["requests"]
+
+    assert len(titles.load_index(client).entries) == 200
+    assert emby.stats.snapshot()["requests"] == requests_before
+    assert titles.TitleIndex.load("http://other-server") is None
+
+
+def test_find_movie(emby):
+    client = EmbyClient(emby.url, emby.api_key)
+    movie, matches = titles.find_movie(client, "Movie 000042")
+    assert movie[1] == "Movie 000042"
+    movie, matches = titles.find_movie(client, "Zzyzx Road")
+    assert movie is None
@@ -0,0 +1,90 @@
+import logging
+import sys
+import threading
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import rules, snapshot, vectorized
+
+CHECKS = {rules.DISNEY_COLLECTION_NAME: rules.matches_disney, rules.ROMCOMS_COLLECTION_NAME: rules.matches_romcom}
+
+
+def edge_cases(template):
+    def movie(name, **fields):
+        item = dict(template, Id=fake_emby.make_id("movie", name), Name=name, Path=f"/movies/{name}.mkv", Overview="")
+        item.update(fields)
+        return item
+
+    disney = [{"Name": "Walt Disney Pictures", "Id": "1"}]
+    romance = ["Comedy", "Romance"]
+    return [
+        movie("Disney PG", OfficialRating="PG", Studios=disney),
+        movie("Disney PG-13", OfficialRating="PG-13", Studios=disney),
+        movie("Disney unrated", OfficialRating=None, Studios=disney),
+        movie("Studio-less G", OfficialRating="G", Studios=[]),
+        movie("Plain romcom", Genres=romance, People=[]),
+        movie("Animated romcom", Genres=romance + ["Animation"], People=[]),
+        movie("Romance only", Genres=["Romance"], People=[]),
+        movie("Temple romcom", Genres=romance, People=[{"Name": "Shirley Temple", "Id": "2", "Type": "Actor"}]),
+        movie("Baby Take a Bow", Genres=romance, People=[]),
+        movie("Shirley in the path", Genres=romance, People=[], Path="/movies/Shirley Temple/Bright Eyes.mkv"),
+        movie("Episode romcom", Type="Episode", Genres=romance, People=[]),
+    ]
+
+
+@pytest.fixture(scope="module")
+def library(tmp_path_factory):
+    source = fake_emby.Library(movies=2000, tracks=0)
+    items = [source.view(item, fake_emby.OPTIONAL_FIELDS) for item in source.items.values()]
+    items += edge_cases(items[0])
+    path = tmp_path_factory.mktemp("vectorized") / snapshot.SNAPSHOT_FILE
+    snapshot.write(str(path), items)
+    with snapshot.Snapshot(str(path)) as library:
+        yield library
+
+
+def per_item(library):
+    items = library.items()
+    return {name: {item["Id"] for item in items if item["Type"] == "Movie" and check(item)} for name, check in CHECKS.items()}
+
+
+# The engine's candidates must contain every match, and confirming them with rules.py must
+# give exactly the per-item result
+def assert_same_as_rules(engine, library):
+    expected = per_item(library)
+    candidates = engine.evaluate()
+    assert set(candidates) == set(expected)
+    for name, rows in candidates.items():
+        candidate_ids = {library.item_id(row) for row in rows}
+        assert expected[name] <= candidate_ids
+        assert {library.item_id(row) for row in rows if CHECKS[name](library.item(row))} == expected[name]
+    # Disney is decided from codes alone, so there is nothing left for rules.py to reject
+    assert {library.item_id(row) for row in candidates[rules.DISNEY_COLLECTION_NAME]} == expected[rules.DISNEY_COLLECTION_NAME]
+    return expected
+
+
+def test_engine_without_numpy_matches_rules(library, monkeypatch, caplog):
+    monkeypatch.setitem(sys.modules, "numpy", None)  # Import fails as if NumPy were not installed
+    monkeypatch.setattr(vectorized, "numpy_notice", threading.Event())
+    caplog.set_level(logging.INFO, logger=vectorized.__name__)
+    engine = vectorized.RuleEngine(library)
+    assert engine.np is None
+    assert vectorized.RuleEngine(library).np is None
+    assert ["NumPy" in message for message in caplog.messages] == [True]
+    expected = assert_same_as_rules(engine, library)
+
+    names = {library.item(row)["Name"] for row in range(len(library))
+             if library.item_id(row) in expected[rules.DISNEY_COLLECTION_NAME] | expected[rules.ROMCOMS_COLLECTION_NAME]}
+    assert {"Disney PG", "Plain romcom"} <= names
+    assert not names & {"Disney PG-13", "Disney unrated", "Studio-less G", "Animated romcom", "Romance only",
+                        "Temple romcom", "Baby Take a Bow", "Shirley in the path", "Episode romcom"}
+
+
+def test_engine_with_numpy_matches_rules(library):
+    numpy = pytest.importorskip("numpy")
+    engine = vectorized.RuleEngine(library, numpy=numpy)
+    assert engine.np is numpy
+    assert_same_as_rules(engine, library)
+    assert engine.evaluate() == vectorized.RuleEngine(library, numpy=False).evaluate()
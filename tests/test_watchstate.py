@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+import fake_emby
+
+from mediaserver_automation import rules, state, watchstate
+from mediaserver_automation.client import EmbyClient
+
+
+@pytest.fixture
+def store(emby):
+    user_id = emby.library.user_id(fake_emby.WATCH_STATUS_USER)
+    store = watchstate.WatchState(EmbyClient(emby.url, emby.api_key), user_id)
+    store.sync()
+    return store
+
+
+def play(emby, item_id, **user_data):
+    user_id = emby.library.user_id(fake_emby.WATCH_STATUS_USER)
+    user_data.setdefault("LastPlayedDate", fake_emby.emby_date(datetime.datetime.now(datetime.timezone.utc)))
+    emby.library.user_data[user_id][item_id].update(user_data)
+
+
+def unplayed(emby):
+    user_id = emby.library.user_id(fake_emby.WATCH_STATUS_USER)
+    return [item_id for item_id, user_data in emby.library.user_data[user_id].items()
+            if item_id in emby.library.items and not rules.is_played(user_data)]
+
+
+def test_first_sync_lists_every_movie(emby, store):
+    movies = [item_id for item_id, item in emby.library.items.items() if item["Type"] == "Movie"]
+    assert sorted(store.items) == sorted(movies)
+    assert store.key in state.load(watchstate.STATE_NAME)
+
+
+# A play counted by PlayCount alone is picked up by the next run, which reads one page
+def test_incremental_sync_reads_only_recent_plays(emby, store):
+    movie_id = unplayed(emby)[0]
+    play(emby, movie_id, Played=False, PlayCount=1)
+
+    pages = []
+    user_items = store.user_items
+    store.user_items = lambda **params: pages.append(params) or user_items(**params)
+    items = store.sync()
+    assert len(pages) == 1
+    assert rules.is_played(items[movie_id])
+    assert items[movie_id]["PlayCount"] == 1
+
+
+# A play date the parser does not understand is kept and the movies after it still read
+def test_unreadable_play_date_does_not_stop_the_sync(emby, store):
+    garbled, played = unplayed(emby)[:2]
+    play(emby, garbled, Played=True, LastPlayedDate="yesterday")
+    play(emby, played, Played=True)
+
+    items = store.sync()
+    assert items[garbled]["LastPlayedDate"] == "yesterday"
+    assert items[played]["Played"] is True
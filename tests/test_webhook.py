@@ -0,0 +1,91 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+import pytest
+
+from mediaserver_automation import webhook
+
+ADMIN = "admin-user"
+WATCHER = "watch-user"
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, changed_ids=(), removed_ids=()):
+        self.submitted.append((list(changed_ids), list(removed_ids)))
+
+
+@pytest.mark.parametrize("payload, expected", [
+    ({"Event": "library.new", "Item": {"Id": "m1"}}, (["m1"], [])),
+    ({"Event": "library.deleted", "Item": {"Id": "m1"}}, ([], ["m1"])),
+    ({"Event": "item.markplayed", "Item": {"Id": "m1"}, "User": {"Id": WATCHER}}, (["m1"], [])),
+    ({"Event": "playback.stop", "Item": {"Id": "m1"}, "User": {"Id": ADMIN}}, (["m1"], [])),
+    ({"Event": "playback.stop", "Item": {"Id": "m1"}, "User": {"Id": "guest"}}, ([], [])),
+    ({"Event": "playback.stop", "Item": {"Id": "m1"}}, ([], [])),
+    ({"Event": "user.authenticated", "Item": {"Id": "m1"}}, ([], [])),
+    ({"Event": "library.new"}, ([], [])),
+    ({"Event": "library.new", "Item": "m1"}, ([], [])),
+    ({"Event": "item.markplayed", "Item": {"Id": "m1"}, "User": WATCHER}, ([], [])),
+])
+def test_payload_changes(payload, expected):
+    assert webhook.payload_changes(payload, {ADMIN, WATCHER}) == expected
+
+
+def test_parse_payload_formats():
+    payload = {"Event": "library.new", "Item": {"Id": "m1"}}
+    assert webhook.parse_payload("application/json", json.dumps(payload).encode()) == payload
+    form = urlencode({"data": json.dumps(payload)}).encode()
+    assert webhook.parse_payload("application/x-www-form-urlencoded", form) == payload
+    multipart = (b'--b\r\nContent-Disposition: form-data; name="data"\r\n\r\n'
+                 + json.dumps(payload).encode() + b"\r\n--b--\r\n")
+    assert webhook.parse_payload("multipart/form-data; boundary=b", multipart) == payload
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b"42", b'"text"', b"null", b"{not json", b"\xff"])
+def test_parse_payload_rejects_anything_but_an_object(body):
+    with pytest.raises(ValueError):
+        webhook.parse_payload("application/json", body)
+
+
+@pytest.mark.parametrize("host, loopback", [
+    ("127.0.0.1", True), ("::1", True), ("localhost", True), ("0.0.0.0", False), ("", False), ("192.168.1.5", False),
+])
+def test_is_loopback(host, loopback):
+    assert webhook.is_loopback(host) == loopback
+
+
+@pytest.fixture
+def receiver():
+    queue = RecordingQueue()
+    settings = SimpleNamespace(webhook_host="127.0.0.1", webhook_port=0, webhook_token="s3cret")
+    server = webhook.create_server(settings, queue, [ADMIN, WATCHER])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}{webhook.WEBHOOK_PATH}", queue
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_receiver_checks_token_and_payload(receiver):
+    url, queue = receiver
+    body = json.dumps({"Event": "library.new", "Item": {"Id": "m1"}}).encode()
+
+    assert post(url, body) == 403
+    assert post(url + "?token=wrong", body) == 403
+    assert post(url + "?token=s3cret", b"[]") == 400
+    assert post(url + "?token=s3cret", body) == 204
+    assert queue.submitted == [(["m1"], [])]
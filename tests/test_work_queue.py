@@ -0,0 +1,67 @@
+import threading
+import time
+
+from mediaserver_automation.work_queue import CoalescingWorkQueue
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+        self.called = threading.Event()
+
+    def __call__(self, changed_ids, removed_ids):
+        self.batches.append((set(changed_ids), set(removed_ids)))
+        self.called.set()
+
+
+def test_burst_is_coalesced_into_one_batch():
+    recorder = Recorder()
+    work_queue = CoalescingWorkQueue(recorder, debounce_seconds=0.2).start()
+    for _ in range(3):
+        work_queue.submit(["a", "b"])
+        work_queue.submit(["b", "c"])
+    assert work_queue.pending() == 3
+    assert recorder.called.wait(2)
+    work_queue.stop()
+
+    assert recorder.batches == [({"a", "b", "c"}, set())]
+
+
+def test_removed_items_are_not_reprocessed():
+    recorder = Recorder()
+    work_queue = CoalescingWorkQueue(recorder, debounce_seconds=10).start()
+    work_queue.submit(["a", "b"])
+    work_queue.submit(removed_ids=["b"])
+    work_queue.stop()
+
+    assert recorder.batches == [({"a"}, {"b"})]
+
+
+def test_steady_stream_is_flushed_after_max_delay():
+    recorder = Recorder()
+    work_queue = CoalescingWorkQueue(recorder, debounce_seconds=0.2, max_delay_seconds=0.3).start()
+    deadline = time.monotonic() + 2
+    while not recorder.called.is_set() and time.monotonic() < deadline:
+        work_queue.submit(["a"])
+        time.sleep(0.05)
+    work_queue.stop(flush=False)
+
+    assert recorder.called.is_set()
+
+
+def test_stop_without_flush_drops_pending_changes():
+    recorder = Recorder()
+    work_queue = CoalescingWorkQueue(recorder, debounce_seconds=10).start()
+    work_queue.submit(["a"])
+    work_queue.stop(flush=False)
+
+    assert recorder.batches == []
+
+
+def test_empty_submit_is_ignored():
+    recorder = Recorder()
+    work_queue = CoalescingWorkQueue(recorder, debounce_seconds=0).start()
+    work_queue.submit([], [])
+    work_queue.stop()
+
+    assert recorder.batches == []